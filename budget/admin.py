@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Account, Transaction, Budget
+from .models import Category, Account, Transaction, Budget, MonthlyCategoryTotal, DailyBalance, RecurringTransaction, UserLedgerStats
 
 
 # Register your models here.
@@ -7,3 +7,7 @@ admin.site.register(Category)
 admin.site.register(Account)
 admin.site.register(Transaction)
 admin.site.register(Budget)
+admin.site.register(MonthlyCategoryTotal)
+admin.site.register(DailyBalance)
+admin.site.register(RecurringTransaction)
+admin.site.register(UserLedgerStats)
@@ -7,3 +7,5 @@ class BudgetConfig(AppConfig):
 
     def ready(self):
         import budget.signals
+        from budget.cache import check_shared_cache
+        check_shared_cache()
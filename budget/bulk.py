@@ -0,0 +1,129 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .signals import CENTS, LedgerChanges, signed_amount, signed_amount_expression
+
+# Actions of the bulk edit form, applied by bulk_edit_transactions()
+BULK_ACTIONS = [
+    ('delete', 'Delete'),
+    ('category', 'Change category'),
+    ('account', 'Move to account'),
+]
+
+
+def bulk_create_in_batches(model, objs, batch_size):
+    """
+    Insert the objects of an iterable with one bulk_create per batch, so a
+    generator is never held in memory as a whole (bulk_create turns its
+    argument into a list first). Returns the number of objects inserted.
+    """
+    objs = iter(objs)
+    created = 0
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            return created
+        model.objects.bulk_create(batch)
+        created += len(batch)
+
+
+def _grouped_states(queryset):
+    """
+    Yield the summed state of every (account, category, date) group of the
+    given transactions along with its number of transactions, read with one
+    grouped query.
+    """
+    groups = queryset.values('user_id', 'account_id', 'category_id', 'date').annotate(
+        total=Sum('amount'), signed_total=Sum('signed_amount'), count=Count('pk')
+    ).order_by()
+
+    for group in groups:
+        # SQLite sums decimals as floats, so round back to cents
+        state = {
+            'user_id': group['user_id'],
+            'account_id': group['account_id'],
+            'category_id': group['category_id'],
+            'date': group['date'],
+            'amount': Decimal(group['total']).quantize(CENTS),
+            'signed_amount': Decimal(group['signed_total']).quantize(CENTS),
+        }
+        yield state, group['count']
+
+
+def _bulk_write(queryset, write, new_state=None):
+    """
+    Run write() on the given transactions in one atomic block, and apply the
+    changes it makes to the derived data as one adjustment per account,
+    monthly total and day: the groups of the transactions are reverted, then
+    added back as new_state(group) unless they are being deleted. The rows
+    are locked first, so concurrent edits of them wait for this one.
+    """
+    with transaction.atomic():
+        list(queryset.select_for_update().order_by('pk').values_list('pk', flat=True))
+
+        changes = LedgerChanges()
+        for state, count in _grouped_states(queryset):
+            changes.add(state, sign=-1, count=count)
+            if new_state is not None:
+                changes.add(new_state(state), count=count)
+
+        written = write()
+        changes.apply()
+    return written
+
+
+def bulk_delete_transactions(queryset):
+    """
+    Delete the given transactions with one DELETE and return how many were
+    deleted. The post_delete signal is not sent for each of them.
+    """
+    # _raw_delete() skips the collector, which would send the signal per row
+    queryset = queryset.order_by()
+    return _bulk_write(queryset, lambda: queryset._raw_delete(queryset.db))
+
+
+def bulk_change_category(queryset, category):
+    """
+    Move the given transactions to a category with one UPDATE, re-signing
+    them for its type, and return how many changed.
+    """
+    queryset = queryset.exclude(category=category)
+
+    def new_state(state):
+        return {**state, 'category_id': category.pk, 'signed_amount': signed_amount(state['amount'], category.type)}
+
+    return _bulk_write(
+        queryset,
+        lambda: queryset.update(category=category, signed_amount=signed_amount_expression(category.type)),
+        new_state,
+    )
+
+
+def bulk_move_to_account(queryset, account):
+    """
+    Move the given transactions to an account with one UPDATE and return how
+    many moved. The account must belong to the transactions' user.
+    """
+    queryset = queryset.exclude(account=account)
+    return _bulk_write(
+        queryset,
+        lambda: queryset.update(account=account),
+        lambda state: {**state, 'account_id': account.pk},
+    )
+
+
+def bulk_edit_transactions(queryset, action, category=None, account=None):
+    """
+    Apply one of the BULK_ACTIONS to the given transactions and return how
+    many were changed.
+    """
+    if action == 'delete':
+        return bulk_delete_transactions(queryset)
+    if action == 'category':
+        return bulk_change_category(queryset, category)
+    if action == 'account':
+        return bulk_move_to_account(queryset, account)
+    raise ValueError(f"Unknown bulk action '{action}'.")
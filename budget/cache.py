@@ -0,0 +1,363 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+# How long a computed dashboard stays cached when nothing changes
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60 * 60)
+
+# How long a rendered template fragment stays cached when nothing changes
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+
+# Template fragments cached per user (see get_cached_fragment)
+CACHED_FRAGMENTS = ['account_sidebar', 'budget_sidebar', 'transaction_sidebar']
+
+# Names of the caches whose hit/miss counters are reported by the cache_stats command
+CACHE_METRICS = ['dashboard', *CACHED_FRAGMENTS]
+
+# How often (in seconds) each process adds its hit/miss counters to the shared ones
+CACHE_STATS_FLUSH_INTERVAL = getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 60)
+
+# Kinds of data of a user (their account, budget and transaction rows) that
+# are also versioned on their own, so anything cached from one kind survives
+# changes to the others
+DATA_SCOPES = ('accounts', 'budgets', 'transactions')
+
+
+def _add_to_counter(key, delta):
+    """
+    Add to a counter that never expires, creating it when missing.
+    """
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+    else:
+        # some backends re-set the key with the default timeout on incr()
+        cache.touch(key, None)
+
+
+# -- Shared cache check -- #
+def uses_local_cache():
+    return isinstance(caches['default'], LocMemCache)
+
+
+def check_shared_cache():
+    """
+    Refuse to run under gunicorn on a cache local to each process, where a
+    version bumped by one worker (or a management command) never reaches
+    the others, which keep serving stale pages and 304 responses.
+    """
+    if uses_local_cache() and os.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        raise ImproperlyConfigured(
+            "The cache must be shared by all processes; set CACHE_BACKEND to the database cache or Redis."
+        )
+
+
+@register(Tags.caches, deploy=True)
+def check_cache_is_shared(app_configs, **kwargs):
+    if not uses_local_cache():
+        return []
+    return [Warning(
+        "The default cache is local to each process, so data versions are not shared by workers.",
+        hint="Use the database cache (python manage.py createcachetable) or Redis.",
+        id='budget.W001',
+    )]
+
+
+# -- Per-user data version -- #
+def _version_key(user_id, scope):
+    return f'budget:data-version:{user_id}:{scope}'
+
+
+def get_data_version(user_id, scope):
+    """
+    Return the current data version of one of the DATA_SCOPES of a user's
+    data. It starts from a timestamp rather than 1, so a version
+    evicted from the cache never comes back with a value that older entries
+    were stored under.
+    """
+    key = _version_key(user_id, scope)
+    version = cache.get(key)
+    if version is None:
+        version = _create_version(key)
+    return version
+
+
+def _create_version(key):
+    # another process may have created it first
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def _bump(user_id, scopes):
+    # a new timestamp rather than an increment, so nothing is read first
+    version = time.time_ns()
+    cache.set_many({_version_key(user_id, scope): version for scope in scopes}, timeout=None)
+
+
+def get_user_etag(user_id, *parts):
+    """
+    Return an ETag for a response built from a user's data, which changes
+    with the data version persisted in the user's ledger stats and the given
+    parts. Unlike the cached versions it cannot be evicted or go stale, so a
+    304 is never answered for data that changed.
+    """
+    from .ledger_stats import get_ledger_data_version
+
+    raw = ':'.join(str(part) for part in [user_id, get_ledger_data_version(user_id), *parts])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def bump_data_version(user_id, scopes=DATA_SCOPES):
+    """
+    Invalidate everything cached for a user, except the fragments built only
+    from scopes of their data that did not change, and bump the persisted
+    version used by the ETags along with the data.
+    """
+    from .ledger_stats import bump_ledger_data_version
+
+    bump_ledger_data_version(user_id)
+    bump_cached_data_version(user_id, scopes)
+
+
+def bump_cached_data_version(user_id, scopes=DATA_SCOPES):
+    """
+    Bump the cached versions of bump_data_version() alone, for writers that
+    bumped the persisted one already (update_ledger_stats() does). They are
+    bumped straight away and again once the surrounding transaction commits,
+    so a request that read the old data before the commit cannot cache it
+    under the new version.
+    """
+    _bump(user_id, scopes)
+    transaction.on_commit(lambda: _bump(user_id, scopes))
+
+
+# -- Hit/miss counters -- #
+def _stats_key(name, event):
+    return f'budget:cache-stats:{name}:{event}'
+
+
+# Counters of this process not yet added to the shared ones, so recording a
+# hit writes nothing to the cache
+_pending_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed_at = 0.0
+
+
+def record_cache_event(name, hit):
+    with _stats_lock:
+        _pending_stats[_stats_key(name, 'hits' if hit else 'misses')] += 1
+
+
+def flush_cache_stats(force=False):
+    """
+    Add the counters of this process to the shared ones, at most once every
+    CACHE_STATS_FLUSH_INTERVAL seconds unless forced. It runs once a response
+    has been sent and no transaction is open (see the request_finished
+    receiver), off the read path.
+    """
+    global _stats_flushed_at
+
+    with _stats_lock:
+        if not _pending_stats:
+            return
+        if not force and time.monotonic() - _stats_flushed_at < CACHE_STATS_FLUSH_INTERVAL:
+            return
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+        _stats_flushed_at = time.monotonic()
+
+    for key, count in pending.items():
+        _add_to_counter(key, count)
+
+
+def get_cache_stats(name):
+    """
+    Return the hits, misses and hit rate recorded for a cache by all
+    processes, as far as they flushed them, and by this one.
+    """
+    keys = [_stats_key(name, 'hits'), _stats_key(name, 'misses')]
+    shared = cache.get_many(keys)
+    with _stats_lock:
+        hits, misses = (shared.get(key, 0) + _pending_stats[key] for key in keys)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0,
+    }
+
+
+def reset_cache_stats(name):
+    keys = [_stats_key(name, 'hits'), _stats_key(name, 'misses')]
+    with _stats_lock:
+        for key in keys:
+            _pending_stats.pop(key, None)
+    cache.delete_many(keys)
+
+
+# -- Category registry -- #
+CategoryInfo = namedtuple('CategoryInfo', ['id', 'name', 'type'])
+
+_CATEGORY_VERSION_KEY = 'budget:category-version'
+
+# (version, categories) of this process, replaced as a whole when reloaded
+_category_registry = (None, {})
+_category_lock = threading.Lock()
+
+
+def get_category_version():
+    """
+    Return the version of the category table shared by all processes.
+    """
+    version = cache.get(_CATEGORY_VERSION_KEY)
+    if version is None:
+        version = _create_version(_CATEGORY_VERSION_KEY)
+    return version
+
+
+def get_categories():
+    """
+    Return a dict of category id -> CategoryInfo, ordered by name. The
+    categories are held in process memory and reloaded only when another
+    process (or this one) bumped the shared category version.
+    """
+    global _category_registry
+    from .models import Category
+
+    version = get_category_version()
+    loaded_version, categories = _category_registry
+    if loaded_version == version:
+        return categories
+
+    with _category_lock:
+        loaded_version, categories = _category_registry
+        if loaded_version != version:
+            categories = {
+                pk: CategoryInfo(pk, name, category_type)
+                for pk, name, category_type in Category.objects.order_by('name').values_list('pk', 'name', 'type')
+            }
+            _category_registry = (version, categories)
+        return categories
+
+
+def get_category(category_id):
+    """
+    Return the CategoryInfo of a category id, or None when it does not exist.
+    """
+    if category_id is None:
+        return None
+    return get_categories().get(category_id)
+
+
+def bump_category_version():
+    """
+    Invalidate the category registry of every process, straight away and
+    again once the surrounding transaction commits.
+    """
+    def bump():
+        global _category_registry
+        cache.set(_CATEGORY_VERSION_KEY, time.time_ns(), timeout=None)
+        _category_registry = (None, {})
+
+    bump()
+    transaction.on_commit(bump)
+
+
+# -- Versioned entries -- #
+def _get_versioned(key, version_keys):
+    """
+    Read a cached entry along with the versions it has to be stored under,
+    in a single cache read. Return the current versions and the entry, or
+    None when it is missing or stale.
+    """
+    found = cache.get_many([*version_keys, key])
+    current = [
+        found[version_key] if version_key in found else _create_version(version_key)
+        for version_key in version_keys
+    ]
+    entry = found.get(key)
+    if entry is not None and entry[0] == current:
+        return current, entry[1]
+    return current, None
+
+
+# -- Dashboard cache -- #
+def _dashboard_key(user_id, key_parts):
+    return ':'.join(['budget:dashboard', str(user_id), *map(str, key_parts)])
+
+
+def _dashboard_version_keys(user_id):
+    return [*(_version_key(user_id, scope) for scope in DATA_SCOPES), _CATEGORY_VERSION_KEY]
+
+
+def get_cached_dashboard(user_id, key_parts, compute):
+    """
+    Return the dashboard data of a user for the given key parts (such as the
+    selected month and year), computing and caching it on a miss. It is
+    stored with the user's data versions and the category version, read
+    along with it, so it is computed again once any of them changes.
+    """
+    key = _dashboard_key(user_id, key_parts)
+
+    versions, data = _get_versioned(key, _dashboard_version_keys(user_id))
+    if data is not None:
+        record_cache_event('dashboard', hit=True)
+        return data
+
+    record_cache_event('dashboard', hit=False)
+    data = compute()
+    cache.set(key, (versions, data), timeout=DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_cached_dashboard(user_id, key_parts, compute):
+    """
+    get_cached_dashboard() for async views, where compute is a coroutine
+    function.
+    """
+    key = _dashboard_key(user_id, key_parts)
+
+    versions, data = await sync_to_async(_get_versioned)(key, _dashboard_version_keys(user_id))
+    if data is not None:
+        record_cache_event('dashboard', hit=True)
+        return data
+
+    record_cache_event('dashboard', hit=False)
+    data = await compute()
+    await cache.aset(key, (versions, data), timeout=DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+# -- Template fragment cache -- #
+def get_cached_fragment(name, user_id, scopes, vary_on, render):
+    """
+    Return the HTML of a template fragment of a user, rendering and caching
+    it on a miss. It is keyed on vary_on (such as the query string) and
+    stored with the user's data versions of the given scopes, read along
+    with it, so a hit is a single cache read and survives changes to the
+    user's other data.
+    """
+    raw = ':'.join(str(part) for part in vary_on)
+    key = f'budget:fragment:{name}:{user_id}:{hashlib.sha1(raw.encode()).hexdigest()}'
+    versions, html = _get_versioned(key, [_version_key(user_id, scope) for scope in scopes])
+    if html is not None:
+        record_cache_event(name, hit=True)
+        return html
+
+    record_cache_event(name, hit=False)
+    html = render()
+    cache.set(key, (versions, html), timeout=FRAGMENT_CACHE_TIMEOUT)
+    return html
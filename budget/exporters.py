@@ -0,0 +1,57 @@
+import csv
+import json
+
+# Rows fetched from the database per round trip while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+# Same columns as the CSV importer, so an export can be imported again
+EXPORT_COLUMNS = ['date', 'amount', 'description', 'category', 'account']
+
+
+def export_rows(queryset):
+    """
+    Yield the export columns of a transaction queryset as tuples, fetched
+    with values_list in chunks so no model instances are built. Amounts are
+    signed: income is positive and everything else negative.
+    """
+    rows = queryset.values_list(
+        'date', 'signed_amount', 'description', 'category__name', 'account__name'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    for day, amount, description, category_name, account_name in rows:
+        yield day.isoformat(), amount, description, category_name or '', account_name
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer can
+    format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['amount'] = str(record['amount'])
+        yield separator + json.dumps(record)
+        separator = ','
+    yield ']'
+
+
+# Content type and streaming function of each export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'json': ('application/json', stream_json),
+}
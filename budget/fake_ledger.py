@@ -0,0 +1,169 @@
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import Account, Category, DailyBalance, MonthlyCategoryTotal, Transaction, UserLedgerStats
+from .signals import signed_amount
+
+User = get_user_model()
+
+# Categories created when missing, with the weight and amount range of their transactions
+FAKE_CATEGORIES = [
+    ('Salary', 'I', 4, (1500, 4000)),
+    ('Freelance', 'I', 2, (100, 1500)),
+    ('Interest', 'I', 1, (1, 50)),
+    ('Groceries', 'E', 30, (5, 150)),
+    ('Rent', 'E', 4, (600, 1500)),
+    ('Utilities', 'E', 6, (20, 200)),
+    ('Transport', 'E', 15, (2, 80)),
+    ('Dining Out', 'E', 15, (8, 90)),
+    ('Entertainment', 'E', 10, (5, 120)),
+    ('Health', 'E', 5, (10, 250)),
+]
+
+FAKE_ACCOUNT_NAMES = ['Checking', 'Savings', 'Credit Card', 'Cash', 'Brokerage']
+
+FAKE_USER_PREFIX = 'fake-user-'
+FAKE_BATCH_SIZE = 5000
+
+
+def _get_fake_categories():
+    categories = []
+    for name, category_type, weight, amount_range in FAKE_CATEGORIES:
+        category, _ = Category.objects.get_or_create(name=name, defaults={'type': category_type})
+        categories.append((category, weight, amount_range))
+    return categories
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def _generate_user_ledger(rng, user, categories, accounts_per_user, transactions_per_user, end_date, days):
+    """
+    Build the unsaved accounts and (account index, transaction) pairs of one
+    user, with the account balances already including the transactions.
+    """
+    accounts = []
+    for number in range(accounts_per_user):
+        name = FAKE_ACCOUNT_NAMES[number % len(FAKE_ACCOUNT_NAMES)]
+        if number >= len(FAKE_ACCOUNT_NAMES):
+            name = f'{name} {number // len(FAKE_ACCOUNT_NAMES) + 1}'
+        opening_balance = _money(rng, 0, 5000)
+        accounts.append(Account(user=user, name=name, balance=opening_balance, opening_balance=opening_balance))
+
+    weights = [weight for category, weight, amount_range in categories]
+    picks = rng.choices(categories, weights=weights, k=transactions_per_user)
+
+    entries = []
+    for category, weight, (low, high) in picks:
+        index = rng.randrange(accounts_per_user)
+        amount = _money(rng, low, high)
+        signed = signed_amount(amount, category.type)
+        entries.append((index, Transaction(
+            user=user,
+            category=category,
+            amount=amount,
+            signed_amount=signed,
+            date=end_date - timedelta(days=rng.randrange(days)),
+            description=category.name,
+        )))
+        accounts[index].balance += signed
+
+    return accounts, entries
+
+
+def _build_rollups(user, entries, total_balance):
+    """
+    Build the monthly category totals, daily balances and ledger stats of one
+    user's transactions.
+    """
+    monthly = defaultdict(lambda: [Decimal('0.00'), 0])
+    daily = defaultdict(lambda: [Decimal('0.00'), 0])
+
+    for index, entry in entries:
+        monthly_key = (entry.category_id, entry.date.year, entry.date.month)
+        monthly[monthly_key][0] += entry.amount
+        monthly[monthly_key][1] += 1
+        daily[entry.date][0] += entry.signed_amount
+        daily[entry.date][1] += 1
+
+    monthly_totals = [
+        MonthlyCategoryTotal(user=user, category_id=category_id, year=year, month=month, total=total, count=count)
+        for (category_id, year, month), (total, count) in monthly.items()
+    ]
+
+    daily_balances = []
+    closing = total_balance
+    for day in sorted(daily, reverse=True):
+        change, count = daily[day]
+        daily_balances.append(DailyBalance(user=user, date=day, balance=closing, change=change, count=count))
+        closing -= change
+
+    stats = UserLedgerStats(
+        user=user,
+        first_date=min(daily, default=None),
+        last_date=max(daily, default=None),
+        transaction_count=len(entries),
+        total_balance=total_balance,
+    )
+
+    return monthly_totals, daily_balances, stats
+
+
+def generate_fake_ledger(users, accounts_per_user, transactions_per_user, seed=0, days=3 * 365,
+                         prefix=FAKE_USER_PREFIX, end_date=None, batch_size=FAKE_BATCH_SIZE, progress=None):
+    """
+    Create users with accounts and transactions drawn from a seeded random
+    generator, so the same arguments always produce the same ledger.
+
+    Everything is written with bulk_create, bypassing the transaction
+    signals; account balances, monthly totals, daily balances and ledger
+    stats are worked out in memory instead and written alongside. Each user
+    is committed on its own, and progress(created_users) is called after
+    each one.
+
+    Returns a dict with the number of users, accounts and transactions
+    created and the elapsed seconds.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    categories = _get_fake_categories()
+    password = make_password(None)
+
+    created = {'users': 0, 'accounts': 0, 'transactions': 0}
+
+    for number in range(users):
+        with transaction.atomic():
+            user = User.objects.create(username=f'{prefix}{number:06d}', password=password)
+            accounts, entries = _generate_user_ledger(
+                rng, user, categories, accounts_per_user, transactions_per_user, end_date, days
+            )
+
+            Account.objects.bulk_create(accounts)
+            for index, entry in entries:
+                entry.account = accounts[index]
+            Transaction.objects.bulk_create([entry for index, entry in entries], batch_size=batch_size)
+
+            monthly_totals, daily_balances, stats = _build_rollups(
+                user, entries, sum((account.balance for account in accounts), Decimal('0.00'))
+            )
+            MonthlyCategoryTotal.objects.bulk_create(monthly_totals, batch_size=batch_size)
+            DailyBalance.objects.bulk_create(daily_balances, batch_size=batch_size)
+            stats.save(force_insert=True)
+
+        created['users'] += 1
+        created['accounts'] += len(accounts)
+        created['transactions'] += len(entries)
+        if progress is not None:
+            progress(created['users'])
+
+    created['seconds'] = time.perf_counter() - started
+    return created
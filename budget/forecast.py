@@ -0,0 +1,129 @@
+import calendar
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from .models import MonthlyCategoryTotal
+from .reports import month_range_q
+
+# Complete months of history the models are fitted on
+FORECAST_HISTORY_MONTHS = 24
+
+# Months projected after the current one
+FORECAST_MONTHS = 3
+
+# Least history needed to fit a trend rather than a flat average, and to fit
+# a level per calendar month along with it
+FORECAST_TREND_MIN_MONTHS = 6
+FORECAST_SEASONAL_MIN_MONTHS = 24
+
+UNCATEGORISED = 'Uncategorised'
+
+
+def _fetch_monthly_totals(user, first_month, current_month):
+    """
+    Return the (name, type) of every category seen and a (months, categories)
+    matrix of the user's monthly totals from first_month up to and including
+    current_month, read from the monthly category totals in one query.
+    """
+    rows = MonthlyCategoryTotal.objects.filter(
+        month_range_q(first_month, current_month), user=user
+    ).values_list('category__name', 'category__type', 'year', 'month', 'total').order_by()
+
+    categories = {}
+    cells = []
+    for name, category_type, year, month, total in rows:
+        column = categories.setdefault((name or UNCATEGORISED, category_type or 'E'), len(categories))
+        cells.append(((year - first_month.year) * 12 + month - first_month.month, column, float(total)))
+
+    months = (current_month.year - first_month.year) * 12 + current_month.month - first_month.month + 1
+    totals = np.zeros((months, len(categories)))
+    if cells:
+        month_indexes, column_indexes, values = zip(*cells)
+        totals[list(month_indexes), list(column_indexes)] = values
+
+    return list(categories), totals
+
+
+def _design_matrix(months, first_month, seasonal):
+    """
+    Regressors of a least squares fit over the given month numbers: a trend
+    and either one level per calendar month (seasonal) or a single level.
+    """
+    if not seasonal:
+        return np.column_stack([np.ones(len(months)), months])
+    calendar_months = (first_month.month - 1 + months) % 12
+    return np.column_stack([months, np.eye(12)[calendar_months]])
+
+
+def _fit_and_project(history, first_month, horizon):
+    """
+    Fit every column of history at once with least squares and project the
+    next horizon months. Short histories get a flat average, longer ones a
+    linear trend, and from two years on the trend is fitted together with
+    a level per calendar month so seasonal peaks do not skew it.
+    """
+    months = np.arange(history.shape[0])
+    future = np.arange(history.shape[0], history.shape[0] + horizon)
+    seasonal = len(months) >= FORECAST_SEASONAL_MIN_MONTHS
+
+    design = _design_matrix(months, first_month, seasonal)
+    future_design = _design_matrix(future, first_month, seasonal)
+    if len(months) < FORECAST_TREND_MIN_MONTHS:
+        design, future_design = design[:, :1], future_design[:, :1]
+
+    coefficients = np.linalg.lstsq(design, history, rcond=None)[0]
+
+    # spending and income never go negative
+    return np.clip(future_design @ coefficients, 0, None)
+
+
+def forecast_spending(user, today):
+    """
+    Project each category's total for the end of the current month and for
+    the next FORECAST_MONTHS months, along with the net cash flow (income
+    minus everything else) of the same months. The current month is projected
+    as its total so far plus the share of the model's estimate for the days
+    that are left. Returns an empty dict (which is still cached) when the
+    user has no complete month of history.
+    """
+    current_month = today.replace(day=1)
+    first_month = current_month - relativedelta(months=FORECAST_HISTORY_MONTHS)
+    categories, totals = _fetch_monthly_totals(user, first_month, current_month)
+
+    # skip the months before the user's first transaction
+    active = np.flatnonzero(totals[:-1].any(axis=1))
+    if not active.size:
+        return {}
+    start = active[0]
+    history = totals[start:-1]
+    month_to_date = totals[-1]
+
+    projected = _fit_and_project(history, first_month + relativedelta(months=int(start)), FORECAST_MONTHS + 1)
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    remaining_share = (days_in_month - today.day) / days_in_month
+    projected[0] = month_to_date + projected[0] * remaining_share
+
+    signs = np.array([1.0 if category_type == 'I' else -1.0 for name, category_type in categories])
+    net = signs @ projected.T
+
+    projections = []
+    for index, (name, category_type) in enumerate(categories):
+        projections.append({
+            'name': name,
+            'type': category_type,
+            'month_to_date': round(float(month_to_date[index]), 2),
+            'end_of_month': round(float(projected[0, index]), 2),
+            'next_months': [round(value, 2) for value in projected[1:, index].tolist()],
+        })
+    projections.sort(key=lambda item: item['end_of_month'], reverse=True)
+
+    return {
+        'months': [current_month + relativedelta(months=offset) for offset in range(1, FORECAST_MONTHS + 1)],
+        'history_months': int(history.shape[0]),
+        'categories': projections,
+        'net': {
+            'end_of_month': round(float(net[0]), 2),
+            'next_months': [round(value, 2) for value in net[1:].tolist()],
+        },
+    }
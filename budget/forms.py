@@ -2,6 +2,64 @@ from django import forms
 from datetime import date
 from allauth.account.forms import SignupForm, LoginForm, ChangePasswordForm, ResetPasswordForm, SetPasswordForm
 from .models import Account, Transaction, Category, Budget
+from .cache import get_categories
+from .bulk import BULK_ACTIONS
+from .reports import BUDGET_REPORT_MAX_MONTHS
+
+
+# -- Category field backed by the in-process category registry -- #
+class CategoryChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in self.field.get_categories():
+            yield (category.id, str(Category(name=category.name, type=category.type)))
+
+    def __len__(self):
+        return len(self.field.get_categories()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.get_categories())
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """
+    A category choice field whose choices and validation come from the
+    category registry, so rendering or submitting a form does not query the
+    category table.
+    """
+    iterator = CategoryChoiceIterator
+
+    def __init__(self, category_type=None, **kwargs):
+        queryset = Category.objects.filter(type=category_type) if category_type else Category.objects.all()
+        super().__init__(queryset=queryset, **kwargs)
+        self.category_type = category_type
+
+    def get_categories(self):
+        return [
+            category for category in get_categories().values()
+            if self.category_type is None or category.type == self.category_type
+        ]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            category_id = int(value.pk if isinstance(value, Category) else value)
+        except (TypeError, ValueError):
+            category_id = None
+
+        for category in self.get_categories():
+            if category.id == category_id:
+                return Category.from_db(
+                    self.queryset.db, ['id', 'name', 'type'], list(category)
+                )
+
+        raise forms.ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
 
 
 # -- Custom Signup Form for Allauth -- #
@@ -84,6 +142,8 @@ class AccountForm(forms.ModelForm):
 
 # -- Transaction Form -- #
 class TransactionForm(forms.ModelForm):
+    category = CategoryChoiceField()
+
     class Meta:
         model = Transaction
         fields = ['account', 'category', 'amount', 'description', 'date']
@@ -97,10 +157,7 @@ class TransactionForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user is not None:
-            self.fields['account'].queryset = Account.objects.filter(user=user)
-
-        self.fields['category'].queryset = Category.objects.all().order_by(
-            'name')
+            self.fields['account'].queryset = Account.objects.filter(user=user).select_related('user')
 
         for field_name, field in self.fields.items():
             if isinstance(field.widget, forms.Select):
@@ -108,9 +165,30 @@ class TransactionForm(forms.ModelForm):
             else:
                 field.widget.attrs.update({'class': 'form-field'})
 
+    def clean(self):
+        cleaned_data = super().clean()
+        day = cleaned_data.get('date')
+
+        # a recurring schedule has one occurrence per date at most
+        if self.instance.recurring_id and day and 'date' in self.changed_data:
+            queryset = Transaction.objects.filter(
+                recurring_id=self.instance.recurring_id,
+                date=day
+            ).exclude(pk=self.instance.pk)
+
+            if queryset.exists():
+                self.add_error('date', "This recurring transaction already has an occurrence on that date.")
+        return cleaned_data
+
 
 # -- Transaction Filter Form -- #
 class TransactionFilterForm(forms.Form):
+    search = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Search',
+        widget=forms.TextInput(attrs={'type': 'search', 'placeholder': 'Description', 'class': 'form-field'})
+    )
     accounts = forms.ModelChoiceField(
         queryset=Account.objects.none(),
         required=False,
@@ -118,8 +196,7 @@ class TransactionFilterForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
-    categories = forms.ModelChoiceField(
-        queryset=Category.objects.none(),
+    categories = CategoryChoiceField(
         required=False,
         label='Categories',
         widget=forms.Select(attrs={'class': 'form-select'})
@@ -141,9 +218,97 @@ class TransactionFilterForm(forms.Form):
 
         if user is not None:
             self.fields['accounts'].queryset = Account.objects.filter(
-                user=user).order_by('name')
-            self.fields['categories'].queryset = Category.objects.all().order_by(
-                'name')
+                user=user).select_related('user').order_by('name')
+
+
+# -- Transaction Import Form -- #
+class TransactionImportForm(forms.Form):
+    file = forms.FileField(
+        label='CSV or OFX file',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-field', 'accept': '.csv,.ofx,.qfx'})
+    )
+    account = forms.ModelChoiceField(
+        queryset=Account.objects.none(),
+        label='Account',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    income_category = CategoryChoiceField(
+        category_type='I',
+        required=False,
+        label='Category for uncategorised income',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    expense_category = CategoryChoiceField(
+        category_type='E',
+        required=False,
+        label='Category for uncategorised expenses',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user is not None:
+            self.fields['account'].queryset = Account.objects.filter(
+                user=user).select_related('user').order_by('name')
+
+
+# -- Transaction Bulk Edit Form -- #
+class TransactionIdsField(forms.Field):
+    """
+    The ids of the transactions ticked on the list, posted as repeated values.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return [int(pk) for pk in value]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Select valid records.", code='invalid')
+
+
+class TransactionBulkForm(forms.Form):
+    action = forms.ChoiceField(
+        choices=BULK_ACTIONS,
+        label='Action',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    category = CategoryChoiceField(
+        required=False,
+        label='New category',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    account = forms.ModelChoiceField(
+        queryset=Account.objects.none(),
+        required=False,
+        label='New account',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    transactions = TransactionIdsField(required=False)
+    select_all = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user is not None:
+            self.fields['account'].queryset = Account.objects.filter(
+                user=user).select_related('user').order_by('name')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+
+        if not cleaned_data.get('transactions') and not cleaned_data.get('select_all'):
+            raise forms.ValidationError("Select at least one record.")
+        if action == 'category' and not cleaned_data.get('category'):
+            self.add_error('category', "Choose the category to move the records to.")
+        if action == 'account' and not cleaned_data.get('account'):
+            self.add_error('account', "Choose the account to move the records to.")
+        return cleaned_data
 
 
 # -- Budget Form -- #
@@ -169,22 +334,22 @@ class BudgetForm(forms.ModelForm):
         initial=date.today().year,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+    category = CategoryChoiceField(
+        category_type='E',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
 
     class Meta:
         model = Budget
         fields = ['category', 'limit_amount', 'month', 'year']
         widgets = {
             'limit_amount': forms.NumberInput(attrs={'placeholder': '0.00', 'step': '0.01', 'min': '0', 'class': 'form-field'}),
-            'category': forms.Select(attrs={'class': 'form-select'})
         }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
-        self.fields['category'].queryset = Category.objects.filter(
-            type='E').order_by('name')
-
         if user:
             self.initial['user'] = user
 
@@ -213,3 +378,33 @@ class BudgetForm(forms.ModelForm):
                         f"A budget for {category.name} already exists for {month}/{year}. Please edit the existing budget."
                     )
         return cleaned_data
+
+
+# -- Budget Report Form -- #
+class BudgetReportForm(forms.Form):
+    start = forms.DateField(
+        label='From',
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month', 'class': 'form-field'}, format='%Y-%m')
+    )
+    end = forms.DateField(
+        label='To',
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month', 'class': 'form-field'}, format='%Y-%m')
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+
+        if start and end:
+            if end < start:
+                raise forms.ValidationError("The last month must not be before the first one.")
+
+            months = (end.year - start.year) * 12 + end.month - start.month + 1
+            if months > BUDGET_REPORT_MAX_MONTHS:
+                raise forms.ValidationError(
+                    f"A report can cover at most {BUDGET_REPORT_MAX_MONTHS} months."
+                )
+        return cleaned_data
@@ -0,0 +1,246 @@
+import csv
+import re
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Account, Category, Transaction
+from .signals import LedgerChanges, signed_amount
+
+# Number of parsed rows held in memory before they are written with bulk_create
+IMPORT_CHUNK_SIZE = 1000
+
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+OFX_TAG_RE = re.compile(r'<(/?)([^<>]+)>([^<]*)')
+OFX_READ_SIZE = 64 * 1024
+
+DEFAULT_DESCRIPTION = 'Imported transaction'
+
+
+class TransactionImportError(Exception):
+    """
+    Raised when an import file cannot be parsed or refers to unknown data.
+    """
+
+
+# -- Parsers -- #
+def _parse_amount(value, line):
+    try:
+        return Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise TransactionImportError(f"Line {line}: invalid amount '{value}'.")
+
+
+def _parse_csv_date(value, line):
+    value = (value or '').strip()
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise TransactionImportError(f"Line {line}: invalid date '{value}'.")
+
+
+def _parse_ofx_date(value, line):
+    # OFX dates start with YYYYMMDD, optionally followed by a time and timezone
+    try:
+        return datetime.strptime(value[:8], '%Y%m%d').date()
+    except ValueError:
+        raise TransactionImportError(f"Line {line}: invalid date '{value}'.")
+
+
+def parse_csv(fileobj):
+    """
+    Yield rows from a CSV file with a header row containing at least the
+    'date', 'amount' and 'description' columns. Optional 'category' and
+    'account' columns are matched by name. Rows are read one at a time.
+    """
+    reader = csv.DictReader(fileobj)
+    if reader.fieldnames is None:
+        return
+
+    columns = {name.strip().lower(): name for name in reader.fieldnames if name}
+    missing = {'date', 'amount', 'description'} - set(columns)
+    if missing:
+        raise TransactionImportError(
+            f"Missing CSV column(s): {', '.join(sorted(missing))}."
+        )
+
+    for row in reader:
+        line = reader.line_num
+
+        def column(name):
+            return (row.get(columns[name]) or '').strip() if name in columns else ''
+
+        yield {
+            'line': line,
+            'date': _parse_csv_date(column('date'), line),
+            'amount': _parse_amount(column('amount'), line),
+            'description': column('description'),
+            'category': column('category') or None,
+            'account': column('account') or None,
+        }
+
+
+def _iter_ofx_tags(fileobj):
+    """
+    Yield (closing, tag, value) tuples from an OFX file, reading it in fixed
+    size blocks so even single-line files are never loaded whole.
+    """
+    buffer = ''
+    while True:
+        block = fileobj.read(OFX_READ_SIZE)
+        if not block:
+            break
+        buffer += block
+
+        # keep the last (possibly incomplete) tag for the next block
+        last_tag = buffer.rfind('<')
+        for match in OFX_TAG_RE.finditer(buffer, 0, max(last_tag, 0)):
+            yield match.group(1) == '/', match.group(2).strip().upper(), match.group(3).strip()
+        buffer = buffer[max(last_tag, 0):]
+
+    for match in OFX_TAG_RE.finditer(buffer):
+        yield match.group(1) == '/', match.group(2).strip().upper(), match.group(3).strip()
+
+
+def parse_ofx(fileobj):
+    """
+    Yield rows from the <STMTTRN> blocks of an OFX (SGML or XML) statement.
+    """
+    current = None
+    count = 0
+
+    for closing, tag, value in _iter_ofx_tags(fileobj):
+        if tag == 'STMTTRN':
+            if not closing:
+                current = {}
+                continue
+
+            count += 1
+            if current is None or 'DTPOSTED' not in current or 'TRNAMT' not in current:
+                raise TransactionImportError(f"Transaction {count}: missing date or amount.")
+
+            yield {
+                'line': count,
+                'date': _parse_ofx_date(current['DTPOSTED'], count),
+                'amount': _parse_amount(current['TRNAMT'], count),
+                'description': current.get('NAME') or current.get('MEMO') or '',
+                'category': None,
+                'account': None,
+            }
+            current = None
+
+        elif current is not None and not closing and value:
+            current[tag] = value
+
+
+def get_parser(filename):
+    """
+    Pick a parser from the file extension.
+    """
+    if filename.lower().endswith(('.ofx', '.qfx')):
+        return parse_ofx
+    return parse_csv
+
+
+# -- Import -- #
+def import_transactions(user, account, rows, income_category=None,
+                        expense_category=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Insert parsed rows as transactions of the given user with bulk_create,
+    one chunk at a time, then apply a single balance delta per account and
+    a single update per monthly total and daily balance.
+    Rows without a category are assigned the income or expense category
+    according to the sign of their amount. Expenses are left uncategorised
+    when no expense category is given, but an income needs its category,
+    since uncategorised transactions count as expenses. Everything runs in
+    one atomic block, so a bad row leaves no partial import behind.
+
+    Returns a dict with the number of rows, elapsed seconds and rows per second.
+    """
+    started = time.perf_counter()
+
+    categories = {
+        category.name.lower(): category
+        for category in Category.objects.all()
+    }
+    accounts = {
+        user_account.name.lower(): user_account
+        for user_account in Account.objects.filter(user=user)
+    }
+
+    changes = LedgerChanges()
+    chunk = []
+    total = 0
+
+    with transaction.atomic():
+        for row in rows:
+            if row['category']:
+                category = categories.get(row['category'].lower())
+                if category is None:
+                    raise TransactionImportError(
+                        f"Line {row['line']}: unknown category '{row['category']}'."
+                    )
+            elif row['amount'] > 0:
+                category = income_category
+                if category is None:
+                    raise TransactionImportError(
+                        f"Line {row['line']}: no category given for an income; choose one for uncategorised income."
+                    )
+            else:
+                category = expense_category
+
+            if row['account']:
+                row_account = accounts.get(row['account'].lower())
+                if row_account is None:
+                    raise TransactionImportError(
+                        f"Line {row['line']}: unknown account '{row['account']}'."
+                    )
+            elif account is not None:
+                row_account = account
+            else:
+                raise TransactionImportError(f"Line {row['line']}: no account given.")
+
+            amount = abs(row['amount'])
+            signed = signed_amount(amount, category.type if category else None)
+            changes.add({
+                'user_id': user.pk,
+                'account_id': row_account.pk,
+                'category_id': category.pk if category else None,
+                'amount': amount,
+                'signed_amount': signed,
+                'date': row['date'],
+            })
+
+            chunk.append(Transaction(
+                user=user,
+                account=row_account,
+                category=category,
+                amount=amount,
+                signed_amount=signed,
+                date=row['date'],
+                description=(row['description'] or DEFAULT_DESCRIPTION)[:255],
+            ))
+
+            if len(chunk) >= chunk_size:
+                Transaction.objects.bulk_create(chunk)
+                total += len(chunk)
+                chunk = []
+
+        if chunk:
+            Transaction.objects.bulk_create(chunk)
+            total += len(chunk)
+
+        changes.apply()
+
+    elapsed = time.perf_counter() - started
+
+    return {
+        'rows': total,
+        'seconds': elapsed,
+        'rows_per_second': total / elapsed if elapsed > 0 else 0,
+    }
@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateField, F, Max, Min, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import Account, DailyBalance, Transaction, UserLedgerStats
+
+
+def compute_ledger_stats(user_id):
+    """
+    Work out the UserLedgerStats of a user from their transactions and
+    accounts, without saving it.
+    """
+    summary = Transaction.objects.filter(user_id=user_id).aggregate(
+        first_date=Min('date'), last_date=Max('date'), transaction_count=Count('id')
+    )
+    total_balance = Account.objects.filter(user_id=user_id).aggregate(total=Sum('balance'))['total']
+    return UserLedgerStats(user_id=user_id, total_balance=total_balance or Decimal('0.00'), **summary)
+
+
+def get_ledger_stats(user_id):
+    """
+    Return the UserLedgerStats of a user, working it out and saving it on
+    first use.
+    """
+    stats = UserLedgerStats.objects.filter(user_id=user_id).first()
+    if stats is not None:
+        return stats
+
+    stats = compute_ledger_stats(user_id)
+    try:
+        with transaction.atomic():
+            stats.save(force_insert=True)
+    except IntegrityError:
+        # Another writer saved it first
+        pass
+    return stats
+
+
+def get_ledger_data_version(user_id):
+    """
+    Return the persisted data version of a user, reading nothing else.
+    """
+    version = UserLedgerStats.objects.filter(user_id=user_id).values_list('data_version', flat=True).first()
+    if version is None:
+        version = get_ledger_stats(user_id).data_version
+    return version
+
+
+def bump_ledger_data_version(user_id):
+    """
+    Bump the persisted data version of a user with one UPDATE. A missing
+    row is left missing, and starts from scratch when created.
+    """
+    UserLedgerStats.objects.filter(user_id=user_id).update(data_version=F('data_version') + 1)
+
+
+def _date_bound(field, added_day, removed_days, days, bound):
+    """
+    Return the new value of the first or last date (field) of a user's ledger
+    stats: bound() of the stored date and the outermost day that gained
+    transactions, read back from the daily balances (days, in the field's
+    order) only when the stored date is a day that lost some.
+    """
+    value = F(field)
+    if added_day is not None:
+        value = bound(Coalesce(field, Value(added_day)), Value(added_day), output_field=DateField())
+    if removed_days:
+        value = Case(
+            When(**{f'{field}__in': removed_days}, then=Subquery(days[:1])),
+            default=value,
+            output_field=DateField(),
+        )
+    return value
+
+
+def update_ledger_stats(user_id, balance_delta=0, count_delta=0, added_days=(), removed_days=(), create=True):
+    """
+    Add to a user's total balance and transaction count and bump their data
+    version with one UPDATE. The first and last dates follow the days that
+    gained transactions (added_days), and are only read back from the daily
+    balances (which have a row for every day with transactions) when they
+    are one of the days that lost some (removed_days). A missing row is
+    worked out from scratch when create is set; removals leave it missing,
+    so deleting a user cannot recreate it.
+    """
+    changes = {'data_version': F('data_version') + 1}
+    if balance_delta:
+        changes['total_balance'] = F('total_balance') + balance_delta
+    if count_delta:
+        changes['transaction_count'] = F('transaction_count') + count_delta
+    if added_days or removed_days:
+        days = DailyBalance.objects.filter(user_id=user_id).values('date')
+        changes['first_date'] = _date_bound(
+            'first_date', min(added_days, default=None), removed_days, days.order_by('date'), Least
+        )
+        changes['last_date'] = _date_bound(
+            'last_date', max(added_days, default=None), removed_days, days.order_by('-date'), Greatest
+        )
+
+    stats = UserLedgerStats.objects.filter(user_id=user_id)
+    if stats.update(**changes) or not create:
+        return
+
+    try:
+        with transaction.atomic():
+            compute_ledger_stats(user_id).save(force_insert=True)
+    except IntegrityError:
+        # Another writer created the row first
+        stats.update(**changes)
+
+
+def apply_ledger_stats(user_ids, daily_changes):
+    """
+    Apply a mapping of (user id, date) -> (amount, count) of transaction
+    changes to the ledger stats of the given users, bumping the data version
+    of each of them. Must run after the daily balances.
+    """
+    by_user = {user_id: (0, 0, [], []) for user_id in user_ids}
+    for (user_id, day), (amount, count) in daily_changes.items():
+        total_amount, total_count, added_days, removed_days = by_user.get(user_id, (0, 0, [], []))
+        if count > 0:
+            added_days.append(day)
+        elif count < 0:
+            removed_days.append(day)
+        by_user[user_id] = (total_amount + amount, total_count + count, added_days, removed_days)
+
+    for user_id, (amount, count, added_days, removed_days) in by_user.items():
+        update_ledger_stats(user_id, amount, count, added_days, removed_days, create=count >= 0)
@@ -0,0 +1,228 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date
+from decimal import Decimal
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from budget.cache import bump_data_version
+from budget.fake_ledger import generate_fake_ledger
+from budget.middleware import QueryRecorder
+from budget.models import Category, Transaction
+from budget.pagination import encode_cursor
+from budget.views import AsyncDashboardView, DashboardView, TransactionListView
+
+User = get_user_model()
+
+BENCHMARK_USER_PREFIX = 'benchmark-'
+
+
+def _get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _add_query_latency(seconds):
+    """
+    Delay every query of every connection, including those opened later by
+    other threads, by a fixed time, to model the round trip to a database
+    server when benchmarking against a local one.
+    """
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def add_delay(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    add_delay(None, connection)
+    connection_created.connect(add_delay, weak=False)
+
+
+def _render(view_class, url, user, params=None):
+    request = RequestFactory().get(url, params or {})
+    request.user = user
+    view = view_class.as_view()
+    if view_class.view_is_async:
+        # as the ASGI handler would, with the queries on the query pool
+        view = async_to_sync(view)
+    response = view(request)
+    if hasattr(response, 'render'):
+        response.render()
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the dashboard (sync and async), the transaction list (first and "
+        "deep pages) and the transaction create/update/delete paths for users with different "
+        "numbers of transactions, and write the results as JSON. Benchmark "
+        "users are generated on first use, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help="Comma separated numbers of transactions per benchmark user.")
+        parser.add_argument('--accounts', type=int, default=5, help="Accounts per benchmark user.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the generated data.")
+        parser.add_argument('--query-latency', type=float, default=0,
+                            help="Milliseconds added to every query, to model a database server over the network.")
+        parser.add_argument('--output', help="Write the JSON results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of numbers.")
+        if not sizes or min(sizes) < 1 or options['repeat'] < 1:
+            raise CommandError("--sizes and --repeat must be at least 1.")
+        if options['query_latency'] < 0:
+            raise CommandError("--query-latency must not be negative.")
+
+        results = {
+            'timestamp': timezone.now().isoformat(),
+            'git_commit': _get_git_commit(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'query_latency_ms': options['query_latency'],
+            'sizes': [],
+        }
+
+        users = [self._get_benchmark_user(size, options['accounts'], options['seed']) for size in sizes]
+        if options['query_latency']:
+            _add_query_latency(options['query_latency'] / 1000)
+
+        for size, user in zip(sizes, users):
+            self.stderr.write(f"Benchmarking {size} transactions...")
+            results['sizes'].append({
+                'transactions': size,
+                'benchmarks': self._run_benchmarks(user, options['repeat']),
+            })
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fileobj:
+                fileobj.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote results to {options['output']}."))
+        else:
+            self.stdout.write(output)
+
+    def _get_benchmark_user(self, size, accounts, seed):
+        prefix = f'{BENCHMARK_USER_PREFIX}{size}-{accounts}-{seed}-'
+        user = User.objects.filter(username__startswith=prefix).first()
+        if user is None:
+            self.stderr.write(f"Generating a user with {size} transactions...")
+            generate_fake_ledger(1, accounts, size, seed=seed, prefix=prefix)
+            user = User.objects.get(username__startswith=prefix)
+        return user
+
+    def _measure(self, run, repeat, setup=None):
+        """
+        Time repeated calls of run(), returning the timings in milliseconds
+        along with the number of queries issued by the last call, their total
+        time and the time of the slowest one. Queries run on other threads,
+        like those of the async dashboard, are not counted.
+        """
+        timings = []
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        return {
+            'min_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': recorder.count,
+            'query_ms': round(recorder.total_time * 1000, 3),
+            'slowest_query_ms': round(max((duration for duration, sql in recorder.queries), default=0) * 1000, 3),
+        }
+
+    def _run_benchmarks(self, user, repeat):
+        benchmarks = {}
+        dashboard_url = reverse('dashboard')
+        list_url = reverse('transaction_list')
+
+        benchmarks['dashboard'] = self._measure(
+            lambda: _render(DashboardView, dashboard_url, user), repeat,
+            setup=lambda: bump_data_version(user.pk),
+        )
+        benchmarks['dashboard_cached'] = self._measure(
+            lambda: _render(DashboardView, dashboard_url, user), repeat,
+        )
+        # compare with the sum and the slowest of the sync dashboard's queries
+        benchmarks['dashboard_async'] = self._measure(
+            lambda: _render(AsyncDashboardView, reverse('dashboard_async'), user), repeat,
+            setup=lambda: bump_data_version(user.pk),
+        )
+
+        transactions = Transaction.objects.filter(user=user).order_by('-date', '-pk')
+        benchmarks['transaction_list_first_page'] = self._measure(
+            lambda: _render(TransactionListView, list_url, user), repeat,
+        )
+        deep_row = transactions[int(transactions.count() * 0.9)]
+        deep_cursor = encode_cursor('next', deep_row)
+        benchmarks['transaction_list_deep_page'] = self._measure(
+            lambda: _render(TransactionListView, list_url, user, {'cursor': deep_cursor}), repeat,
+        )
+
+        benchmarks.update(self._measure_writes(user, repeat))
+        return benchmarks
+
+    def _measure_writes(self, user, repeat):
+        """
+        Time creating, updating and deleting one transaction through the ORM,
+        so every run goes through the signal handlers and leaves the data as
+        it found it.
+        """
+        account = user.accounts.order_by('pk').first()
+        category = Category.objects.filter(type='E').order_by('pk').first()
+        created = []
+
+        def create():
+            created.append(Transaction.objects.create(
+                user=user, account=account, category=category, amount=Decimal('12.34'),
+                date=date.today(), description='Benchmark'
+            ))
+
+        def update():
+            entry = created[-1]
+            entry.amount += Decimal('1.00')
+            entry.save()
+
+        def delete():
+            created.pop().delete()
+
+        try:
+            return {
+                'transaction_create': self._measure(create, repeat, setup=lambda: created and delete()),
+                'transaction_update': self._measure(update, repeat),
+                'transaction_delete': self._measure(delete, repeat, setup=create),
+            }
+        finally:
+            while created:
+                delete()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from budget.cache import CACHE_METRICS, get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Print the hit/miss counters of the budget caches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        for name in CACHE_METRICS:
+            stats = get_cache_stats(name)
+            self.stdout.write(
+                f"{name}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)"
+            )
+            if options['reset']:
+                reset_cache_stats(name)
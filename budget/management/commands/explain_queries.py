@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from budget.views import DashboardBalanceTrendView, DashboardSpendingView, DashboardView, TransactionListView
+
+User = get_user_model()
+
+# An empty cache private to this command, so every view computes its data
+# from the ledger instead of reading it back from the shared cache
+EXPLAIN_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'explain-queries',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the dashboard, its chart data and the transaction list for a user and print the "
+        "EXPLAIN plan of every query they run against the budget tables (the transactions and the "
+        "balances, totals and stats derived from them), computed with the cache bypassed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to run the views as (defaults to the user with most transactions).")
+        parser.add_argument('--month', type=int, help="Dashboard month.")
+        parser.add_argument('--year', type=int, help="Dashboard year.")
+        parser.add_argument('--analyze', action='store_true',
+                            help="Run EXPLAIN ANALYZE where the database supports it.")
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+
+        dashboard_params = {}
+        if options['month'] and options['year']:
+            dashboard_params = {'month': options['month'], 'year': options['year']}
+
+        views = [
+            ('Dashboard', DashboardView, reverse('dashboard'), dashboard_params),
+            ('Dashboard spending', DashboardSpendingView, reverse('dashboard_spending'), dashboard_params),
+            ('Dashboard balance trend', DashboardBalanceTrendView, reverse('dashboard_balance_trend'), dashboard_params),
+            ('Transaction list', TransactionListView, reverse('transaction_list'), {}),
+        ]
+
+        for title, view_class, url, params in views:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {title} =="))
+            for sql in self._capture_queries(view_class, url, params, user):
+                self.stdout.write(self.style.SQL_KEYWORD(sql))
+                for line in self._explain(sql, options['analyze']):
+                    self.stdout.write(f"    {line}")
+                self.stdout.write('')
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist.")
+
+        user = User.objects.annotate(
+            transaction_count=Count('transactions')
+        ).order_by('-transaction_count').first()
+        if user is None:
+            raise CommandError("There are no users to explain queries for.")
+        return user
+
+    def _capture_queries(self, view_class, url, params, user):
+        request = RequestFactory().get(url, params)
+        request.user = user
+        # the database cache table is named budget_cache by default
+        cache_table = connection.ops.quote_name(settings.CACHES['default']['LOCATION'])
+
+        with override_settings(CACHES=EXPLAIN_CACHES):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = view_class.as_view()(request)
+                if hasattr(response, 'render'):
+                    response.render()
+
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and '"budget_' in query['sql'] and cache_table not in query['sql']
+        ]
+
+    def _explain(self, sql, analyze):
+        options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+        prefix = connection.ops.explain_query_prefix(**options)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            return [
+                ' | '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
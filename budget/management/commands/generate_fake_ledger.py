@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.fake_ledger import FAKE_BATCH_SIZE, FAKE_USER_PREFIX, generate_fake_ledger
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fast-load fake users, accounts and transactions for load testing, "
+        "using bulk inserts and a seeded random generator."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Number of users to create.")
+        parser.add_argument('--accounts', type=int, default=5, help="Accounts per user.")
+        parser.add_argument('--transactions', type=int, default=1000, help="Transactions per user.")
+        parser.add_argument('--days', type=int, default=3 * 365,
+                            help="Spread the transactions over this many days up to today.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--prefix', default=FAKE_USER_PREFIX, help="Username prefix of the fake users.")
+        parser.add_argument('--batch-size', type=int, default=FAKE_BATCH_SIZE,
+                            help="Rows written per bulk insert.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['accounts'], options['transactions'], options['days']) < 1:
+            raise CommandError("--users, --accounts, --transactions and --days must be at least 1.")
+
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f"Users starting with '{options['prefix']}' already exist. Use another --prefix."
+            )
+
+        def progress(created_users):
+            if created_users % 100 == 0:
+                self.stdout.write(f"  {created_users}/{options['users']} users")
+
+        result = generate_fake_ledger(
+            options['users'],
+            options['accounts'],
+            options['transactions'],
+            seed=options['seed'],
+            days=options['days'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['users']} users, {result['accounts']} accounts and "
+            f"{result['transactions']} transactions in {result['seconds']:.2f}s "
+            f"({result['transactions'] / result['seconds']:.0f} transactions/s)."
+        ))
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.importers import (
+    IMPORT_CHUNK_SIZE, TransactionImportError, get_parser, import_transactions
+)
+from budget.models import Account, Category
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import transactions for a user from a CSV or OFX file, "
+        "updating each account balance once at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or OFX file to import.")
+        parser.add_argument('--user', required=True, help="Username that owns the transactions.")
+        parser.add_argument('--account', help="Account name used for rows without an 'account' column.")
+        parser.add_argument('--income-category', help="Category name for uncategorised positive amounts (required when there are any).")
+        parser.add_argument('--expense-category', help="Category name for uncategorised negative amounts.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Rows written per bulk insert.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        account = None
+        if options['account']:
+            account = Account.objects.filter(user=user, name=options['account']).first()
+            if account is None:
+                raise CommandError(f"Account '{options['account']}' does not exist for {user.username}.")
+
+        income_category = self._get_category(options['income_category'], 'I')
+        expense_category = self._get_category(options['expense_category'], 'E')
+
+        path = options['path']
+        parser = get_parser(path)
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig', errors='replace') as fileobj:
+                result = import_transactions(
+                    user,
+                    account,
+                    parser(fileobj),
+                    income_category=income_category,
+                    expense_category=expense_category,
+                    chunk_size=options['chunk_size'],
+                )
+        except OSError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        except TransactionImportError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} transactions in {result['seconds']:.2f}s "
+            f"({result['rows_per_second']:.0f} rows/s)."
+        ))
+
+    def _get_category(self, name, category_type):
+        if not name:
+            return None
+        category = Category.objects.filter(name=name, type=category_type).first()
+        if category is None:
+            raise CommandError(f"Category '{name}' of type {category_type} does not exist.")
+        return category
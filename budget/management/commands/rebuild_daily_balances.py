@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from budget.bulk import bulk_create_in_batches
+from budget.cache import bump_data_version
+from budget.models import Account, DailyBalance, Transaction
+
+User = get_user_model()
+
+
+def build_daily_balances(transactions, account_totals):
+    """
+    Yield DailyBalance rows from transactions ordered by user and descending
+    date, walking back from each user's current total balance.
+    """
+    rows = transactions.values('user_id', 'date').annotate(
+        change=Sum('signed_amount'), count=Count('id')
+    ).order_by('user_id', '-date')
+
+    user_id = None
+    closing = Decimal('0.00')
+
+    for row in rows.iterator(chunk_size=2000):
+        if row['user_id'] != user_id:
+            user_id = row['user_id']
+            closing = account_totals.get(user_id) or Decimal('0.00')
+
+        yield DailyBalance(balance=closing, **row)
+        closing -= row['change']
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily balances from the raw transactions and current account balances."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the daily balances of this username.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Rows written per bulk insert.")
+
+    def handle(self, *args, **options):
+        transactions = Transaction.objects.all()
+        accounts = Account.objects.all()
+        daily_balances = DailyBalance.objects.all()
+
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+            transactions = transactions.filter(user=user)
+            accounts = accounts.filter(user=user)
+            daily_balances = daily_balances.filter(user=user)
+
+        with transaction.atomic():
+            # lock the accounts, so no balance moves while the rows are rebuilt
+            account_totals = {}
+            for user_id, balance in accounts.select_for_update().order_by('pk').values_list('user_id', 'balance'):
+                account_totals[user_id] = account_totals.get(user_id, Decimal('0.00')) + balance
+
+            user_ids = set(daily_balances.values_list('user_id', flat=True).distinct())
+            user_ids |= set(transactions.values_list('user_id', flat=True).distinct())
+
+            deleted, _ = daily_balances.delete()
+            created = bulk_create_in_batches(
+                DailyBalance, build_daily_balances(transactions, account_totals), options['batch_size']
+            )
+
+            # cached dashboards still hold the old balance trend
+            for user_id in user_ids:
+                bump_data_version(user_id, ('transactions',))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replaced {deleted} daily balances with {created} rebuilt rows."
+        ))
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from budget.bulk import bulk_create_in_batches
+from budget.cache import bump_data_version
+from budget.models import MonthlyCategoryTotal, Transaction
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly category totals from the raw transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the totals of this username.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Rows written per bulk insert.")
+
+    def handle(self, *args, **options):
+        transactions = Transaction.objects.all()
+        totals = MonthlyCategoryTotal.objects.all()
+
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+            transactions = transactions.filter(user=user)
+            totals = totals.filter(user=user)
+
+        rows = transactions.values(
+            'user_id', 'category_id', year=ExtractYear('date'), month=ExtractMonth('date')
+        ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+        with transaction.atomic():
+            user_ids = set(totals.values_list('user_id', flat=True).distinct())
+            user_ids |= set(transactions.values_list('user_id', flat=True).distinct())
+
+            deleted, _ = totals.delete()
+            created = bulk_create_in_batches(
+                MonthlyCategoryTotal,
+                (MonthlyCategoryTotal(**row) for row in rows.iterator(chunk_size=options['batch_size'])),
+                options['batch_size'],
+            )
+
+            # cached dashboards still hold the old totals
+            for user_id in user_ids:
+                bump_data_version(user_id, ('transactions',))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replaced {deleted} monthly totals with {created} rebuilt rows."
+        ))
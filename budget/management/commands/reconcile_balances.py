@@ -0,0 +1,142 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from budget.cache import bump_cached_data_version
+from budget.ledger_stats import update_ledger_stats
+from budget.models import Account
+from budget.workers import init_worker, reconcile_chunk as reconcile_chunk_in_worker
+
+User = get_user_model()
+
+CENTS = Decimal('0.01')
+
+
+def find_balance_drift(user_ids):
+    """
+    Check the accounts of the given users with one grouped query. Returns the
+    number of accounts checked and (account id, user id, account name, stored
+    balance, expected balance) for every account whose balance differs from
+    its opening balance plus the signed sum of its transactions.
+    """
+    accounts = Account.objects.filter(user_id__in=user_ids).annotate(
+        net=Coalesce(Sum('transactions__signed_amount'), Value(Decimal('0.00')))
+    ).values_list('pk', 'user_id', 'name', 'balance', 'opening_balance', 'net').order_by()
+
+    checked = 0
+    drift = []
+    for pk, user_id, name, balance, opening_balance, net in accounts:
+        checked += 1
+        # SQLite sums decimals as floats, so round back to cents
+        expected = (opening_balance + net).quantize(CENTS)
+        if balance != expected:
+            drift.append((pk, user_id, name, balance, expected))
+    return checked, drift
+
+
+def fix_balance_drift(drift):
+    """
+    Move each drifted account balance by its drift in one bulk_update, and
+    each user's total balance by the sum of theirs. The drift is added to
+    the stored balance rather than overwriting it, so transactions saved
+    since it was measured are kept.
+    """
+    accounts = [
+        Account(pk=pk, balance=F('balance') + (expected - balance))
+        for pk, user_id, name, balance, expected in drift
+    ]
+    user_drift = {}
+    for pk, user_id, name, balance, expected in drift:
+        user_drift[user_id] = user_drift.get(user_id, Decimal('0.00')) + expected - balance
+
+    with transaction.atomic():
+        Account.objects.bulk_update(accounts, ['balance'])
+        for user_id, delta in user_drift.items():
+            update_ledger_stats(user_id, balance_delta=delta, create=False)
+
+    for user_id in user_drift:
+        bump_cached_data_version(user_id, ('accounts',))
+
+
+def reconcile_chunk(user_ids, fix):
+    """
+    Reconcile the accounts of a chunk of users, returning (checked, drift).
+    """
+    checked, drift = find_balance_drift(user_ids)
+    if fix and drift:
+        fix_balance_drift(drift)
+    return checked, drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every account balance from its opening balance plus its "
+        "signed transactions and report (or fix) any drift. Chunks of users "
+        "are reconciled in parallel worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only reconcile the accounts of this username.")
+        parser.add_argument('--fix', action='store_true', help="Correct drifted balances with bulk_update.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users reconciled per grouped query.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (1 runs everything in this process).")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-size and --workers must be at least 1.")
+
+        started = time.perf_counter()
+        user_ids = self._get_user_ids(options['user'])
+        chunk_size = options['chunk_size']
+        chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+        workers = min(options['workers'], len(chunks))
+
+        if workers <= 1:
+            results = [reconcile_chunk(chunk, options['fix']) for chunk in chunks]
+        else:
+            database_names = {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(database_names,)) as executor:
+                results = list(executor.map(reconcile_chunk_in_worker, chunks, [options['fix']] * len(chunks)))
+
+        checked = 0
+        drifted = []
+        for chunk_checked, chunk_drift in results:
+            checked += chunk_checked
+            drifted.extend(chunk_drift)
+
+        for pk, user_id, name, balance, expected in drifted:
+            self.stdout.write(self.style.WARNING(
+                f"Account {pk} '{name}' of user {user_id}: balance {balance}, "
+                f"expected {expected} (drift {balance - expected})."
+            ))
+
+        elapsed = time.perf_counter() - started
+        summary = f"Checked {checked} accounts of {len(user_ids)} users in {elapsed:.2f}s: {len(drifted)} drifted"
+        if drifted and options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{summary}, all fixed. Run rebuild_daily_balances and rebuild_monthly_totals "
+                f"if the drift came from edited transactions."
+            ))
+        elif drifted:
+            self.stdout.write(self.style.ERROR(f"{summary}. Run again with --fix to correct them."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary}."))
+
+    def _get_user_ids(self, username):
+        if username:
+            try:
+                return [User.objects.get(username=username).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist.")
+
+        return list(Account.objects.values_list('user_id', flat=True).distinct().order_by('user_id'))
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.recurring import RECURRING_BATCH_SIZE, run_recurring
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the transactions of every recurring schedule that has fallen "
+        "due, for all users, in bulk. Safe to rerun at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help="Create the occurrences due up to this day (YYYY-MM-DD) instead of today.")
+        parser.add_argument('--batch-size', type=int, default=RECURRING_BATCH_SIZE,
+                            help="Schedules locked and created per atomic block.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        def progress(schedules, occurrences):
+            self.stdout.write(f"  {schedules} schedules, {occurrences} transactions")
+
+        result = run_recurring(options['date'], batch_size=options['batch_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['occurrences']} transactions from {result['schedules']} "
+            f"recurring schedules in {result['seconds']:.2f}s."
+        ))
@@ -0,0 +1,139 @@
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('budget.queries')
+
+# Response headers carrying the totals when QUERY_COUNT_HEADERS is enabled
+QUERY_COUNT_HEADER = 'X-Query-Count'
+QUERY_TIME_HEADER = 'X-Query-Time'
+
+# Recorder of the request being handled, which the query pool also installs
+# on the connections of its threads
+_current_recorder = ContextVar('budget_query_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper recording the duration and SQL of every query.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - started, sql))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for duration, sql in self.queries)
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:limit]
+
+
+def get_query_recorder():
+    """
+    Return the QueryRecorder of the request being handled, if any.
+    """
+    return _current_recorder.get()
+
+
+def recording_queries(recorder):
+    """
+    Return a context manager installing a recorder on every connection of
+    the current thread.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+class QueryCountMiddleware:
+    """
+    Record the number of queries and the total SQL time of every request,
+    including those run on the threads of the query pool, log them along
+    with the slowest statements, and add them as response headers when the
+    QUERY_COUNT_HEADERS setting is enabled. Streaming responses are only
+    logged, once their content has been sent. Async requests stay async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            with recording_queries(recorder):
+                response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self._process_response(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            with recording_queries(recorder):
+                response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self._process_response(request, response, recorder)
+
+    def _process_response(self, request, response, recorder):
+        if getattr(response, 'streaming', False):
+            # the rows of a streamed response are queried while it is sent,
+            # after the headers, so only log the totals once it is done
+            if response.is_async:
+                response.streaming_content = self._arecord_stream(request, response.streaming_content, recorder)
+            else:
+                response.streaming_content = self._record_stream(request, response.streaming_content, recorder)
+            return response
+
+        self._log(request, recorder)
+        if getattr(settings, 'QUERY_COUNT_HEADERS', False):
+            response[QUERY_COUNT_HEADER] = str(recorder.count)
+            response[QUERY_TIME_HEADER] = f'{recorder.total_time * 1000:.1f}'
+
+        return response
+
+    def _record_stream(self, request, content, recorder):
+        with recording_queries(recorder):
+            yield from content
+        self._log(request, recorder)
+
+    async def _arecord_stream(self, request, content, recorder):
+        with recording_queries(recorder):
+            async for chunk in content:
+                yield chunk
+        self._log(request, recorder)
+
+    def _log(self, request, recorder):
+        if not recorder.count:
+            return
+        logger.info("%s %s: %d queries in %.1f ms", request.method, request.path,
+                    recorder.count, recorder.total_time * 1000)
+        for duration, sql in recorder.slowest(getattr(settings, 'QUERY_COUNT_SLOWEST', 5)):
+            logger.debug("  %.1f ms: %s", duration * 1000, sql)
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.26 on 2026-10-18 13:10
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+import django.db.models.deletion
+
+
+def backfill_monthly_totals(apps, schema_editor):
+    Transaction = apps.get_model('budget', 'Transaction')
+    MonthlyCategoryTotal = apps.get_model('budget', 'MonthlyCategoryTotal')
+
+    rows = Transaction.objects.values(
+        'user_id', 'category_id', year=ExtractYear('date'), month=ExtractMonth('date')
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    # bulk_create() would turn a generator into one list, so insert in batches
+    totals = (MonthlyCategoryTotal(**row) for row in rows.iterator(chunk_size=2000))
+    while True:
+        batch = list(islice(totals, 2000))
+        if not batch:
+            break
+        MonthlyCategoryTotal.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0005_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to='budget.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'indexes': [models.Index(fields=['user', 'year', 'month'], name='monthly_total_user_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycategorytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'year', 'month'), name='monthly_total_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycategorytotal',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'year', 'month'), name='monthly_total_uncategorised_unique'),
+        ),
+        migrations.RunPython(backfill_monthly_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.26 on 2026-10-18 13:13
+
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, Count, DecimalField, F, Sum, When
+import django.db.models.deletion
+
+
+def backfill_daily_balances(apps, schema_editor):
+    Account = apps.get_model('budget', 'Account')
+    Transaction = apps.get_model('budget', 'Transaction')
+    DailyBalance = apps.get_model('budget', 'DailyBalance')
+
+    account_totals = dict(
+        Account.objects.values('user_id').annotate(total=Sum('balance')).values_list('user_id', 'total')
+    )
+    signed_amount = Case(
+        When(category__type='I', then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    rows = Transaction.objects.values('user_id', 'date').annotate(
+        change=Sum(signed_amount), count=Count('id')
+    ).order_by('user_id', '-date')
+
+    batch = []
+    user_id = None
+    closing = Decimal('0.00')
+
+    for row in rows.iterator(chunk_size=2000):
+        if row['user_id'] != user_id:
+            user_id = row['user_id']
+            closing = account_totals.get(user_id) or Decimal('0.00')
+
+        batch.append(DailyBalance(balance=closing, **row))
+        closing -= row['change']
+
+        if len(batch) >= 2000:
+            DailyBalance.objects.bulk_create(batch)
+            batch = []
+
+    DailyBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0006_monthlycategorytotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('change', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_balances, migrations.RunPython.noop),
+    ]
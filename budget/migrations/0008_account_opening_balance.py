@@ -0,0 +1,47 @@
+# Generated by Django 4.2.26 on 2026-10-18 13:29
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Sum, When
+
+
+def backfill_opening_balances(apps, schema_editor):
+    Account = apps.get_model('budget', 'Account')
+    Transaction = apps.get_model('budget', 'Transaction')
+
+    signed_amount = Case(
+        When(category__type='I', then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    nets = dict(
+        Transaction.objects.values('account_id').annotate(net=Sum(signed_amount)).values_list('account_id', 'net')
+    )
+
+    batch = []
+    for account in Account.objects.only('pk', 'balance').iterator(chunk_size=2000):
+        account.opening_balance = account.balance - (nets.get(account.pk) or Decimal('0.00'))
+        batch.append(account)
+
+        if len(batch) >= 2000:
+            Account.objects.bulk_update(batch, ['opening_balance'])
+            batch = []
+
+    Account.objects.bulk_update(batch, ['opening_balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0007_dailybalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='opening_balance',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_opening_balances, migrations.RunPython.noop),
+    ]
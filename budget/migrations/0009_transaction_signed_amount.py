@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-18 13:42
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_signed_amounts(apps, schema_editor):
+    Transaction = apps.get_model('budget', 'Transaction')
+
+    # two set-based updates: income is positive, everything else negative
+    Transaction.objects.filter(category__type='I').update(signed_amount=F('amount'))
+    Transaction.objects.exclude(category__type='I').update(signed_amount=-F('amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0008_account_opening_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='signed_amount',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_signed_amounts, migrations.RunPython.noop),
+    ]
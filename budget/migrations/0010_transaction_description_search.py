@@ -0,0 +1,74 @@
+# Generated by Django 4.2.26 on 2026-10-18 14:20
+
+from django.db import migrations
+
+# SQLite: an FTS5 table reading its content from budget_transaction, kept in
+# sync by triggers so bulk_create and queryset updates are indexed as well
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE budget_transaction_fts USING fts5(
+        description, content='budget_transaction', content_rowid='id',
+        prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER budget_transaction_fts_insert AFTER INSERT ON budget_transaction BEGIN
+        INSERT INTO budget_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER budget_transaction_fts_delete AFTER DELETE ON budget_transaction BEGIN
+        INSERT INTO budget_transaction_fts(budget_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER budget_transaction_fts_update AFTER UPDATE OF description ON budget_transaction BEGIN
+        INSERT INTO budget_transaction_fts(budget_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO budget_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    # index the rows that already exist
+    "INSERT INTO budget_transaction_fts(budget_transaction_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS budget_transaction_fts_insert",
+    "DROP TRIGGER IF EXISTS budget_transaction_fts_delete",
+    "DROP TRIGGER IF EXISTS budget_transaction_fts_update",
+    "DROP TABLE IF EXISTS budget_transaction_fts",
+]
+
+# PostgreSQL: a GIN index on the same expression budget.search builds
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX transaction_description_fts_idx ON budget_transaction
+    USING gin (to_tsvector('simple'::regconfig, COALESCE(description, '')))
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS transaction_description_fts_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0009_transaction_signed_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.26 on 2026-10-18 14:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+import django.db.models.deletion
+
+
+def backfill_ledger_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Account = apps.get_model('budget', 'Account')
+    Transaction = apps.get_model('budget', 'Transaction')
+    UserLedgerStats = apps.get_model('budget', 'UserLedgerStats')
+
+    # two grouped queries for every user at once
+    transactions = {
+        row['user_id']: row for row in Transaction.objects.values('user_id').annotate(
+            first_date=Min('date'), last_date=Max('date'), transaction_count=Count('id')
+        ).order_by()
+    }
+    balances = dict(
+        Account.objects.values('user_id').annotate(total=Sum('balance')).order_by().values_list('user_id', 'total')
+    )
+
+    stats = []
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        row = transactions.get(user_id, {})
+        stats.append(UserLedgerStats(
+            user_id=user_id,
+            first_date=row.get('first_date'),
+            last_date=row.get('last_date'),
+            transaction_count=row.get('transaction_count', 0),
+            total_balance=balances.get(user_id) or 0,
+        ))
+    UserLedgerStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('budget', '0011_recurringtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLedgerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('first_date', models.DateField(blank=True, null=True)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('total_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'User ledger stats',
+            },
+        ),
+        migrations.RunPython(backfill_ledger_stats, migrations.RunPython.noop),
+    ]
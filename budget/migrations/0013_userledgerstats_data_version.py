@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0012_userledgerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userledgerstats',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth import get_user_model
+from dateutil.relativedelta import relativedelta
 
 User = get_user_model()
 
@@ -50,6 +52,12 @@ class Account(models.Model):
         decimal_places=2,
         default=0.00
     )
+    # Balance before any transaction: balance = opening_balance + signed transaction amounts
+    opening_balance = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0.00
+    )
 
     class Meta:
         unique_together = ('user', 'name')
@@ -81,6 +89,16 @@ class Transaction(models.Model):
         related_name='transactions'
     )
 
+    # Schedule this transaction was created from by run_recurring, if any
+    recurring = models.ForeignKey(
+        'RecurringTransaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='occurrences'
+    )
+
     # -- Fields -- #
     amount = models.DecimalField(
         max_digits=10,
@@ -88,6 +106,15 @@ class Transaction(models.Model):
         null=False
     )
 
+    # Amount as it affects the account balance: positive for income, negative
+    # for expenses. Set by the pre_save signal so balance math never joins Category.
+    signed_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0.00,
+        editable=False
+    )
+
     date = models.DateField(
         null=False
     )
@@ -98,12 +125,80 @@ class Transaction(models.Model):
         blank=False
     )
 
+    # Fields whose loaded values are remembered so the signals can tell what
+    # changed without re-fetching the row.
+    TRACKED_FIELDS = ('amount', 'signed_amount', 'account_id', 'category_id', 'date', 'user_id')
+
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Access paths of the dashboard, list and balance trend queries,
+            # which always filter by user and a date range
+            models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'account', 'date'], name='transaction_user_acct_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='transaction_user_cat_date_idx'),
+        ]
+        constraints = [
+            # a schedule never creates the same occurrence twice, even across crashed or concurrent runs
+            models.UniqueConstraint(
+                fields=['recurring', 'date'],
+                condition=Q(recurring__isnull=False),
+                name='transaction_recurring_date_unique'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.description} - {self.amount} on {self.date} ({self.user.username})"
 
+    # The signals update the balances, totals and stats in the same database
+    # transaction as the row itself, so a failure there leaves neither behind.
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            return super().delete(*args, **kwargs)
+
+    # -- Change tracking -- #
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.remember_loaded_state(fields)
+
+    def remember_loaded_state(self, fields=None):
+        """
+        Snapshot the tracked fields as they are stored in the database.
+        """
+        state = getattr(self, '_loaded_state', {})
+        if fields is None:
+            state = {}
+        else:
+            fields = {self._meta.get_field(name).attname for name in fields}
+
+        for field in self.TRACKED_FIELDS:
+            if (fields is None or field in fields) and field in self.__dict__:
+                state[field] = self.__dict__[field]
+
+        self._loaded_state = state
+
+    def get_loaded_state(self):
+        """
+        Return the remembered tracked fields, or None when the instance was not
+        loaded from the database (or some of those fields were deferred).
+        """
+        state = getattr(self, '_loaded_state', None)
+        if self._state.adding or not state:
+            return None
+        if any(field not in state for field in self.TRACKED_FIELDS):
+            return None
+        return state
+
 
 # -- Budget Model -- #
 class Budget(models.Model):
@@ -141,3 +236,279 @@ class Budget(models.Model):
 
     def __str__(self):
         return f"Budget for {self.category.name} - {self.month}/{self.year} ({self.user.username})"
+
+
+# -- Monthly Category Total Model -- #
+class MonthlyCategoryTotal(models.Model):
+    """
+    Sum and count of a user's transactions per category and month, kept up to
+    date by the transaction signals so summaries never scan raw transactions.
+    Uncategorised transactions are kept in a row with no category.
+    """
+    # -- Foreign Keys -- #
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='monthly_totals'
+    )
+
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='monthly_totals'
+    )
+
+    # -- Fields -- #
+    year = models.IntegerField(
+        null=False
+    )
+    month = models.IntegerField(
+        null=False
+    )
+
+    total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0.00
+    )
+
+    count = models.IntegerField(
+        default=0
+    )
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'year', 'month'],
+                name='monthly_total_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month'],
+                condition=Q(category__isnull=True),
+                name='monthly_total_uncategorised_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='monthly_total_user_month_idx'),
+        ]
+
+    def __str__(self):
+        category_name = self.category.name if self.category else 'Uncategorised'
+        return f"Total for {category_name} - {self.month}/{self.year} ({self.user.username})"
+
+
+# -- Daily Balance Model -- #
+class DailyBalance(models.Model):
+    """
+    Closing balance across all of a user's accounts on each day that has
+    transactions, together with that day's net change and transaction count. Kept up to date by the
+    transaction and account signals, so the balance trend reads one row per day.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_balances'
+    )
+
+    date = models.DateField(
+        null=False
+    )
+
+    balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0.00
+    )
+
+    change = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0.00
+    )
+
+    count = models.IntegerField(
+        default=0
+    )
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Balance on {self.date}: {self.balance} ({self.user.username})"
+
+
+# -- User Ledger Stats Model -- #
+class UserLedgerStats(models.Model):
+    """
+    Dates of a user's first and last transactions, their number and the total
+    balance across the user's accounts, in one row per user. Kept up to date
+    by the transaction and account signals, so the dashboard reads one row
+    instead of scanning transactions and summing accounts.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ledger_stats'
+    )
+
+    first_date = models.DateField(
+        null=True,
+        blank=True
+    )
+    last_date = models.DateField(
+        null=True,
+        blank=True
+    )
+
+    transaction_count = models.IntegerField(
+        default=0
+    )
+
+    total_balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0.00
+    )
+
+    # Bumped with every change to the user's data, so the ETags of their
+    # pages never depend on a cache that may be stale or local to a process
+    data_version = models.PositiveBigIntegerField(
+        default=0
+    )
+
+    class Meta:
+        verbose_name_plural = "User ledger stats"
+
+    def __str__(self):
+        return f"Ledger stats ({self.user.username})"
+
+
+# -- Recurring Transaction Model -- #
+class RecurringTransaction(models.Model):
+    """
+    A transaction repeated on a schedule, such as rent or a salary. The
+    run_recurring command creates every occurrence that has fallen due and
+    moves next_due past it.
+    """
+    CADENCE_CHOICES = [
+        ('W', 'Weekly'),
+        ('M', 'Monthly'),
+        ('Y', 'Yearly'),
+    ]
+
+    # -- Foreign Keys -- #
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recurring_transactions'
+    )
+
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='recurring_transactions'
+    )
+
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='recurring_transactions',
+    )
+
+    # -- Fields -- #
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=False
+    )
+
+    description = models.TextField(
+        max_length=255,
+        null=False,
+        blank=False
+    )
+
+    cadence = models.CharField(
+        max_length=1,
+        choices=CADENCE_CHOICES,
+        default='M',
+        null=False
+    )
+
+    # Date of the first occurrence; later ones fall on the same day of the
+    # week, month or year (or the last day of a shorter month)
+    start_date = models.DateField(
+        null=False
+    )
+
+    next_due = models.DateField(
+        null=False
+    )
+
+    end_date = models.DateField(
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        ordering = ['next_due']
+        indexes = [
+            models.Index(fields=['next_due'], name='recurring_next_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.description} - {self.amount} {self.get_cadence_display().lower()} ({self.user.username})"
+
+    def save(self, *args, **kwargs):
+        if self.next_due is None:
+            self.next_due = self.start_date
+        super().save(*args, **kwargs)
+
+    def occurrence(self, number):
+        """
+        Date of the given occurrence, counting the start date as occurrence 0.
+        Months and years are counted from the start date, so a schedule on
+        the 31st comes back to the 31st after a shorter month.
+        """
+        if self.cadence == 'W':
+            return self.start_date + relativedelta(weeks=number)
+        if self.cadence == 'Y':
+            return self.start_date + relativedelta(years=number)
+        return self.start_date + relativedelta(months=number)
+
+    def _occurrence_number(self, day):
+        """
+        Number of the first occurrence on or after the given day.
+        """
+        if self.cadence == 'W':
+            number = -(-(day - self.start_date).days // 7)
+        elif self.cadence == 'Y':
+            number = day.year - self.start_date.year
+        else:
+            number = (day.year - self.start_date.year) * 12 + day.month - self.start_date.month
+
+        number = max(number, 0)
+        while self.occurrence(number) < day:
+            number += 1
+        return number
+
+    def due_occurrences(self, today):
+        """
+        Return the dates of every occurrence from next_due up to and including
+        today (and the end date, if any), and the date the one after them is due.
+        """
+        last_day = min(today, self.end_date) if self.end_date else today
+        number = self._occurrence_number(self.next_due)
+
+        dates = []
+        day = self.occurrence(number)
+        while day <= last_day:
+            dates.append(day)
+            number += 1
+            day = self.occurrence(number)
+        return dates, day
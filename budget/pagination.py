@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.db.models import Q
+
+
+def encode_cursor(direction, obj):
+    """
+    Encode the (date, pk) position of an object as an opaque URL-safe cursor.
+    """
+    raw = json.dumps([direction, obj.date.isoformat(), obj.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into (direction, date, pk), or None when it is missing or invalid.
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, day, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, date.fromisoformat(day), int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, count=None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.count = count
+        self.next_cursor = encode_cursor('next', object_list[-1]) if has_next else None
+        self.previous_cursor = encode_cursor('prev', object_list[0]) if has_previous else None
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first by seeking past the (date, pk) of the
+    last row shown, so every page costs the same as the first one and no
+    COUNT(*) is needed unless asked for.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, cursor=None, with_count=False):
+        position = decode_cursor(cursor)
+        queryset = self.queryset
+
+        if position is None:
+            rows = list(queryset.order_by('-date', '-pk')[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+
+        else:
+            direction, day, pk = position
+
+            if direction == 'next':
+                rows = list(queryset.filter(
+                    Q(date__lt=day) | Q(date=day, pk__lt=pk)
+                ).order_by('-date', '-pk')[:self.per_page + 1])
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                rows = list(queryset.filter(
+                    Q(date__gt=day) | Q(date=day, pk__gt=pk)
+                ).order_by('date', 'pk')[:self.per_page + 1])
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        count = queryset.count() if with_count else None
+        return KeysetPage(rows, has_next and bool(rows), has_previous and bool(rows), count)
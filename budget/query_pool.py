@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .middleware import get_query_recorder, recording_queries
+
+# Threads running the independent queries of async views. Each thread has
+# its own database connections, kept open for CONN_MAX_AGE like those of a
+# request thread.
+QUERY_POOL_WORKERS = getattr(settings, 'QUERY_POOL_WORKERS', 4)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=QUERY_POOL_WORKERS, thread_name_prefix='budget-query')
+    return _executor
+
+
+def _run_on_pool(call, recorder):
+    # Drop connections that are broken or past CONN_MAX_AGE before and after
+    # the call, as Django does around every request
+    close_old_connections()
+    try:
+        if recorder is None:
+            return call()
+        # count the queries of the thread in the request that started them
+        with recording_queries(recorder):
+            return call()
+    finally:
+        close_old_connections()
+
+
+def _in_atomic_block():
+    return connection.in_atomic_block
+
+
+async def run_concurrently(*calls):
+    """
+    Run independent callables that query the database at the same time, one
+    per thread of the query pool, and return their results in order. When
+    the caller is inside a transaction, the calls run one after another on
+    its connection instead, since other connections would not see its
+    uncommitted rows.
+    """
+    if await sync_to_async(_in_atomic_block)():
+        return [await sync_to_async(call)() for call in calls]
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    recorder = get_query_recorder()
+    return await asyncio.gather(*(loop.run_in_executor(executor, _run_on_pool, call, recorder) for call in calls))
@@ -0,0 +1,117 @@
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Case, CharField, DecimalField, F, FilteredRelation, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Budget
+
+# Longest range of months a budget report may cover
+BUDGET_REPORT_MAX_MONTHS = 36
+
+# Share of a budget above which it is shown as nearly used up
+BUDGET_WARNING_RATIO = Decimal('0.75')
+
+
+def month_range_q(first_month, last_month):
+    """
+    Filter rows with year and month fields to the months between two dates, inclusive.
+    """
+    after_start = Q(year__gt=first_month.year) | Q(year=first_month.year, month__gte=first_month.month)
+    before_end = Q(year__lt=last_month.year) | Q(year=last_month.year, month__lte=last_month.month)
+    return after_start & before_end
+
+
+def budget_vs_actual(user, first_month, last_month):
+    """
+    Return every budget of the user between two months along with the
+    amount spent in its category that month, the amount remaining, the
+    percentage used and a status. The spending comes from the monthly
+    category totals, which are already grouped per (category, year, month)
+    and are joined to the budgets on those columns, and all the arithmetic
+    is done by the database in the same query.
+    """
+    return Budget.objects.filter(
+        month_range_q(first_month, last_month), user=user
+    ).annotate(
+        actual=FilteredRelation('category__monthly_totals', condition=Q(
+            category__monthly_totals__user=F('user'),
+            category__monthly_totals__year=F('year'),
+            category__monthly_totals__month=F('month'),
+        )),
+        category_name=F('category__name'),
+        limit=F('limit_amount'),
+        spent=Coalesce('actual__total', Value(Decimal('0.00')), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        remaining=F('limit_amount') - F('spent'),
+        percent_used=Case(
+            When(limit_amount__gt=0, then=Cast('spent', FloatField()) * 100 / Cast('limit_amount', FloatField())),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        status=Case(
+            When(limit_amount__gt=0, spent__gt=F('limit_amount'), then=Value('danger')),
+            When(limit_amount__gt=0, spent__gt=F('limit_amount') * BUDGET_WARNING_RATIO, then=Value('warning')),
+            default=Value('success'),
+            output_field=CharField(),
+        ),
+    ).values(
+        'category_id', 'category_name', 'year', 'month', 'limit', 'spent', 'remaining', 'percent_used', 'status'
+    ).order_by('category_name', 'year', 'month')
+
+
+def build_budget_report(user, first_month, last_month):
+    """
+    Lay out budget_vs_actual() as a grid with one row per budgeted category
+    and one column per month, plus totals for every row and column. Months
+    without a budget for a category are left empty.
+    """
+    months = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        months.append(month)
+        month += relativedelta(months=1)
+    columns = {(month.year, month.month): index for index, month in enumerate(months)}
+
+    rows = {}
+    column_totals = [{'limit': Decimal('0.00'), 'spent': Decimal('0.00')} for month in months]
+
+    for cell in budget_vs_actual(user, first_month, last_month):
+        row = rows.get(cell['category_id'])
+        if row is None:
+            row = rows[cell['category_id']] = {
+                'category_name': cell['category_name'],
+                'cells': [None] * len(months),
+                'limit': Decimal('0.00'),
+                'spent': Decimal('0.00'),
+            }
+
+        index = columns[(cell['year'], cell['month'])]
+        row['cells'][index] = cell
+        for total in (row, column_totals[index]):
+            total['limit'] += cell['limit']
+            total['spent'] += cell['spent']
+
+    rows = list(rows.values())
+    for total in [*rows, *column_totals]:
+        total['remaining'] = total['limit'] - total['spent']
+
+    grand_total = {
+        'limit': sum((row['limit'] for row in rows), Decimal('0.00')),
+        'spent': sum((row['spent'] for row in rows), Decimal('0.00')),
+    }
+    grand_total['remaining'] = grand_total['limit'] - grand_total['spent']
+
+    return {
+        'months': months,
+        'rows': rows,
+        'column_totals': column_totals,
+        'grand_total': grand_total,
+    }
+
+
+def default_report_range(today):
+    """
+    The calendar year of the given day.
+    """
+    return date(today.year, 1, 1), date(today.year, 12, 1)
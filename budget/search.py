@@ -0,0 +1,52 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+# Full-text index of the transaction descriptions on SQLite: an FTS5 table
+# reading its content from budget_transaction, kept in sync by triggers
+# (see migration 0010)
+SQLITE_FTS_TABLE = 'budget_transaction_fts'
+
+# Text search configuration of the GIN expression index on PostgreSQL. The
+# search below builds the same expression, so the planner can use the index.
+POSTGRES_SEARCH_CONFIG = 'simple'
+
+# Words of a search, each matched as the prefix of a word in the description
+SEARCH_TERM_RE = re.compile(r'[^\W_]+')
+SEARCH_MAX_TERMS = 8
+
+
+def search_terms(text):
+    return SEARCH_TERM_RE.findall(text.lower())[:SEARCH_MAX_TERMS]
+
+
+def search_transactions(queryset, text):
+    """
+    Filter transactions to those whose description contains a word starting
+    with every word of the search text, using the full-text index of the
+    database backend. Backends without one fall back to icontains.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.annotate(
+            description_vector=SearchVector('description', config=POSTGRES_SEARCH_CONFIG)
+        ).filter(
+            description_vector=SearchQuery(query, config=POSTGRES_SEARCH_CONFIG, search_type='raw')
+        )
+
+    if connection.vendor == 'sqlite':
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', [query]
+        ))
+
+    for term in terms:
+        queryset = queryset.filter(description__icontains=term)
+    return queryset
@@ -1,60 +1,546 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from bisect import bisect_right
+from decimal import Decimal
+from django.core.signals import request_finished
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
-from .models import Transaction
+from .cache import bump_cached_data_version, bump_category_version, bump_data_version, flush_cache_stats, get_category
+from .ledger_stats import apply_ledger_stats, update_ledger_stats
+from .models import Account, Budget, Category, DailyBalance, MonthlyCategoryTotal, Transaction
 
-# -- pre_save signal to revert the old amount before updating a Transaction -- #
+
+CENTS = Decimal('0.01')
+
+
+# -- Balance helpers -- #
+def signed_amount(amount, category_type):
+    """
+    Return the amount as it affects an account balance: positive for income,
+    negative for expenses (and uncategorised transactions).
+    """
+    return amount if category_type == 'I' else -amount
+
+
+def signed_amount_expression(category_type):
+    """
+    Database-side equivalent of signed_amount() for transactions of one category type.
+    """
+    return F('amount') if category_type == 'I' else -F('amount')
+
+
+def _apply_balance_delta(account_id, delta):
+    """
+    Add a delta to an account balance in a single UPDATE statement, so that
+    concurrent writers never overwrite each other's changes.
+    """
+    if delta:
+        Account.objects.filter(pk=account_id).update(balance=F('balance') + delta)
+
+
+def apply_balance_deltas(deltas):
+    """
+    Apply a mapping of account id -> balance delta in one atomic block.
+    Used by the signal handlers and by bulk write paths that skip the signals.
+    """
+    deltas = {account_id: delta for account_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic(savepoint=False):
+        for account_id, delta in deltas.items():
+            _apply_balance_delta(account_id, delta)
+
+
+# -- Monthly total helpers -- #
+def _upsert_monthly_total(user_id, category_id, year, month, amount, count):
+    """
+    Add to a monthly total with an UPDATE, creating the row on first use.
+    Rows are never created for removals, so deleting a user's data cannot
+    recreate totals for rows that were already cascaded away.
+    """
+    lookup = {'user_id': user_id, 'category_id': category_id, 'year': year, 'month': month}
+    changes = {'total': F('total') + amount, 'count': F('count') + count}
+
+    if MonthlyCategoryTotal.objects.filter(**lookup).update(**changes) or count <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            MonthlyCategoryTotal.objects.create(total=amount, count=count, **lookup)
+    except IntegrityError:
+        # Another writer created the row first
+        MonthlyCategoryTotal.objects.filter(**lookup).update(**changes)
+
+
+def apply_monthly_totals(changes):
+    """
+    Apply a mapping of (user id, category id, year, month) -> (amount, count)
+    to the monthly totals in one atomic block.
+    """
+    changes = {key: change for key, change in changes.items() if any(change)}
+    if not changes:
+        return
+
+    with transaction.atomic(savepoint=False):
+        for (user_id, category_id, year, month), (amount, count) in changes.items():
+            _upsert_monthly_total(user_id, category_id, year, month, amount, count)
+
+
+# -- Daily balance helpers -- #
+def _shift_daily_balances(user_id, delta):
+    """
+    Move every daily balance of a user by the same amount, used when an
+    account balance changes without a transaction (new, edited or deleted account).
+    """
+    if delta:
+        DailyBalance.objects.filter(user_id=user_id).update(balance=F('balance') + delta)
+
+
+def _create_daily_balances(user_id, created, cumulative):
+    """
+    Insert the rows of days that had no transactions yet. Another writer may
+    create the same day first, in which case its row is updated instead.
+    """
+    try:
+        with transaction.atomic():
+            DailyBalance.objects.bulk_create(created)
+    except IntegrityError:
+        for row in created:
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+            except IntegrityError:
+                DailyBalance.objects.filter(user_id=user_id, date=row.date).update(
+                    balance=F('balance') + cumulative[row.date],
+                    change=F('change') + row.change,
+                    count=F('count') + row.count,
+                )
+
+
+def _apply_user_daily_balances(user_id, changes):
+    """
+    Apply the sorted (day, amount, count) changes of one user. One UPDATE
+    moves every row from the first changed day on by the sum of the changes
+    up to its date and another adds each changed day's own amount and count,
+    so the number of queries does not grow with the number of days.
+    """
+    rows = DailyBalance.objects.filter(user_id=user_id)
+    days = [day for day, amount, count in changes]
+
+    cumulative = {}
+    running = 0
+    for day, amount, count in changes:
+        running += amount
+        cumulative[day] = running
+
+    decimal_field = DecimalField(max_digits=14, decimal_places=2)
+
+    # the latest changed day on or before a row's date carries the row's shift
+    rows.filter(date__gte=days[0]).update(balance=F('balance') + Case(
+        *[When(date__gte=day, then=Value(cumulative[day])) for day in reversed(days)],
+        default=Value(0), output_field=decimal_field,
+    ))
+    updated = rows.filter(date__in=days).update(
+        change=F('change') + Case(
+            *[When(date=day, then=Value(amount)) for day, amount, count in changes],
+            default=Value(0), output_field=decimal_field,
+        ),
+        count=F('count') + Case(
+            *[When(date=day, then=Value(count)) for day, amount, count in changes],
+            default=Value(0), output_field=IntegerField(),
+        ),
+    )
+
+    if updated == len(days):
+        existing = set(days)
+    else:
+        existing = set(rows.filter(date__in=days).values_list('date', flat=True))
+
+    # rows are only created for additions, seeded from the later rows, so
+    # emptied days are deleted only once those have been read
+    missing = [(day, amount, count) for day, amount, count in changes if day not in existing and count > 0]
+    created = _build_missing_daily_balances(user_id, rows, changes, cumulative, missing) if missing else []
+
+    removed = [day for day, amount, count in changes if day in existing and count < 0]
+    if removed:
+        # forget days that no longer have any transactions
+        rows.filter(date__in=removed, count__lte=0).delete()
+
+    if created:
+        _create_daily_balances(user_id, created, cumulative)
+
+
+def _build_missing_daily_balances(user_id, rows, changes, cumulative, missing):
+    """
+    Build the unsaved rows of the changed days that have no row yet, each
+    closing at the opening balance of the next day with a row, or at the
+    current total balance when there is none.
+    """
+    later_rows = []
+    if len(missing) > 1:
+        later_rows = list(rows.filter(date__gt=missing[0][0], date__lte=missing[-1][0]).order_by('date').values(
+            'date', 'balance', 'change'))
+    last_row = rows.filter(date__gt=missing[-1][0]).order_by('date').values('date', 'balance', 'change').first()
+    if last_row is not None:
+        later_rows.append(last_row)
+    later_days = [row['date'] for row in later_rows]
+
+    total_balance = None
+    created = []
+    for day, amount, count in missing:
+        index = bisect_right(later_days, day)
+        if index < len(later_rows):
+            # the opening balance of the next day with a row, less the
+            # changes of the days in between, which have no rows either
+            next_row = later_rows[index]
+            closing = next_row['balance'] - next_row['change'] - sum(
+                change_amount for change_day, change_amount, change_count in changes
+                if day < change_day < next_row['date']
+            )
+        else:
+            if total_balance is None:
+                # lock the user's accounts, so a concurrent writer's balance
+                # deltas are either committed and counted or wait for this one
+                total_balance = sum(
+                    Account.objects.select_for_update().filter(user_id=user_id).order_by('pk')
+                    .values_list('balance', flat=True),
+                    Decimal('0.00'),
+                )
+            closing = total_balance + cumulative[day]
+
+        created.append(DailyBalance(user_id=user_id, date=day, balance=closing, change=amount, count=count))
+
+    return created
+
+
+def apply_daily_balances(changes):
+    """
+    Apply a mapping of (user id, date) -> (amount, count) to the daily balances.
+    The day's row and every later row move by the amount, so backdated
+    transactions propagate forward. Rows are created only for additions and
+    are seeded from the current account balances, so this must run before the
+    matching account balance deltas are applied.
+    """
+    by_user = {}
+    for (user_id, day), (amount, count) in sorted(changes.items()):
+        if amount or count:
+            by_user.setdefault(user_id, []).append((day, amount, count))
+    if not by_user:
+        return
+
+    with transaction.atomic(savepoint=False):
+        for user_id, user_changes in by_user.items():
+            _apply_user_daily_balances(user_id, user_changes)
+
+
+# -- Ledger changes -- #
+class LedgerChanges:
+    """
+    Accumulates the net effect of transaction writes on the data derived from
+    them (account balances, monthly totals, daily balances and ledger stats),
+    so a save, a delete or a bulk import can apply all of it in one atomic block.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.monthly_totals = {}
+        self.daily_balances = {}
+        self.user_ids = set()
+
+    def add(self, state, sign=1, count=1):
+        """
+        Add (sign=1) or remove (sign=-1) the effect of one transaction state,
+        or of count transactions of the same account, category and date whose
+        amounts are summed in the state.
+        """
+        amount = state['amount']
+        delta = sign * state['signed_amount']
+        rows = sign * count
+        day = Transaction._meta.get_field('date').to_python(state['date'])
+
+        self.user_ids.add(state['user_id'])
+
+        account_id = state['account_id']
+        self.balances[account_id] = self.balances.get(account_id, 0) + delta
+
+        key = (state['user_id'], state['category_id'], day.year, day.month)
+        total, total_count = self.monthly_totals.get(key, (0, 0))
+        self.monthly_totals[key] = (total + sign * amount, total_count + rows)
+
+        key = (state['user_id'], day)
+        total, total_count = self.daily_balances.get(key, (0, 0))
+        self.daily_balances[key] = (total + delta, total_count + rows)
+
+    def discard_unchanged(self):
+        """
+        Drop entries whose additions and removals cancel out.
+        """
+        self.balances = {key: delta for key, delta in self.balances.items() if delta}
+        self.monthly_totals = {key: change for key, change in self.monthly_totals.items() if any(change)}
+        self.daily_balances = {key: change for key, change in self.daily_balances.items() if any(change)}
+
+    def __bool__(self):
+        return bool(self.balances or self.monthly_totals or self.daily_balances)
+
+    def apply(self):
+        """
+        Write the accumulated changes and invalidate the cached data of every
+        user they touch.
+        """
+        self.discard_unchanged()
+        if not self:
+            return
+
+        with transaction.atomic(savepoint=False):
+            apply_daily_balances(self.daily_balances)
+            apply_balance_deltas(self.balances)
+            apply_monthly_totals(self.monthly_totals)
+            apply_ledger_stats(self.user_ids, self.daily_balances)
+
+        for user_id in self.user_ids:
+            bump_cached_data_version(user_id, ('transactions',))
+
+
+# -- State helpers -- #
+def _get_category_type(category_id):
+    """
+    Look up the type of a category by id in the category registry.
+    """
+    category = get_category(category_id)
+    return category.type if category else None
+
+
+def _get_current_category_type(instance):
+    """
+    Return the type of the category currently set on a transaction, without
+    loading the category when it is not already cached on the instance.
+    """
+    if instance.category_id and Transaction.category.is_cached(instance):
+        return instance.category.type
+    return _get_category_type(instance.category_id)
+
+
+def _get_current_state(instance):
+    return {field: getattr(instance, field) for field in Transaction.TRACKED_FIELDS}
+
+
+def _get_old_state(instance):
+    """
+    Return the stored tracked fields of a transaction being updated, using the
+    state remembered when it was loaded and only falling back to the database
+    for instances that were built by hand or loaded with deferred fields.
+    """
+    state = instance.get_loaded_state()
+    if state is not None:
+        return state
+
+    return Transaction.objects.filter(pk=instance.pk).values(*Transaction.TRACKED_FIELDS).first()
+
+
+def _get_signed_amount(instance):
+    """
+    Work out the signed amount of a transaction being saved from its amount
+    and the type of its category, read from the category registry.
+    """
+    amount = Transaction._meta.get_field('amount').to_python(instance.amount)
+    return signed_amount(amount, _get_current_category_type(instance))
+
+
+# -- pre_save signal to work out the changes made by saving a Transaction -- #
 @receiver(pre_save, sender=Transaction)
 def revert_old_amount_on_update(sender, instance, **kwargs):
     """
-    Before a transaction is updated, revert the old amount from the associated account.
+    Before a transaction is saved, work out the net change it makes to each
+    account balance, monthly total and daily balance. Nothing is recorded when no tracked
+    field changed.
     """
-    if instance.pk:
-        try:
-            # Get the state of the transaction before the update
-            old_transaction = Transaction.objects.get(pk=instance.pk)
-            old_account = old_transaction.account
+    changes = LedgerChanges()
+    old_state = None if instance._state.adding else _get_old_state(instance)
+    instance.signed_amount = _get_signed_amount(instance)
+
+    if old_state is None:
+        changes.add(_get_current_state(instance))
 
-            # Revert the old amount from the account balance
-            if old_transaction.category.type == 'I':
-                old_account.balance -= old_transaction.amount
-            else:
-                old_account.balance += old_transaction.amount
+    elif any(old_state[field] != getattr(instance, field) for field in Transaction.TRACKED_FIELDS):
+        # revert the old state, then apply the new one
+        changes.add(old_state, sign=-1)
+        changes.add(_get_current_state(instance))
 
-            old_account.save()
-        
-        except Transaction.DoesNotExist:
-            pass  # Transaction is new, no need to revert anything
+    changes.discard_unchanged()
+    instance._ledger_changes = changes
 
 
 # -- post_save signal to update account balance -- #
 @receiver(post_save, sender=Transaction)
 def update_account_balance_on_save(sender, instance, created, **kwargs):
     """
-    Update the account balance when a transaction is created or updated.
+    Update the account balances and the derived totals when a transaction is
+    created or updated.
     """
-    new_account = instance.account
-
-    # apply the new amount to the account balance
-    if instance.category.type == 'I':
-        new_account.balance += instance.amount
+    changes = getattr(instance, '_ledger_changes', None)
+    if changes:
+        changes.apply()
     else:
-        new_account.balance -= instance.amount
+        bump_data_version(instance.user_id, ('transactions',))
 
-    new_account.save()
+    instance._ledger_changes = None
+    instance.remember_loaded_state()
 
 
 # -- post_delete signal to update account balance -- #
 @receiver(post_delete, sender=Transaction)
 def update_account_balance_on_delete(sender, instance, **kwargs):
     """
-    Update the account balance when a transaction is deleted.
+    Update the account balance and the derived totals when a transaction is deleted.
     """
-    account = instance.account
+    state = instance.get_loaded_state() or _get_current_state(instance)
 
     # revert the amount from the account balance
-    if instance.category.type == 'I':
-        account.balance -= instance.amount
+    changes = LedgerChanges()
+    changes.add(state, sign=-1)
+    changes.apply()
+
+
+# -- Category signals to invalidate the category registry -- #
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, instance, **kwargs):
+    """
+    Reload the categories in every process after one is added, edited or deleted.
+    """
+    bump_category_version()
+
+
+# -- Category signals to re-sign transactions when a category changes type -- #
+@receiver(pre_save, sender=Category)
+def remember_old_category_type(sender, instance, **kwargs):
+    instance._old_type = None
+    if not instance._state.adding:
+        instance._old_type = Category.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+
+
+def _resign_transactions(category_id, category_type):
+    """
+    Re-sign the stored signed amount of a category's transactions for a
+    category type (None once they are uncategorised) and move the account
+    balances, daily balances and ledger stats by the difference, grouped per
+    account and day.
+    """
+    transactions = Transaction.objects.filter(category_id=category_id)
+    groups = transactions.values('user_id', 'account_id', 'date').annotate(
+        total=Sum('amount'), signed_total=Sum('signed_amount')
+    ).order_by()
+
+    changes = LedgerChanges()
+    for group in groups:
+        # SQLite sums decimals as floats, so round back to cents
+        amount = Decimal(group['total']).quantize(CENTS)
+        state = {**group, 'category_id': category_id, 'amount': amount}
+        changes.add({**state, 'signed_amount': Decimal(group['signed_total']).quantize(CENTS)}, sign=-1)
+        changes.add({**state, 'signed_amount': signed_amount(amount, category_type)})
+
+    with transaction.atomic():
+        changes.apply()
+        transactions.update(signed_amount=signed_amount_expression(category_type))
+
+
+@receiver(post_save, sender=Category)
+def resign_transactions_on_category_type_change(sender, instance, created, **kwargs):
+    """
+    When a category switches between income and expense, flip the stored
+    signed amount of its transactions.
+    """
+    old_type = getattr(instance, '_old_type', None)
+    if old_type is None or old_type == instance.type:
+        return
+
+    _resign_transactions(instance.pk, instance.type)
+
+
+# -- pre_delete signal to keep the totals of a deleted Category -- #
+@receiver(pre_delete, sender=Category)
+def fold_monthly_totals_on_category_delete(sender, instance, **kwargs):
+    """
+    Transactions of a deleted category become uncategorised, which count as
+    expenses: re-sign them when it was an income category, and move the
+    category's monthly totals into the uncategorised rows before they are
+    deleted along with it.
+    """
+    if signed_amount(1, instance.type) != signed_amount(1, None):
+        _resign_transactions(instance.pk, None)
+
+    changes = {}
+    for total in MonthlyCategoryTotal.objects.filter(category=instance):
+        changes[(total.user_id, None, total.year, total.month)] = (total.total, total.count)
+
+    apply_monthly_totals(changes)
+
+
+# -- Account signals to keep the daily balances and ledger stats in step with account balances -- #
+@receiver(pre_save, sender=Account)
+def remember_old_account_balance(sender, instance, **kwargs):
+    """
+    Before an account is saved, remember its stored balance so the change
+    made outside of transactions can be applied to the daily balances, and
+    move the opening balance by the same amount.
+    """
+    instance._old_balance = None
+    old = None
+    if not instance._state.adding:
+        old = Account.objects.filter(pk=instance.pk).values_list('balance', 'opening_balance').first()
+
+    balance = Account._meta.get_field('balance').to_python(instance.balance)
+    if old is None:
+        # a new account has no transactions yet
+        instance.opening_balance = balance
     else:
-        account.balance += instance.amount
+        instance._old_balance, old_opening_balance = old
+        instance.opening_balance = old_opening_balance + balance - instance._old_balance
+
+
+@receiver(post_save, sender=Account)
+def shift_daily_balances_on_account_save(sender, instance, created, **kwargs):
+    """
+    A new account or an edited balance changes the user's total balance on
+    every day of their history.
+    """
+    balance = Account._meta.get_field('balance').to_python(instance.balance)
+    old_balance = getattr(instance, '_old_balance', None) or Decimal('0.00')
+
+    _shift_daily_balances(instance.user_id, balance - old_balance)
+    update_ledger_stats(instance.user_id, balance_delta=balance - old_balance)
+    bump_cached_data_version(instance.user_id, ('accounts',))
+
+
+@receiver(pre_delete, sender=Account)
+def remember_remaining_balance_on_account_delete(sender, instance, **kwargs):
+    """
+    Before an account is deleted, work out the balance it will have left once
+    its transactions have been deleted (and reverted) along with it.
+    """
+    balance = Account.objects.filter(pk=instance.pk).values_list('balance', flat=True).first() or Decimal('0.00')
+    net = instance.transactions.aggregate(net=Sum('signed_amount'))['net'] or Decimal('0.00')
+
+    instance._remaining_balance = balance - net
+
+
+@receiver(post_delete, sender=Account)
+def shift_daily_balances_on_account_delete(sender, instance, **kwargs):
+    remaining_balance = getattr(instance, '_remaining_balance', Decimal('0.00'))
+    _shift_daily_balances(instance.user_id, -remaining_balance)
+    update_ledger_stats(instance.user_id, balance_delta=-remaining_balance, create=False)
+    bump_cached_data_version(instance.user_id, ('accounts',))
+
+
+# -- Budget signals to invalidate the cached dashboard -- #
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def bump_data_version_on_budget_change(sender, instance, **kwargs):
+    bump_data_version(instance.user_id, ('budgets',))
+
 
-    account.save()
+# -- request_finished signal to share the cache hit/miss counters once a response is sent -- #
+@receiver(request_finished)
+def flush_cache_stats_after_response(sender, **kwargs):
+    transaction.on_commit(flush_cache_stats)
@@ -1,11 +1,103 @@
-from django.test import TestCase
+import io
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from unittest import skipIf
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
 from decimal import Decimal
-from budget.models import Account, Category, Transaction
+from budget.cache import (
+    check_cache_is_shared, check_shared_cache, flush_cache_stats, get_cache_stats, get_categories, get_category_version,
+    get_data_version, reset_cache_stats
+)
+from budget.fake_ledger import generate_fake_ledger
+from budget.ledger_stats import bump_ledger_data_version, compute_ledger_stats, get_ledger_stats
+from budget.forecast import forecast_spending
+from budget.forms import BudgetForm, TransactionForm
+from budget.importers import TransactionImportError, import_transactions, parse_csv, parse_ofx
+from budget.management.commands.rebuild_daily_balances import build_daily_balances
+from budget.bulk import bulk_delete_transactions, bulk_move_to_account
+from budget.management.commands.reconcile_balances import find_balance_drift
+from budget.middleware import QUERY_COUNT_HEADER, QueryCountMiddleware
+from budget.query_pool import run_concurrently
+from budget.models import (
+    Account, Budget, Category, DailyBalance, MonthlyCategoryTotal, RecurringTransaction, Transaction,
+    UserLedgerStats
+)
+from budget.recurring import run_recurring
+from budget.reports import build_budget_report
+from budget.search import search_transactions
 
 User = get_user_model()
 
+LOCAL_MEMORY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Upper bound on the queries issued by one dashboard request on a cold cache,
+# including the session and user lookups done by the auth middleware and the
+# database cache, which takes one query per read and five per entry written
+DASHBOARD_MAX_QUERIES = 33
+
+# Upper bound on the queries issued by a GET of every URL in budget/urls.py,
+# including the session and user lookups done by the auth middleware and the
+# database cache
+QUERY_BUDGETS = {
+    'dashboard': DASHBOARD_MAX_QUERIES,
+    'dashboard_async': DASHBOARD_MAX_QUERIES,
+    'dashboard_spending': 5,
+    'dashboard_balance_trend': 13,
+    'account_list': 12,
+    'account_create': 2,
+    'account_update': 3,
+    'account_delete': 3,
+    'transaction_list': 15,
+    'transaction_create': 4,
+    'transaction_update': 5,
+    'transaction_delete': 4,
+    'transaction_bulk': 4,
+    'transaction_import': 5,
+    'transaction_export': 3,
+    'budget_list': 12,
+    'budget_create': 3,
+    'budget_update': 4,
+    'budget_delete': 4,
+    'budget_report': 11,
+    'account_profile': 2,
+}
+
+# Upper bound on the queries issued by submitting the transaction forms
+POST_QUERY_BUDGETS = {
+    'transaction_create': 18,
+    'transaction_update': 20,
+    'transaction_delete': 15,
+}
+
+
+def stats_row(stats):
+    """
+    Return the fields of a UserLedgerStats, or of a user's saved one.
+    """
+    if not isinstance(stats, UserLedgerStats):
+        stats = UserLedgerStats.objects.get(user=stats)
+    return (stats.first_date, stats.last_date, stats.transaction_count, stats.total_balance)
+
 
 class TransactionSignalTests(TestCase):
 
@@ -50,7 +142,7 @@ class TransactionSignalTests(TestCase):
         # Refresh account balance from DB
         self.account1.refresh_from_db()
         self.assertEqual(self.account1.balance, Decimal('250.00'))
-    
+
     def test_delete_expense_transaction_reverts_balance(self):
         # create expense transaction
         transaction = Transaction.objects.create(
@@ -147,25 +239,2020 @@ class TransactionSignalTests(TestCase):
         transaction.save()
         self.account1.refresh_from_db()
         self.assertEqual(self.account1.balance, Decimal('150.00'))
-    
 
-class ViewTests(TestCase):
+    def test_signed_amount_follows_amount_and_category(self):
+        transaction = Transaction.objects.create(
+            user=self.user,
+            account=self.account1,
+            category=self.expense_category,
+            amount=Decimal('30.00'),
+            date='2025-01-20',
+            description='Shoes'
+        )
+        self.assertEqual(transaction.signed_amount, Decimal('-30.00'))
+
+        transaction = Transaction.objects.get(pk=transaction.pk)
+        transaction.amount = Decimal('45.00')
+        transaction.save()
+        self.assertEqual(transaction.signed_amount, Decimal('-45.00'))
+
+        transaction.category = self.income_category
+        transaction.save()
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.signed_amount, Decimal('45.00'))
+
+    def test_negative_expense_amounts_keep_their_sign_when_edited(self):
+        # a refund entered as a negative expense raises the balance
+        transaction = Transaction.objects.create(
+            user=self.user,
+            account=self.account1,
+            category=self.expense_category,
+            amount=Decimal('-10.00'),
+            date='2025-01-20',
+            description='Refund'
+        )
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('110.00'))
+
+        transaction = Transaction.objects.get(pk=transaction.pk)
+        transaction.amount = Decimal('-20.00')
+        transaction.save()
+        self.assertEqual(transaction.signed_amount, Decimal('20.00'))
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('120.00'))
+
+    def test_update_description_only_does_not_touch_balance(self):
+        Transaction.objects.create(
+            user=self.user,
+            account=self.account1,
+            category=self.expense_category,
+            amount=Decimal('20.00'),
+            date='2025-01-15',
+            description='Snacks'
+        )
+        transaction = Transaction.objects.get(description='Snacks')
+
+        # only the transaction row itself and the user's data version are
+        # written, the category type coming from the (loaded) category
+        # registry; the database cache reads the category version and
+        # writes the cached version of the user's transactions in five
+        # statements
+        get_categories()
+        transaction.description = 'Evening snacks'
+        with self.assertNumQueries(8):
+            transaction.save()
+
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('80.00'))
+
+    def test_update_loaded_transaction_sends_single_net_delta(self):
+        Transaction.objects.create(
+            user=self.user,
+            account=self.account1,
+            category=self.expense_category,
+            amount=Decimal('20.00'),
+            date='2025-01-15',
+            description='Snacks'
+        )
+        transaction = Transaction.objects.select_related('category').get(description='Snacks')
+
+        transaction.amount = Decimal('35.00')
+        with CaptureQueriesContext(connection) as queries:
+            transaction.save()
+
+        # the database cache reads its own rows, the ledger writes read nothing
+        statements = [query['sql'] for query in queries.captured_queries if 'budget_cache' not in query['sql']]
+        self.assertFalse(any(sql.startswith('SELECT') for sql in statements))
+        self.assertEqual(len([sql for sql in statements if 'UPDATE "budget_account"' in sql]), 1)
+
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('65.00'))
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite locks the whole database for each writer")
+class ConcurrentBalanceTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+
+    def test_concurrent_transactions_do_not_lose_balance_updates(self):
+        threads_count = 8
+        per_thread = 10
+        errors = []
+        start = threading.Barrier(threads_count)
+
+        def worker():
+            try:
+                start.wait()
+                for i in range(per_thread):
+                    Transaction.objects.create(
+                        user=self.user,
+                        account=self.account,
+                        category=self.expense_category,
+                        amount=Decimal('1.00'),
+                        date='2025-02-01',
+                        description=f'Concurrent {i}'
+                    )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00') - threads_count * per_thread)
+
+
+class TransactionWriteAtomicityTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def create_transaction(self):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, category=self.expense_category,
+            amount=Decimal('10.00'), date='2025-02-01', description='Groceries'
+        )
+
+    def test_failed_rollups_roll_back_the_create(self):
+        with patch('budget.signals.apply_monthly_totals', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create_transaction()
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(DailyBalance.objects.exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+
+    def test_failed_rollups_roll_back_the_delete(self):
+        entry = self.create_transaction()
+        with patch('budget.signals.apply_monthly_totals', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                entry.delete()
+
+        self.assertTrue(Transaction.objects.filter(pk=entry.pk).exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('90.00'))
+
+
+class TransactionImportTests(TestCase):
 
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.login(username='testuser', password='testpassword')
-    
-    def test_dashboard_view_requires_login(self):
-        self.client.logout()
-        response = self.client.get(reverse('dashboard'))
-        self.assertEqual(response.status_code, 302)
-        self.assertTrue(reverse('account_login') in response.url)
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account1 = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.account2 = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
 
-    def test_dashboard_view_loads_for_logged_in_user(self):
-        response = self.client.get(reverse('dashboard'))
+    def test_csv_import_applies_one_delta_per_account(self):
+        lines = ['date,description,amount,category,account']
+        for i in range(50):
+            lines.append(f'2025-03-{i % 28 + 1:02d},Groceries {i},2.00,Groceries,Checking')
+        lines.append('2025-03-31,Pay,1000.00,Salary,Savings')
+        rows = parse_csv(io.StringIO('\n'.join(lines)))
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_transactions(self.user, None, rows, chunk_size=20)
+
+        self.assertEqual(result['rows'], 51)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 51)
+        account_updates = [q for q in queries.captured_queries if 'UPDATE "budget_account"' in q['sql']]
+        self.assertEqual(len(account_updates), 2)
+
+        self.account1.refresh_from_db()
+        self.account2.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('0.00'))
+        self.assertEqual(self.account2.balance, Decimal('1500.00'))
+
+    def test_ofx_import_uses_sign_for_default_categories(self):
+        ofx = (
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250310120000<TRNAMT>-40.50<NAME>Supermarket</STMTTRN>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250315<TRNAMT>200.00<MEMO>Refund</STMTTRN>'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>'
+        )
+        result = import_transactions(
+            self.user, self.account1, parse_ofx(io.StringIO(ofx)),
+            income_category=self.income_category, expense_category=self.expense_category
+        )
+
+        self.assertEqual(result['rows'], 2)
+        expense = Transaction.objects.get(description='Supermarket')
+        self.assertEqual(expense.amount, Decimal('40.50'))
+        self.assertEqual(expense.category, self.expense_category)
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('259.50'))
+
+    def test_uncategorised_rows_need_an_income_category(self):
+        rows = parse_csv(io.StringIO('date,description,amount\n2025-03-02,Snacks,-20.00\n'))
+        import_transactions(self.user, self.account1, rows)
+
+        # an expense is left uncategorised, with a positive amount
+        transaction = Transaction.objects.get(description='Snacks')
+        self.assertEqual((transaction.category_id, transaction.amount), (None, Decimal('20.00')))
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('80.00'))
+
+        # an income is not, since uncategorised transactions count as expenses
+        rows = parse_csv(io.StringIO('date,description,amount\n2025-03-01,Pay,500.00\n'))
+        with self.assertRaises(TransactionImportError):
+            import_transactions(self.user, self.account1, rows)
+        self.assertFalse(Transaction.objects.filter(description='Pay').exists())
+
+    def test_invalid_row_rolls_back_whole_import(self):
+        csv_data = 'date,description,amount,category\n2025-03-01,Ok,5.00,Groceries\n2025-03-02,Bad,5.00,Unknown\n'
+
+        with self.assertRaises(TransactionImportError):
+            import_transactions(self.user, self.account1, parse_csv(io.StringIO(csv_data)))
+
+        self.assertFalse(Transaction.objects.exists())
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('100.00'))
+
+    def test_import_command(self):
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('date,description,amount,category\n01/03/2025,Shop,10.00,Groceries\n')
+            f.flush()
+            call_command('import_transactions', f.name, user='testuser', account='Checking', stdout=out)
+
+        self.assertIn('Imported 1 transactions', out.getvalue())
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('90.00'))
+
+    def test_import_view_uploads_file(self):
+        upload = SimpleUploadedFile('history.csv', b'date,description,amount,category\n2025-03-01,Shop,10.00,Groceries\n')
+
+        response = self.client.post(reverse('transaction_import'), {
+            'file': upload,
+            'account': self.account1.pk,
+        })
+
+        self.assertRedirects(response, reverse('transaction_list'))
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('90.00'))
+
+
+class ExplainQueriesCommandTests(TestCase):
+
+    def test_dashboard_and_list_queries_use_user_date_indexes(self):
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        category = Category.objects.create(name='Groceries', type='E')
+        account = Account.objects.create(user=user, name='Checking', balance=Decimal('100.00'))
+        Transaction.objects.create(
+            user=user, account=account, category=category,
+            amount=Decimal('5.00'), date='2025-01-01', description='Bread'
+        )
+
+        # a warm cache is bypassed, so the ledger queries are explained
+        self.client.login(username='testuser', password='testpassword')
+        self.client.get(reverse('dashboard'))
+
+        out = io.StringIO()
+        call_command('explain_queries', user='testuser', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('== Dashboard ==', output)
+        self.assertIn('== Transaction list ==', output)
+        self.assertNotIn('budget_cache', output)
+        # the dashboard and its charts read the rollups, whose plans are listed too
+        dashboard = output.split('== Dashboard ==')[1].split('== Dashboard spending ==')[0]
+        self.assertIn('budget_monthlycategorytotal', dashboard)
+        spending = output.split('== Dashboard spending ==')[1].split('== Dashboard balance trend ==')[0]
+        self.assertIn('budget_monthlycategorytotal', spending)
+        if connection.vendor == 'sqlite':
+            self.assertIn('transaction_user_date_idx', output)
+
+
+class MonthlyCategoryTotalTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def get_totals(self):
+        return {
+            (total.category_id, total.year, total.month): (total.total, total.count)
+            for total in MonthlyCategoryTotal.objects.filter(user=self.user, count__gt=0)
+        }
+
+    def create_transaction(self, amount, day, category=None):
+        return Transaction.objects.create(
+            user=self.user,
+            account=self.account,
+            category=category or self.expense_category,
+            amount=Decimal(amount),
+            date=day,
+            description='Entry'
+        )
+
+    def test_totals_follow_create_update_and_delete(self):
+        first = self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('5.00', '2025-01-20')
+        self.assertEqual(self.get_totals(), {
+            (self.expense_category.pk, 2025, 1): (Decimal('15.00'), 2),
+        })
+
+        # move one transaction to another month and category
+        first.date = '2025-02-01'
+        first.category = self.income_category
+        first.save()
+        self.assertEqual(self.get_totals(), {
+            (self.expense_category.pk, 2025, 1): (Decimal('5.00'), 1),
+            (self.income_category.pk, 2025, 2): (Decimal('10.00'), 1),
+        })
+
+        first.delete()
+        self.assertEqual(self.get_totals(), {
+            (self.expense_category.pk, 2025, 1): (Decimal('5.00'), 1),
+        })
+
+    def test_rebuild_command_matches_signal_totals(self):
+        self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('7.50', '2025-03-02', category=self.income_category)
+        expected = self.get_totals()
+
+        MonthlyCategoryTotal.objects.all().delete()
+        call_command('rebuild_monthly_totals', stdout=io.StringIO())
+
+        self.assertEqual(self.get_totals(), expected)
+
+    def test_rebuild_command_inserts_in_batches_and_invalidates_dashboards(self):
+        for month in range(1, 6):
+            self.create_transaction('10.00', f'2025-{month:02d}-10')
+        version = get_data_version(self.user.pk, 'transactions')
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('rebuild_monthly_totals', batch_size=2, stdout=io.StringIO())
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "budget_monthlycategorytotal"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertNotEqual(get_data_version(self.user.pk, 'transactions'), version)
+
+    def test_deleting_category_moves_totals_to_uncategorised(self):
+        self.create_transaction('10.00', '2025-01-10')
+
+        self.expense_category.delete()
+
+        self.assertEqual(self.get_totals(), {
+            (None, 2025, 1): (Decimal('10.00'), 1),
+        })
+
+
+class DailyBalanceTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account1 = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.account2 = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+
+    def get_balances(self):
+        return list(DailyBalance.objects.filter(user=self.user).values_list('date', 'balance', 'change'))
+
+    def assertMatchesRebuild(self):
+        balances = self.get_balances()
+        call_command('rebuild_daily_balances', stdout=io.StringIO())
+        self.assertEqual(balances, self.get_balances())
+
+    def create_transaction(self, amount, day, category=None, account=None):
+        return Transaction.objects.create(
+            user=self.user,
+            account=account or self.account1,
+            category=category or self.expense_category,
+            amount=Decimal(amount),
+            date=day,
+            description='Entry'
+        )
+
+    def test_backdated_transaction_propagates_to_later_days(self):
+        self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('200.00', '2025-01-20', category=self.income_category)
+        self.assertEqual([row[1] for row in self.get_balances()], [Decimal('590.00'), Decimal('790.00')])
+
+        # an expense entered late for an earlier day lowers every later closing balance
+        self.create_transaction('40.00', '2025-01-05', account=self.account2)
+        self.assertEqual(self.get_balances(), [
+            (date(2025, 1, 5), Decimal('560.00'), Decimal('-40.00')),
+            (date(2025, 1, 10), Decimal('550.00'), Decimal('-10.00')),
+            (date(2025, 1, 20), Decimal('750.00'), Decimal('200.00')),
+        ])
+        self.assertMatchesRebuild()
+
+    def test_moving_and_deleting_transactions(self):
+        first = self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('20.00', '2025-01-15')
+
+        first.date = '2025-01-20'
+        first.save()
+        self.assertMatchesRebuild()
+
+        first.delete()
+        self.assertEqual(self.get_balances()[-1][1], Decimal('580.00'))
+        self.assertMatchesRebuild()
+
+    def test_moving_the_newest_transaction_to_an_earlier_date(self):
+        latest = self.create_transaction('150.00', '2025-03-01')
+
+        latest.date = '2025-02-01'
+        latest.save()
+        self.assertEqual(self.get_balances(), [(date(2025, 2, 1), Decimal('450.00'), Decimal('-150.00'))])
+        self.assertMatchesRebuild()
+
+    def test_random_edits_match_a_rebuild(self):
+        rng = random.Random(21)
+        accounts = [self.account1, self.account2]
+        categories = [self.income_category, self.expense_category]
+        for step in range(60):
+            entries = list(Transaction.objects.filter(user=self.user))
+            choice = rng.random()
+            day = date(2025, 1, 1) + timedelta(days=rng.randrange(20))
+            if choice < 0.4 or not entries:
+                self.create_transaction(f'{rng.randrange(1, 300)}.00', day,
+                                        category=rng.choice(categories), account=rng.choice(accounts))
+            elif choice < 0.7:
+                entry = rng.choice(entries)
+                entry.date = day
+                entry.amount = Decimal(rng.randrange(1, 300))
+                entry.account = rng.choice(accounts)
+                entry.save()
+            elif choice < 0.85:
+                rng.choice(entries).delete()
+            else:
+                selected = Transaction.objects.filter(pk__in=[entry.pk for entry in rng.sample(entries, min(3, len(entries)))])
+                bulk_move_to_account(selected, rng.choice(accounts))
+            with self.subTest(step=step):
+                self.assertMatchesRebuild()
+                self.assertEqual(stats_row(self.user), stats_row(compute_ledger_stats(self.user.pk)))
+
+    def test_rebuild_command_inserts_in_batches_and_invalidates_dashboards(self):
+        for day in range(1, 6):
+            self.create_transaction('10.00', f'2025-01-{day:02d}')
+        balances = self.get_balances()
+        version = get_data_version(self.user.pk, 'transactions')
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('rebuild_daily_balances', batch_size=2, stdout=io.StringIO())
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "budget_dailybalance"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(self.get_balances(), balances)
+        self.assertNotEqual(get_data_version(self.user.pk, 'transactions'), version)
+
+    def test_account_changes_shift_history(self):
+        self.create_transaction('10.00', '2025-01-10')
+
+        Account.objects.create(user=self.user, name='Cash', balance=Decimal('50.00'))
+        self.assertMatchesRebuild()
+
+        self.account2.balance = Decimal('300.00')
+        self.account2.save()
+        self.assertMatchesRebuild()
+
+        self.create_transaction('25.00', '2025-01-12', account=self.account2)
+        self.account2.delete()
+        self.assertEqual(self.get_balances()[-1][1], Decimal('140.00'))
+        self.assertMatchesRebuild()
+
+    def test_category_type_change_resigns_transactions(self):
+        self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('15.00', '2025-01-12', account=self.account2)
+        self.create_transaction('200.00', '2025-01-20', category=self.income_category)
+
+        # the groceries turn out to be refunds
+        self.expense_category.type = 'I'
+        self.expense_category.save()
+
+        self.assertEqual(
+            sorted(Transaction.objects.filter(category=self.expense_category).values_list('signed_amount', flat=True)),
+            [Decimal('10.00'), Decimal('15.00')],
+        )
+        self.account1.refresh_from_db()
+        self.account2.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('310.00'))
+        self.assertEqual(self.account2.balance, Decimal('515.00'))
+        self.assertEqual(self.get_balances()[-1][1], Decimal('825.00'))
+        self.assertMatchesRebuild()
+        self.assertEqual(find_balance_drift([self.user.pk]), (2, []))
+
+    def test_deleting_an_income_category_resigns_its_transactions(self):
+        self.create_transaction('10.00', '2025-01-10')
+        self.create_transaction('50.00', '2025-01-12', category=self.income_category)
+
+        # uncategorised transactions count as expenses
+        self.income_category.delete()
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('40.00'))
+        self.assertMatchesRebuild()
+        self.assertEqual(stats_row(self.user), stats_row(compute_ledger_stats(self.user.pk)))
+
+        # the trend starts from the balance before the period
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('dashboard_balance_trend'), {'month': 1, 'year': 2025})
+        self.assertEqual(response.json()['data'][0], 600.0)
+
+        # editing one of them no longer moves the balance
+        entry = Transaction.objects.get(amount=Decimal('50.00'))
+        self.assertEqual(entry.signed_amount, Decimal('-50.00'))
+        entry.description = 'Bonus'
+        entry.save()
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, Decimal('40.00'))
+        self.assertMatchesRebuild()
+        self.assertEqual(find_balance_drift([self.user.pk]), (2, []))
+
+
+class TransactionListPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.other_category = Category.objects.create(name='Rent', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        # 60 transactions, three per day, so pages split days with equal dates
+        for i in range(60):
+            Transaction.objects.create(
+                user=self.user,
+                account=self.account,
+                category=self.expense_category if i % 2 else self.other_category,
+                amount=Decimal('1.00'),
+                date=date(2025, 1, 1) + timedelta(days=i // 3),
+                description=f'Entry {i}'
+            )
+        self.expected = list(
+            Transaction.objects.filter(user=self.user).order_by('-date', '-pk').values_list('pk', flat=True)
+        )
+
+    def test_pages_walk_forward_and_back_without_gaps(self):
+        seen = []
+        pages = []
+        params = {}
+        while True:
+            response = self.client.get(reverse('transaction_list'), params)
+            page = [t.pk for t in response.context['transactions']]
+            pages.append(page)
+            seen.extend(page)
+            if 'next_page_url' not in response.context:
+                break
+            params = {'cursor': response.context['page_obj'].next_cursor}
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page) for page in pages], [25, 25, 10])
+
+        response = self.client.get(reverse('transaction_list'), {
+            'cursor': response.context['page_obj'].previous_cursor
+        })
+        self.assertEqual([t.pk for t in response.context['transactions']], pages[1])
+
+    def test_deep_page_skips_count_and_keeps_filters(self):
+        response = self.client.get(reverse('transaction_list'), {'categories': self.expense_category.pk})
+        self.assertIn(f'categories={self.expense_category.pk}', response.context['next_page_url'])
+
+        cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('transaction_list'), {
+                'categories': self.expense_category.pk, 'cursor': cursor
+            })
+
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(len(response.context['transactions']), 5)
+        self.assertTrue(all(t.category_id == self.expense_category.pk for t in response.context['transactions']))
+
+    def test_exact_count_is_optional(self):
+        response = self.client.get(reverse('transaction_list'), {'count': 'exact'})
+        self.assertEqual(response.context['page_obj'].count, 60)
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('transaction_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual([t.pk for t in response.context['transactions']], self.expected[:25])
+
+
+class TransactionSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        for description in ['Groceries at Lidl', 'Café au lait', 'Train ticket', 'Lidl petrol station']:
+            self.create(description)
+
+    def create(self, description):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            amount=Decimal('5.00'), date=date(2025, 3, 1), description=description
+        )
+
+    def search(self, text):
+        queryset = search_transactions(Transaction.objects.filter(user=self.user), text)
+        return sorted(queryset.values_list('description', flat=True))
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search('lid'), ['Groceries at Lidl', 'Lidl petrol station'])
+        self.assertEqual(self.search('LIDL gro'), ['Groceries at Lidl'])
+        self.assertEqual(self.search('cafe'), ['Café au lait'])
+        self.assertEqual(self.search('idl'), [])
+
+        # punctuation is not passed on to the full-text query syntax
+        self.assertEqual(self.search('"train" * -(:'), ['Train ticket'])
+        self.assertEqual(len(self.search('  ')), 4)
+
+    def test_index_follows_writes(self):
+        transaction = self.create('Cinema')
+        transaction.description = 'Bowling'
+        transaction.save()
+        self.assertEqual(self.search('cin'), [])
+        self.assertEqual(self.search('bowl'), ['Bowling'])
+
+        transaction.delete()
+        self.assertEqual(self.search('bowl'), [])
+
+        # bulk writes skip the signals but not the index
+        import_transactions(self.user, self.account, [{'line': 2, 'date': date(2025, 3, 4), 'amount': Decimal('-3.00'),
+                                                       'description': 'Bakery', 'category': '', 'account': ''}],
+                            expense_category=self.category)
+        self.assertEqual(self.search('bak'), ['Bakery'])
+
+    def test_list_and_export_search(self):
+        response = self.client.get(reverse('transaction_list'), {'search': 'lidl'})
+        self.assertEqual(len(response.context['transactions']), 2)
+        self.assertContains(response, 'value="lidl"')
+
+        response = self.client.get(reverse('transaction_export'), {'search': 'train', 'format': 'csv'})
+        self.assertEqual(b''.join(response.streaming_content).decode().count('\n'), 2)
+
+
+class TransactionExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.other_account = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=self.expense_category,
+            amount=Decimal('12.50'), date=date(2025, 3, 2), description='Food, "fresh"'
+        )
+        Transaction.objects.create(
+            user=self.user, account=self.other_account, category=self.income_category,
+            amount=Decimal('2000.00'), date=date(2025, 3, 1), description='Salary'
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse('transaction_export'), params)
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'budget/dashboard.html')
-    
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="transactions-', response['Content-Disposition'])
+        self.assertEqual(content.splitlines(), [
+            'date,amount,description,category,account',
+            '2025-03-02,-12.50,"Food, ""fresh""",Groceries,Checking',
+            '2025-03-01,2000.00,Salary,Salary,Savings',
+        ])
+
+    def test_json_export_uses_the_list_filters(self):
+        response, content = self.export(format='json', accounts=self.other_account.pk)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), [{
+            'date': '2025-03-01', 'amount': '2000.00', 'description': 'Salary',
+            'category': 'Salary', 'account': 'Savings',
+        }])
+
+        response, content = self.export(format='json', start_date='2025-03-02')
+        self.assertEqual([row['description'] for row in json.loads(content)], ['Food, "fresh"'])
+
+    def test_export_can_be_imported_again(self):
+        response, content = self.export()
+        rows = list(parse_csv(io.StringIO(content)))
+        self.assertEqual([(row['amount'], row['category'], row['account']) for row in rows], [
+            (Decimal('-12.50'), 'Groceries', 'Checking'),
+            (Decimal('2000.00'), 'Salary', 'Savings'),
+        ])
+
+    def test_export_only_includes_own_transactions(self):
+        other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        other_account = Account.objects.create(user=other_user, name='Other', balance=Decimal('0.00'))
+        Transaction.objects.create(
+            user=other_user, account=other_account, category=self.expense_category,
+            amount=Decimal('1.00'), date=date(2025, 3, 3), description='Not mine'
+        )
+        response, content = self.export()
+        self.assertNotIn('Not mine', content)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('transaction_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_links_to_the_filtered_export(self):
+        response = self.client.get(reverse('transaction_list'), {'accounts': self.account.pk, 'cursor': 'x'})
+        self.assertEqual(response.context['export_query'], f'accounts={self.account.pk}')
+
+
+class TransactionBulkEditTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        self.other_account = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, account=self.account, category=self.expense_category,
+                amount=Decimal('10.00') + number, date=date(2024, 1 + number % 3, 1 + number % 5),
+                description=f'Entry {number}'
+            )
+            for number in range(12)
+        ]
+
+    def post(self, data, query=''):
+        return self.client.post(f"{reverse('transaction_bulk')}{query}", data)
+
+    def assertLedgerConsistent(self):
+        """
+        The derived data matches a rebuild from the remaining transactions.
+        """
+        transactions = Transaction.objects.filter(user=self.user)
+        self.assertEqual(find_balance_drift([self.user.pk]), (2, []))
+
+        totals = {
+            (row['category_id'], row['year'], row['month']): (row['total'], row['count'])
+            for row in MonthlyCategoryTotal.objects.filter(user=self.user, count__gt=0).values(
+                'category_id', 'year', 'month', 'total', 'count')
+        }
+        expected = {}
+        for entry in transactions:
+            key = (entry.category_id, entry.date.year, entry.date.month)
+            total, count = expected.get(key, (Decimal('0.00'), 0))
+            expected[key] = (total + entry.amount, count + 1)
+        self.assertEqual(totals, expected)
+
+        account_total = Account.objects.filter(user=self.user).aggregate(total=Sum('balance'))['total']
+        rebuilt = [
+            (row.date, row.balance, row.change, row.count)
+            for row in build_daily_balances(transactions, {self.user.pk: account_total})
+        ]
+        stored = [
+            (row.date, row.balance, row.change, row.count)
+            for row in DailyBalance.objects.filter(user=self.user).order_by('-date')
+        ]
+        self.assertEqual(stored, rebuilt)
+        self.assertEqual(stats_row(self.user), stats_row(compute_ledger_stats(self.user.pk)))
+
+    def test_delete_selected(self):
+        selected = [entry.pk for entry in self.transactions[:5]]
+        response = self.post({'action': 'delete', 'transactions': selected})
+        self.assertRedirects(response, reverse('transaction_list'))
+
+        self.assertFalse(Transaction.objects.filter(pk__in=selected).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 7)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00') - sum(entry.amount for entry in self.transactions[5:]))
+        self.assertLedgerConsistent()
+
+    def test_change_category(self):
+        selected = [entry.pk for entry in self.transactions[:4]]
+        self.post({'action': 'category', 'category': self.income_category.pk, 'transactions': selected})
+
+        moved = Transaction.objects.filter(pk__in=selected)
+        self.assertEqual(set(moved.values_list('category_id', flat=True)), {self.income_category.pk})
+        self.assertTrue(all(entry.signed_amount == entry.amount for entry in moved))
+        self.assertLedgerConsistent()
+
+    def test_move_to_account(self):
+        selected = [entry.pk for entry in self.transactions[:6]]
+        self.post({'action': 'account', 'account': self.other_account.pk, 'transactions': selected})
+
+        self.assertEqual(Transaction.objects.filter(account=self.other_account).count(), 6)
+        self.other_account.refresh_from_db()
+        self.assertEqual(self.other_account.balance, Decimal('500.00') - sum(entry.amount for entry in self.transactions[:6]))
+        self.assertLedgerConsistent()
+
+    def test_select_all_applies_to_the_filtered_records(self):
+        query = '?start_date=2024-02-01&end_date=2024-02-29'
+        response = self.client.get(f"{reverse('transaction_bulk')}{query}&select_all=on")
+        self.assertEqual(response.context['selected_count'], 4)
+
+        response = self.post({'action': 'delete', 'select_all': 'True'}, query)
+        self.assertRedirects(response, f"{reverse('transaction_list')}{query}")
+        self.assertFalse(Transaction.objects.filter(user=self.user, date__month=2).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 8)
+        self.assertLedgerConsistent()
+
+    def test_invalid_filters_never_select_everything(self):
+        response = self.post({'action': 'delete', 'select_all': 'True'}, '?start_date=not-a-date')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 12)
+
+    def test_other_users_records_are_left_alone(self):
+        other = User.objects.create_user(username='other', password='testpassword')
+        account = Account.objects.create(user=other, name='Other', balance=Decimal('100.00'))
+        entry = Transaction.objects.create(
+            user=other, account=account, category=self.expense_category,
+            amount=Decimal('5.00'), date=date(2024, 1, 1), description='Not yours'
+        )
+        self.post({'action': 'delete', 'transactions': [entry.pk]})
+        self.assertTrue(Transaction.objects.filter(pk=entry.pk).exists())
+
+        # nor can records be moved to their accounts
+        response = self.post({'action': 'account', 'account': account.pk, 'transactions': [self.transactions[0].pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('account', response.context['form'].errors)
+
+    def test_form_errors(self):
+        response = self.post({'action': 'delete'})
+        self.assertIn("Select at least one record.", response.context['form'].non_field_errors())
+
+        response = self.post({'action': 'category', 'transactions': [self.transactions[0].pk]})
+        self.assertIn('category', response.context['form'].errors)
+
+    def test_query_count_does_not_grow_with_the_selection(self):
+        def delete_queries(entries):
+            with CaptureQueriesContext(connection) as queries:
+                bulk_delete_transactions(Transaction.objects.filter(pk__in=[entry.pk for entry in entries]))
+            return len(queries)
+
+        # one day and month of one account each time
+        few = [entry for entry in self.transactions if entry.date == date(2024, 1, 1)]
+        many = [
+            Transaction.objects.create(
+                user=self.user, account=self.account, category=self.expense_category,
+                amount=Decimal('1.00'), date=date(2024, 2, 2), description='Bulk'
+            )
+            for _ in range(40)
+        ]
+        self.assertEqual(delete_queries(few), delete_queries(many))
+        self.assertLedgerConsistent()
+
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def add_expense(self, amount):
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            amount=Decimal(amount), date=date.today(), description='Entry'
+        )
+
+    def check_cache_cycle(self):
+        reset_cache_stats('dashboard')
+        self.add_expense('10.00')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_expenses'], Decimal('10.00'))
+
+        # only the session and user lookups and the data version read for
+        # the ETag remain on a cache hit
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        app_queries = [q for q in queries.captured_queries if '"budget_cache"' not in q['sql']
+                       and 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(app_queries), 3)
+        self.assertEqual(response.context['total_expenses'], Decimal('10.00'))
+
+        # writes bump the user's data version
+        self.add_expense('5.00')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_expenses'], Decimal('15.00'))
+
+        Budget.objects.create(user=self.user, category=self.category, limit_amount=Decimal('50.00'),
+                              month=date.today().month, year=date.today().year)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['budget_summary_list']), 1)
+
+        # the page data, its period totals and the forecast are cached separately
+        self.assertEqual(get_cache_stats('dashboard'), {'hits': 2, 'misses': 9, 'hit_rate': 2 / 11})
+
+    def test_page_and_charts_share_the_period_totals(self):
+        self.add_expense('10.00')
+        with CaptureQueriesContext(connection) as queries:
+            for name in ('dashboard', 'dashboard_spending', 'dashboard_balance_trend'):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+        period_totals = [q for q in queries.captured_queries if '"total_since_start"' in q['sql']]
+        self.assertEqual(len(period_totals), 1)
+
+    def test_local_memory_cache(self):
+        with override_settings(CACHES=LOCAL_MEMORY_CACHES):
+            self.check_cache_cycle()
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.check_cache_cycle()
+
+    def test_database_cache(self):
+        # the default backend, whose table the test runner creates
+        self.check_cache_cycle()
+
+    def test_gunicorn_refuses_a_per_process_cache(self):
+        with patch.dict(os.environ, {'SERVER_SOFTWARE': 'gunicorn/20.1.0'}):
+            check_shared_cache()
+            self.assertEqual(check_cache_is_shared(None), [])
+
+            with override_settings(CACHES=LOCAL_MEMORY_CACHES):
+                with self.assertRaises(ImproperlyConfigured):
+                    check_shared_cache()
+
+        with override_settings(CACHES=LOCAL_MEMORY_CACHES):
+            self.assertEqual([warning.id for warning in check_cache_is_shared(None)], ['budget.W001'])
+
+    def test_months_are_cached_separately(self):
+        self.add_expense('10.00')
+        response = self.client.get(reverse('dashboard'), {'month': 1, 'year': 2020})
+        self.assertEqual(response.context['total_expenses'], Decimal('0.00'))
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_expenses'], Decimal('10.00'))
+
+
+class FakeLedgerTests(TestCase):
+
+    def test_generated_ledger_is_consistent(self):
+        result = generate_fake_ledger(2, 3, 60, seed=1, days=90)
+        self.assertEqual((result['users'], result['accounts'], result['transactions']), (2, 6, 120))
+
+        for user in User.objects.filter(username__startswith='fake-user-'):
+            # the stored rollups match a rebuild from the raw transactions
+            totals = {
+                (row['category_id'], row['year'], row['month']): (row['total'], row['count'])
+                for row in MonthlyCategoryTotal.objects.filter(user=user).values('category_id', 'year', 'month', 'total', 'count')
+            }
+            expected = {}
+            for entry in Transaction.objects.filter(user=user):
+                key = (entry.category_id, entry.date.year, entry.date.month)
+                total, count = expected.get(key, (Decimal('0.00'), 0))
+                expected[key] = (total + entry.amount, count + 1)
+            self.assertEqual(totals, expected)
+
+            account_total = Account.objects.filter(user=user).aggregate(total=Sum('balance'))['total']
+            rebuilt = [
+                (row.date, row.balance, row.change, row.count)
+                for row in build_daily_balances(Transaction.objects.filter(user=user), {user.pk: account_total})
+            ]
+            stored = [
+                (row.date, row.balance, row.change, row.count)
+                for row in DailyBalance.objects.filter(user=user).order_by('-date')
+            ]
+            self.assertEqual(stored, rebuilt)
+            self.assertEqual(stats_row(user), stats_row(compute_ledger_stats(user.pk)))
+
+    def test_same_seed_gives_the_same_ledger(self):
+        def ledger(prefix):
+            generate_fake_ledger(1, 2, 30, seed=7, prefix=prefix, end_date=date(2024, 6, 30))
+            return list(Transaction.objects.filter(user__username__startswith=prefix).order_by('pk').values_list(
+                'account__name', 'category__name', 'amount', 'date'
+            ))
+
+        self.assertEqual(ledger('first-'), ledger('second-'))
+
+    def test_generate_fake_ledger_command(self):
+        out = io.StringIO()
+        call_command('generate_fake_ledger', users=2, accounts=2, transactions=10, stdout=out)
+        self.assertIn('Created 2 users, 4 accounts and 20 transactions', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('generate_fake_ledger', users=1, stdout=out)
+
+    def test_benchmark_command_writes_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark_budget', sizes='20,40', repeat=2, output=path, stderr=io.StringIO())
+            with open(path) as fileobj:
+                results = json.load(fileobj)
+
+        self.assertEqual([size['transactions'] for size in results['sizes']], [20, 40])
+        benchmarks = results['sizes'][0]['benchmarks']
+        self.assertEqual(set(benchmarks), {
+            'dashboard', 'dashboard_cached', 'dashboard_async', 'transaction_list_first_page', 'transaction_list_deep_page',
+            'transaction_create', 'transaction_update', 'transaction_delete',
+        })
+        self.assertGreater(benchmarks['dashboard']['queries'], benchmarks['dashboard_cached']['queries'])
+
+        # the write benchmarks leave the generated data as they found it
+        self.assertEqual(Transaction.objects.filter(user__username__startswith='benchmark-20-').count(), 20)
+
+
+class RecurringTransactionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.salary = Category.objects.create(name='Salary', type='I')
+        self.rent = Category.objects.create(name='Rent', type='E')
+        self.checking = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        self.savings = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+
+    def schedule(self, start_date, cadence='M', account=None, category=None, amount='100.00', **kwargs):
+        return RecurringTransaction.objects.create(
+            user=self.user, account=account or self.checking, category=category or self.rent,
+            amount=Decimal(amount), description='Rent', cadence=cadence, start_date=start_date, **kwargs
+        )
+
+    def test_due_occurrences(self):
+        schedule = self.schedule(date(2025, 1, 31))
+        self.assertEqual(schedule.next_due, date(2025, 1, 31))
+        self.assertEqual(schedule.due_occurrences(date(2025, 4, 15)), (
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)], date(2025, 4, 30)
+        ))
+
+        schedule.next_due = date(2025, 2, 28)
+        self.assertEqual(schedule.due_occurrences(date(2025, 3, 31))[0], [date(2025, 2, 28), date(2025, 3, 31)])
+
+        weekly = self.schedule(date(2025, 1, 1), cadence='W', end_date=date(2025, 1, 20))
+        self.assertEqual(weekly.due_occurrences(date(2025, 2, 1)), (
+            [date(2025, 1, 1), date(2025, 1, 8), date(2025, 1, 15)], date(2025, 1, 22)
+        ))
+
+        yearly = self.schedule(date(2024, 2, 29), cadence='Y')
+        self.assertEqual(yearly.due_occurrences(date(2026, 1, 1))[0], [date(2024, 2, 29), date(2025, 2, 28)])
+
+    def test_run_creates_backlog_once(self):
+        self.schedule(date(2025, 1, 1))
+        self.schedule(date(2025, 1, 15), category=self.salary, amount='2000.00')
+        self.schedule(date(2025, 2, 1), account=self.savings, amount='10.00')
+        ended = self.schedule(date(2025, 1, 1), cadence='W', end_date=date(2024, 12, 31))
+
+        with CaptureQueriesContext(connection) as queries:
+            result = run_recurring(date(2025, 3, 20))
+        self.assertEqual((result['schedules'], result['occurrences']), (3, 8))
+
+        # one balance delta per account, whatever the number of occurrences
+        balance_updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "budget_account"')]
+        self.assertEqual(len(balance_updates), 2)
+
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('6700.00'))
+        self.assertEqual(self.savings.balance, Decimal('480.00'))
+        self.assertEqual(find_balance_drift([self.user.pk]), (2, []))
+        self.assertEqual(
+            list(MonthlyCategoryTotal.objects.filter(category=self.rent, month=2).values_list('total', 'count')),
+            [(Decimal('110.00'), 2)],
+        )
+
+        balances = list(DailyBalance.objects.filter(user=self.user).values_list('date', 'balance', 'change'))
+        call_command('rebuild_daily_balances', stdout=io.StringIO())
+        self.assertEqual(balances, list(DailyBalance.objects.filter(user=self.user).values_list('date', 'balance', 'change')))
+
+        # reruns only pick up what has fallen due since
+        self.assertEqual(run_recurring(date(2025, 3, 20))['occurrences'], 0)
+        self.assertEqual(run_recurring(date(2025, 4, 1))['occurrences'], 2)
+        self.assertFalse(ended.occurrences.exists())
+
+    def test_failed_batch_leaves_nothing_behind(self):
+        self.schedule(date(2025, 1, 1))
+
+        with patch('budget.recurring.LedgerChanges.apply', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                run_recurring(date(2025, 3, 20))
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(RecurringTransaction.objects.get().next_due, date(2025, 1, 1))
+
+        self.assertEqual(run_recurring(date(2025, 3, 20))['occurrences'], 3)
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('700.00'))
+
+    def test_occurrence_dates_are_unique(self):
+        schedule = self.schedule(date(2025, 1, 1))
+        run_recurring(date(2025, 1, 1))
+        with self.assertRaises(IntegrityError):
+            Transaction.objects.create(
+                user=self.user, account=self.checking, category=self.rent, recurring=schedule,
+                amount=Decimal('100.00'), date=date(2025, 1, 1), description='Rent'
+            )
+
+    def test_moving_an_occurrence_onto_another_is_a_form_error(self):
+        self.schedule(date(2025, 1, 1))
+        run_recurring(date(2025, 2, 1))
+        february = Transaction.objects.get(date=date(2025, 2, 1))
+
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.post(reverse('transaction_update', args=[february.pk]), {
+            'account': self.checking.pk, 'category': self.rent.pk, 'amount': '100.00',
+            'description': 'Rent', 'date': '2025-01-01',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('date', response.context['form'].errors)
+        february.refresh_from_db()
+        self.assertEqual(february.date, date(2025, 2, 1))
+
+    def test_command(self):
+        self.schedule(date(2025, 1, 1))
+        out = io.StringIO()
+        call_command('run_recurring', '--date', '2025-02-01', stdout=out)
+        self.assertIn('Created 2 transactions from 1 recurring schedules', out.getvalue())
+
+
+class UserLedgerStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def add_expense(self, amount, day):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            amount=Decimal(amount), date=day, description='Entry'
+        )
+
+    def assertStatsMatchLedger(self):
+        self.assertEqual(stats_row(self.user), stats_row(compute_ledger_stats(self.user.pk)))
+
+    def test_follows_transaction_changes(self):
+        first = self.add_expense('10.00', date(2023, 5, 1))
+        last = self.add_expense('20.00', date(2024, 2, 1))
+        self.add_expense('5.00', date(2023, 9, 1))
+        self.assertEqual(stats_row(self.user), (date(2023, 5, 1), date(2024, 2, 1), 3, Decimal('65.00')))
+
+        last.date = date(2024, 8, 1)
+        last.amount = Decimal('25.00')
+        last.save()
+        self.assertEqual(stats_row(self.user), (date(2023, 5, 1), date(2024, 8, 1), 3, Decimal('60.00')))
+
+        first.delete()
+        self.assertEqual(stats_row(self.user), (date(2023, 9, 1), date(2024, 8, 1), 2, Decimal('70.00')))
+        self.assertStatsMatchLedger()
+
+    def test_follows_account_changes(self):
+        self.add_expense('10.00', date(2024, 1, 1))
+        savings = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+        self.assertEqual(stats_row(self.user)[3], Decimal('590.00'))
+
+        savings.balance = Decimal('450.00')
+        savings.save()
+        self.assertEqual(stats_row(self.user)[3], Decimal('540.00'))
+
+        # deleting the account deletes its transactions too
+        self.account.delete()
+        self.assertEqual(stats_row(self.user), (None, None, 0, Decimal('450.00')))
+        self.assertStatsMatchLedger()
+
+    def test_missing_row_is_worked_out_on_first_use(self):
+        self.add_expense('10.00', date(2024, 1, 1))
+        UserLedgerStats.objects.filter(user=self.user).delete()
+
+        self.assertEqual(stats_row(get_ledger_stats(self.user.pk)), (date(2024, 1, 1), date(2024, 1, 1), 1, Decimal('90.00')))
+        self.assertStatsMatchLedger()
+
+    def test_deleting_the_user_does_not_recreate_the_row(self):
+        self.add_expense('10.00', date(2024, 1, 1))
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertFalse(UserLedgerStats.objects.filter(user_id=user_id).exists())
+
+    def test_reconcile_fix_corrects_the_total_balance(self):
+        self.add_expense('10.00', date(2024, 1, 1))
+        # bypass the signals
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('70.00'))
+        UserLedgerStats.objects.filter(user=self.user).update(total_balance=Decimal('70.00'))
+
+        call_command('reconcile_balances', '--fix', workers=1, stdout=io.StringIO())
+        self.assertEqual(stats_row(self.user)[3], Decimal('90.00'))
+        self.assertStatsMatchLedger()
+
+    def test_dashboard_reads_years_and_balance_from_the_stats(self):
+        self.add_expense('10.00', date(2022, 3, 1))
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_balance'], Decimal('90.00'))
+        self.assertEqual(response.context['years'][0], 2022)
+
+
+class ReconcileBalancesTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.other_account = Account.objects.create(user=self.user, name='Savings', balance=Decimal('500.00'))
+        self.expense = Transaction.objects.create(
+            user=self.user, account=self.account, category=self.expense_category,
+            amount=Decimal('30.00'), date=date.today(), description='Food'
+        )
+        Transaction.objects.create(
+            user=self.user, account=self.other_account, category=self.income_category,
+            amount=Decimal('20.00'), date=date.today(), description='Interest'
+        )
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_balances', *args, workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_no_drift(self):
+        self.assertIn('Checked 2 accounts of 1 users', self.reconcile())
+        self.assertIn('0 drifted', self.reconcile())
+
+    def test_opening_balance_follows_manual_balance_edits(self):
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.opening_balance, Decimal('100.00'))
+
+        # the user corrects the balance by hand
+        self.account.balance = Decimal('120.00')
+        self.account.save()
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.opening_balance, Decimal('150.00'))
+        self.assertIn('0 drifted', self.reconcile())
+
+    def test_reports_and_fixes_drift(self):
+        # bypass the signals
+        Transaction.objects.filter(pk=self.expense.pk).update(amount=Decimal('45.00'), signed_amount=Decimal('-45.00'))
+        Account.objects.filter(pk=self.other_account.pk).update(balance=Decimal('1.00'))
+
+        output = self.reconcile()
+        self.assertIn('2 drifted', output)
+        self.assertIn('balance 70.00, expected 55.00', output)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('70.00'))
+
+        self.assertIn('all fixed', self.reconcile('--fix'))
+        self.account.refresh_from_db()
+        self.other_account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('55.00'))
+        self.assertEqual(self.other_account.balance, Decimal('520.00'))
+        self.assertIn('0 drifted', self.reconcile())
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            self.reconcile('--user', 'nobody')
+
+
+class ReconcileWorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Worker processes cannot open an in-memory test database")
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.accounts = []
+        for number in range(3):
+            user = User.objects.create_user(username=f'user{number}', password='testpassword')
+            account = Account.objects.create(user=user, name='Checking', balance=Decimal('100.00'))
+            Transaction.objects.create(
+                user=user, account=account, category=self.category,
+                amount=Decimal('30.00'), date=date.today(), description='Food'
+            )
+            self.accounts.append(account)
+
+    def test_workers_reconcile_every_chunk(self):
+        for method in ('fork', 'spawn'):
+            with self.subTest(method=method):
+                # bypass the signals
+                Account.objects.filter(pk=self.accounts[1].pk).update(balance=Decimal('1.00'))
+                executor = partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context(method))
+
+                out = io.StringIO()
+                with patch('budget.management.commands.reconcile_balances.ProcessPoolExecutor', executor):
+                    call_command('reconcile_balances', '--fix', workers=2, chunk_size=1, stdout=out)
+                self.assertIn('Checked 3 accounts of 3 users', out.getvalue())
+                self.assertIn('1 drifted, all fixed', out.getvalue())
+                self.accounts[1].refresh_from_db()
+                self.assertEqual(self.accounts[1].balance, Decimal('70.00'))
+
+
+class SidebarFragmentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def add_expense(self, amount):
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            amount=Decimal(amount), date=date.today(), description='Entry'
+        )
+
+    def get_with_queries(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), params or {})
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_hits_skip_the_sidebar_queries(self):
+        for name, sidebar_query in (('account_list', '"budget_userledgerstats"."total_balance"'), ('transaction_list', 'ORDER BY "budget_account"."name"')):
+            with self.subTest(name=name):
+                response, queries = self.get_with_queries(name)
+                self.assertTrue(any(sidebar_query in sql for sql in queries))
+                html = response.context['sidebar']
+
+                response, queries = self.get_with_queries(name)
+                self.assertFalse(any(sidebar_query in sql for sql in queries))
+                self.assertEqual(response.context['sidebar'], html)
+
+    def test_hit_rates(self):
+        for name in ('account_sidebar', 'transaction_sidebar'):
+            reset_cache_stats(name)
+        for _ in range(3):
+            self.client.get(reverse('account_list'))
+        self.client.get(reverse('transaction_list'))
+        self.assertEqual(get_cache_stats('account_sidebar'), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+        self.assertEqual(get_cache_stats('transaction_sidebar'), {'hits': 0, 'misses': 1, 'hit_rate': 0})
+
+        out = io.StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('account_sidebar: 2 hits, 1 misses (66.7% hit rate)', out.getvalue())
+
+    def test_hits_write_nothing_to_the_cache(self):
+        reset_cache_stats('account_sidebar')
+        self.client.get(reverse('account_list'))
+
+        response, queries = self.get_with_queries('account_list')
+        cache_queries = [sql for sql in queries if '"budget_cache"' in sql]
+        self.assertTrue(all(sql.startswith('SELECT') for sql in cache_queries))
+        # the fragment and its data versions are read in one query
+        fragment_queries = [sql for sql in cache_queries if 'budget:fragment' in sql or 'budget:data-version' in sql]
+        self.assertEqual(len(fragment_queries), 1)
+        self.assertIn('budget:data-version', fragment_queries[0])
+
+        # the counters reach the cache once flushed
+        flush_cache_stats(force=True)
+        self.assertEqual(cache.get('budget:cache-stats:account_sidebar:hits'), 1)
+        self.assertEqual(get_cache_stats('account_sidebar'), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_only_changes_to_its_data_render_it_again(self):
+        self.add_expense('10.00')
+        self.assertContains(self.client.get(reverse('account_list')), '€90.00')
+
+        # budgets do not change the account sidebar, transactions do
+        reset_cache_stats('account_sidebar')
+        Budget.objects.create(user=self.user, category=self.category, limit_amount=Decimal('50.00'),
+                              month=date.today().month, year=date.today().year)
+        self.client.get(reverse('account_list'))
+        self.add_expense('5.00')
+        self.assertContains(self.client.get(reverse('account_list')), '€85.00')
+        self.assertEqual(get_cache_stats('account_sidebar')['misses'], 1)
+
+        # the transaction sidebar lists the accounts, but not the transactions
+        self.client.get(reverse('transaction_list'))
+        reset_cache_stats('transaction_sidebar')
+        self.add_expense('1.00')
+        self.client.get(reverse('transaction_list'))
+        Account.objects.create(user=self.user, name='Savings', balance=Decimal('0.00'))
+        self.assertContains(self.client.get(reverse('transaction_list')), '>Savings - (testuser)</option>')
+        self.assertEqual(get_cache_stats('transaction_sidebar'), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_fragments_are_per_user(self):
+        self.client.get(reverse('account_list'))
+        User.objects.create_user(username='otheruser', password='testpassword')
+        self.client.login(username='otheruser', password='testpassword')
+        self.assertContains(self.client.get(reverse('account_list')), '€0.00')
+
+    def test_fragments_vary_on_the_query(self):
+        response = self.client.get(reverse('transaction_list'), {'accounts': self.account.pk})
+        self.assertContains(response, f'<option value="{self.account.pk}" selected>Checking - (testuser)</option>',
+                            html=True)
+        response = self.client.get(reverse('transaction_list'))
+        self.assertNotContains(response, 'selected>Checking')
+
+        self.assertContains(self.client.get(reverse('budget_list')), 'Budget vs Actual')
+        response = self.client.get(reverse('budget_report'), {'start': '2025-06', 'end': '2025-01'})
+        self.assertContains(response, 'alert-danger')
+        self.assertNotContains(self.client.get(reverse('budget_report')), 'alert-danger')
+
+
+class CategoryRegistryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def test_categories_are_loaded_once(self):
+        get_categories()
+        # only the shared category version is read, from the database cache
+        with self.assertNumQueries(1):
+            categories = get_categories()
+        self.assertEqual([category.name for category in categories.values()], ['Groceries', 'Salary'])
+
+    def test_saving_or_deleting_a_category_reloads_the_registry(self):
+        get_categories()
+        self.expense_category.name = 'Food'
+        self.expense_category.save()
+        self.assertEqual(get_categories()[self.expense_category.pk].name, 'Food')
+
+        income_category_pk = self.income_category.pk
+        self.income_category.delete()
+        self.assertNotIn(income_category_pk, get_categories())
+
+    def test_version_bumped_by_another_process_reloads_the_registry(self):
+        get_categories()
+        # another worker renaming the category without going through this process
+        Category.objects.filter(pk=self.expense_category.pk).update(name='Food')
+        cache.incr('budget:category-version')
+
+        # the shared category version, then the categories
+        with self.assertNumQueries(2):
+            self.assertEqual(get_categories()[self.expense_category.pk].name, 'Food')
+
+    def test_signals_do_not_load_the_category(self):
+        get_categories()
+        # only the insert and the account, monthly total and daily balance writes remain
+        with CaptureQueriesContext(connection) as queries:
+            Transaction.objects.create(
+                user=self.user, account=self.account, category_id=self.income_category.pk,
+                amount=Decimal('50.00'), date=date.today(), description='Salary'
+            )
+        self.assertFalse(any('FROM "budget_category"' in query['sql'] for query in queries.captured_queries))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('150.00'))
+
+    def test_forms_render_categories_without_queries(self):
+        get_categories()
+        # only the shared category version is read, from the database cache
+        with self.assertNumQueries(1):
+            html = BudgetForm(user=self.user).as_p()
+        self.assertIn('Groceries', html)
+        self.assertNotIn('Salary', html)
+
+        with CaptureQueriesContext(connection) as queries:
+            html = TransactionForm(user=self.user).as_p()
+        self.assertFalse(any('FROM "budget_category"' in query['sql'] for query in queries.captured_queries))
+        self.assertIn('Groceries', html)
+        self.assertIn('Salary', html)
+
+    def test_form_validates_categories_from_the_registry(self):
+        get_categories()
+        data = {'category': self.expense_category.pk, 'limit_amount': '20.00',
+                'month': date.today().month, 'year': date.today().year}
+        form = BudgetForm(data=data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['category'], self.expense_category)
+
+        form = BudgetForm(data={**data, 'category': self.income_category.pk}, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+
+    def test_category_changes_invalidate_the_dashboard(self):
+        version = get_category_version()
+        self.expense_category.name = 'Food'
+        self.expense_category.save()
+        self.assertNotEqual(get_category_version(), version)
+
+
+class BudgetReportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.groceries = Category.objects.create(name='Groceries', type='E')
+        self.rent = Category.objects.create(name='Rent', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('5000.00'))
+
+        for category, month, limit in [(self.groceries, 1, '200.00'), (self.groceries, 2, '200.00'),
+                                       (self.rent, 2, '800.00'), (self.rent, 3, '0.00')]:
+            Budget.objects.create(user=self.user, category=category, limit_amount=Decimal(limit), month=month, year=2025)
+
+        for category, day, amount in [(self.groceries, date(2025, 1, 5), '120.00'),
+                                      (self.groceries, date(2025, 1, 20), '40.00'),
+                                      (self.groceries, date(2025, 2, 3), '250.00'),
+                                      (self.rent, date(2025, 2, 1), '800.00'),
+                                      (self.rent, date(2025, 3, 1), '800.00')]:
+            Transaction.objects.create(user=self.user, account=self.account, category=category,
+                                       amount=Decimal(amount), date=day, description='Entry')
+
+    def test_cells_are_computed_in_one_query(self):
+        with self.assertNumQueries(1):
+            report = build_budget_report(self.user, date(2025, 1, 1), date(2025, 3, 1))
+
+        self.assertEqual(report['months'], [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)])
+        groceries, rent = report['rows']
+        self.assertEqual(groceries['category_name'], 'Groceries')
+
+        january, february, march = groceries['cells']
+        self.assertIsNone(march)
+        self.assertEqual((january['spent'], january['remaining'], january['status']),
+                         (Decimal('160.00'), Decimal('40.00'), 'warning'))
+        self.assertAlmostEqual(january['percent_used'], 80.0)
+        self.assertEqual((february['remaining'], february['status']), (Decimal('-50.00'), 'danger'))
+
+        # a zero budget never counts as used up
+        self.assertIsNone(rent['cells'][0])
+        self.assertEqual((rent['cells'][1]['status'], rent['cells'][2]['status']), ('warning', 'success'))
+        self.assertEqual(rent['cells'][2]['percent_used'], 0)
+
+        self.assertEqual((groceries['limit'], groceries['spent']), (Decimal('400.00'), Decimal('410.00')))
+        self.assertEqual([total['spent'] for total in report['column_totals']],
+                         [Decimal('160.00'), Decimal('1050.00'), Decimal('800.00')])
+        self.assertEqual(report['grand_total']['remaining'], Decimal('-810.00'))
+
+    def test_report_view(self):
+        response = self.client.get(reverse('budget_report'), {'start': '2025-01', 'end': '2025-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['report']['months']), 2)
+        self.assertContains(response, 'Feb 2025')
+
+        # an invalid range falls back to the current year
+        response = self.client.get(reverse('budget_report'), {'start': '2025-03', 'end': '2025-01'})
+        self.assertEqual(response.context['first_month'], date(date.today().year, 1, 1))
+        self.assertContains(response, 'must not be before')
+
+    def test_dashboard_uses_the_same_cells(self):
+        response = self.client.get(reverse('dashboard'), {'month': 2, 'year': 2025})
+        summary = {item['category_name']: item for item in response.context['budget_summary_list']}
+        self.assertEqual(summary['Groceries']['spent'], Decimal('250.00'))
+        self.assertEqual(summary['Rent']['status'], 'warning')
+
+
+@override_settings(QUERY_COUNT_HEADERS=True)
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+
+        # several rows of everything, so N+1 queries exceed the budgets
+        self.accounts = [
+            Account.objects.create(user=self.user, name=f'Account {number}', balance=Decimal('100.00'))
+            for number in range(5)
+        ]
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, account=account, category=category, amount=Decimal('10.00'),
+                date=date.today() - timedelta(days=number), description=f'Entry {number}'
+            )
+            for number, account in enumerate(self.accounts)
+            for category in (self.income_category, self.expense_category)
+        ]
+        self.budget = Budget.objects.create(user=self.user, category=self.expense_category, limit_amount=Decimal('50.00'),
+                                            month=date.today().month, year=date.today().year)
+
+    def get_url(self, name):
+        objects = {'account': self.accounts[0], 'transaction': self.transactions[0], 'budget': self.budget}
+        if name.endswith(('_update', '_delete')):
+            return reverse(name, args=[objects[name.split('_')[0]].pk])
+        return reverse(name)
+
+    def assertMaxQueries(self, response, name, budget):
+        count = int(response[QUERY_COUNT_HEADER])
+        self.assertLessEqual(count, budget, f"{name} issued {count} queries, its budget is {budget}.")
+
+    def get_streamed_query_count(self, url):
+        # streamed responses query while they are sent, after the headers
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            b''.join(response.streaming_content)
+        return len(queries)
+
+    def test_every_url_has_a_budget(self):
+        from budget.urls import urlpatterns
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(QUERY_BUDGETS))
+
+    def test_get_query_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                response = self.client.get(self.get_url(name))
+                self.assertEqual(response.status_code, 200)
+                if response.streaming:
+                    count = self.get_streamed_query_count(self.get_url(name))
+                    self.assertLessEqual(count, budget, f"{name} issued {count} queries, its budget is {budget}.")
+                else:
+                    self.assertMaxQueries(response, name, budget)
+
+    def test_post_query_budgets(self):
+        data = {
+            'account': self.accounts[1].pk, 'category': self.expense_category.pk,
+            'amount': '25.00', 'description': 'Posted', 'date': date.today().isoformat(),
+        }
+        for name, budget in POST_QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                response = self.client.post(self.get_url(name), data)
+                self.assertEqual(response.status_code, 302)
+                self.assertMaxQueries(response, name, budget)
+
+    def test_headers_are_off_by_default(self):
+        with override_settings(QUERY_COUNT_HEADERS=False):
+            response = self.client.get(reverse('dashboard'))
+        self.assertNotIn(QUERY_COUNT_HEADER, response)
+
+    def test_queries_are_logged(self):
+        with self.assertLogs('budget.queries', level='DEBUG') as logs:
+            self.client.get(reverse('transaction_list'))
+        self.assertIn('GET /transactions/', logs.output[0])
+        self.assertTrue(any('SELECT' in line for line in logs.output[1:]))
+
+    def test_streamed_queries_are_logged_once_sent(self):
+        with self.assertLogs('budget.queries') as logs:
+            response = self.client.get(reverse('transaction_export'))
+            self.assertNotIn(QUERY_COUNT_HEADER, response)
+            b''.join(response.streaming_content)
+        self.assertIn('GET /transactions/export/: 3 queries', logs.output[-1])
+
+
+class ForecastTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.salary = Category.objects.create(name='Salary', type='I')
+        self.groceries = Category.objects.create(name='Groceries', type='E')
+
+    def add_totals(self, category, first_month, totals):
+        MonthlyCategoryTotal.objects.bulk_create([
+            MonthlyCategoryTotal(user=self.user, category=category, year=month.year, month=month.month,
+                                 total=Decimal(total), count=1)
+            for month, total in ((first_month + relativedelta(months=offset), total)
+                                 for offset, total in enumerate(totals))
+        ])
+
+    def test_linear_trend_and_net_cash_flow(self):
+        self.add_totals(self.groceries, date(2025, 1, 1), [100 + 10 * number for number in range(8)] + [50])
+        self.add_totals(self.salary, date(2025, 1, 1), [1000] * 8)
+
+        with self.assertNumQueries(1):
+            forecast = forecast_spending(self.user, date(2025, 9, 15))
+
+        self.assertEqual(forecast['months'], [date(2025, 10, 1), date(2025, 11, 1), date(2025, 12, 1)])
+        self.assertEqual(forecast['history_months'], 8)
+        salary, groceries = forecast['categories']
+        self.assertEqual((salary['name'], salary['month_to_date'], salary['end_of_month']), ('Salary', 0, 500))
+
+        # 50 spent so far plus half of the 180 the trend expects for September
+        self.assertEqual((groceries['month_to_date'], groceries['end_of_month']), (50, 140))
+        self.assertEqual(groceries['next_months'], [190, 200, 210])
+        self.assertEqual(forecast['net'], {'end_of_month': 360, 'next_months': [810, 800, 790]})
+
+    def test_seasonal_offsets_after_two_years(self):
+        history = [400 if month.month == 12 else 100
+                   for month in (date(2022, 9, 1) + relativedelta(months=offset) for offset in range(24))]
+        self.add_totals(self.groceries, date(2022, 9, 1), history)
+
+        october, november, december = forecast_spending(self.user, date(2024, 9, 10))['categories'][0]['next_months']
+        self.assertAlmostEqual(october, 100, places=2)
+        self.assertAlmostEqual(december, 400, places=2)
+
+    def test_no_history(self):
+        self.add_totals(self.groceries, date(2025, 9, 1), [50])
+        self.assertEqual(forecast_spending(self.user, date(2025, 9, 15)), {})
+
+    def test_dashboard_forecast_is_cached_until_the_next_write(self):
+        self.client.login(username='testuser', password='testpassword')
+        account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        Transaction.objects.create(user=self.user, account=account, category=self.groceries, amount=Decimal('30.00'),
+                                   date=date.today() - relativedelta(months=1), description='Entry')
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['forecast']['categories'][0]['month_to_date'], 0)
+
+        Transaction.objects.create(user=self.user, account=account, category=self.groceries, amount=Decimal('12.00'),
+                                   date=date.today(), description='Entry')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['forecast']['categories'][0]['month_to_date'], 12)
+
+
+class DashboardChartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.period = {'month': 3, 'year': 2025}
+        self.add_transaction(self.income_category, '50.00', date(2025, 3, 2))
+        self.add_transaction(self.expense_category, '20.00', date(2025, 3, 4))
+
+    def add_transaction(self, category, amount, day):
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=category,
+            amount=Decimal(amount), date=day, description='Entry'
+        )
+
+    def test_spending_data(self):
+        response = self.client.get(reverse('dashboard_spending'), self.period)
+        self.assertEqual(response.json(), {'labels': ['Groceries'], 'data': [20.0], 'total': 20.0})
+
+    def test_balance_trend_data(self):
+        response = self.client.get(reverse('dashboard_balance_trend'), self.period)
+        self.assertEqual(response.json(), {
+            'labels': ['01/03', '02/03', '04/03', '31/03'],
+            'data': [100.0, 150.0, 130.0, 130.0],
+        })
+
+    def test_conditional_get(self):
+        for name in ('dashboard_spending', 'dashboard_balance_trend'):
+            with self.subTest(name=name):
+                url = reverse(name)
+                response = self.client.get(url, self.period)
+                self.assertIn('private', response['Cache-Control'])
+                etag = response['ETag']
+
+                response = self.client.get(url, self.period, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                # another month or a new transaction changes the ETag
+                response = self.client.get(url, {'month': 2, 'year': 2025}, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+                self.add_transaction(self.expense_category, '5.00', date(2025, 3, 10))
+                response = self.client.get(url, self.period, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_skips_the_data_queries(self):
+        url = reverse('dashboard_balance_trend')
+        etag = self.client.get(url, self.period)['ETag']
+        # only the session and user lookups, the category version and the data version
+        with self.assertNumQueries(4):
+            response = self.client.get(url, self.period, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_chart_data_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('dashboard_spending'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_dashboard_page_links_to_the_chart_data(self):
+        response = self.client.get(reverse('dashboard'), self.period)
+        self.assertContains(response, 'data-url="/dashboard/spending/?month=3&amp;year=2025"')
+        self.assertNotIn('chart_data', response.context)
+
+
+class AsyncDashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        income_category = Category.objects.create(name='Salary', type='I')
+        self.expense_category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        Budget.objects.create(user=self.user, category=self.expense_category, limit_amount=Decimal('50.00'),
+                              month=date.today().month, year=date.today().year)
+        for category, amount, day in (
+            (income_category, '300.00', date.today() - relativedelta(months=2)),
+            (self.expense_category, '40.00', date.today() - relativedelta(months=1)),
+            (self.expense_category, '20.00', date.today()),
+        ):
+            Transaction.objects.create(
+                user=self.user, account=self.account, category=category,
+                amount=Decimal(amount), date=day, description='Entry'
+            )
+
+    def test_matches_the_sync_dashboard(self):
+        expected = self.client.get(reverse('dashboard')).context
+        cache.clear()
+        response = self.client.get(reverse('dashboard_async'))
+        self.assertEqual(response.status_code, 200)
+        for key in ('years', 'accounts', 'total_balance', 'total_income', 'total_expenses',
+                    'spending_by_category', 'budget_summary_list', 'forecast', 'spending_chart_url'):
+            with self.subTest(key=key):
+                self.assertEqual(response.context[key], expected[key])
+        self.assertEqual(response.context['total_balance'], Decimal('340.00'))
+
+    def test_is_cached_with_the_sync_dashboard(self):
+        self.client.get(reverse('dashboard'))
+        reset_cache_stats('dashboard')
+        self.client.get(reverse('dashboard_async'))
+        self.assertEqual(get_cache_stats('dashboard')['hits'], 2)
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('dashboard_async'))
+        self.assertRedirects(response, f"{reverse('account_login')}?next={reverse('dashboard_async')}",
+                             fetch_redirect_response=False)
+
+    def test_other_methods_are_not_allowed(self):
+        response = self.client.post(reverse('dashboard_async'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_queries_stay_on_the_connection_of_a_transaction(self):
+        # other connections would not see the rows created in setUp
+        results = async_to_sync(run_concurrently)(
+            lambda: threading.current_thread().name,
+            lambda: Transaction.objects.filter(user=self.user).count(),
+        )
+        self.assertEqual(results, [threading.current_thread().name, 3])
+
+
+class AsyncDashboardConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            amount=Decimal('25.00'), date=date.today(), description='Entry'
+        )
+
+    def test_queries_run_at_the_same_time_on_the_pool(self):
+        # each call waits for the other, so they can only finish concurrently
+        both_started = threading.Barrier(2, timeout=5)
+
+        def query():
+            both_started.wait()
+            return threading.current_thread().name, Transaction.objects.filter(user=self.user).count()
+
+        results = async_to_sync(run_concurrently)(query, query)
+        self.assertEqual([count for name, count in results], [1, 1])
+        self.assertTrue(all(name.startswith('budget-query') for name, count in results))
+        self.assertNotEqual(results[0][0], results[1][0])
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    def test_query_count_includes_the_pool_threads(self):
+        async def view(request):
+            await run_concurrently(Transaction.objects.count, Account.objects.count)
+            return HttpResponse()
+
+        # the middleware stays async in front of an async view
+        middleware = QueryCountMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response[QUERY_COUNT_HEADER], '2')
+
+    def test_dashboard(self):
+        response = self.client.get(reverse('dashboard_async'))
+        self.assertEqual(response.context['total_expenses'], Decimal('25.00'))
+        self.assertEqual(response.context['total_balance'], Decimal('75.00'))
+        self.assertEqual(response.context['accounts'], [self.account])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Groceries', type='E')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.urls = [reverse(name) for name in (
+            'dashboard', 'dashboard_async', 'transaction_list', 'account_list', 'budget_list'
+        )]
+
+    def get_etags(self):
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('private', response['Cache-Control'])
+            etags[url] = response['ETag']
+        return etags
+
+    def assertNotModified(self, etags, expected=True):
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304 if expected else 200)
+
+    def test_unchanged_pages_are_not_modified(self):
+        etags = self.get_etags()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                # only the session and user lookups, the category version and the data version
+                with self.assertNumQueries(4):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_etags_follow_the_persisted_data_version(self):
+        etags = self.get_etags()
+        # a write seen only through the database, as by another process
+        # with a stale cache, still changes every ETag
+        bump_ledger_data_version(self.user.pk)
+        self.assertNotModified(etags, expected=False)
+
+    def test_writes_change_the_etag(self):
+        for write in (
+            lambda: Transaction.objects.create(
+                user=self.user, account=self.account, category=self.category,
+                amount=Decimal('5.00'), date=date.today(), description='Entry'
+            ),
+            lambda: Account.objects.create(user=self.user, name='Savings', balance=Decimal('1.00')),
+            lambda: Budget.objects.create(user=self.user, category=self.category, limit_amount=Decimal('10.00'),
+                                          month=date.today().month, year=date.today().year),
+        ):
+            etags = self.get_etags()
+            write()
+            self.assertNotModified(etags, expected=False)
+
+    def test_other_users_writes_keep_the_etag(self):
+        etags = self.get_etags()
+        other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        Account.objects.create(user=other_user, name='Other', balance=Decimal('1.00'))
+        self.assertNotModified(etags)
+
+    def test_filters_and_pages_have_their_own_etag(self):
+        url = reverse('transaction_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'accounts': self.account.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_login_changes_the_etag(self):
+        etags = self.get_etags()
+        self.client.logout()
+        self.client.login(username='testuser', password='testpassword')
+        self.assertNotModified(etags, expected=False)
+
+    def test_pending_messages_are_never_hidden(self):
+        etags = self.get_etags()
+        # an empty import changes nothing but queues a message
+        self.client.post(reverse('transaction_import'), {
+            'file': SimpleUploadedFile('empty.csv', b'date,amount,description\n'),
+            'account': self.account.pk,
+        })
+        url = reverse('transaction_list')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Imported 0 transactions')
+
+        self.assertFalse(response.has_header('ETag'))
+
+        # once shown, the page is cacheable again
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+    
+    def test_dashboard_view_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(reverse('account_login') in response.url)
+
+    def test_dashboard_view_loads_for_logged_in_user(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'budget/dashboard.html')
+    
+    def test_dashboard_totals_and_query_count(self):
+        income_category = Category.objects.create(name='Salary', type='I')
+        expense_category = Category.objects.create(name='Groceries', type='E')
+        rent_category = Category.objects.create(name='Rent', type='E')
+        account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        for category, amount, day in [
+            (income_category, '500.00', '2025-03-01'),
+            (expense_category, '20.00', '2025-03-05'),
+            (expense_category, '30.00', '2025-03-06'),
+            (rent_category, '400.00', '2025-03-10'),
+            (expense_category, '10.00', '2025-04-02'),
+        ]:
+            Transaction.objects.create(
+                user=self.user, account=account, category=category,
+                amount=Decimal(amount), date=day, description='Entry'
+            )
+
+        with self.assertNumQueries(DASHBOARD_MAX_QUERIES):
+            response = self.client.get(reverse('dashboard'), {'month': 3, 'year': 2025})
+
+        context = response.context
+        self.assertEqual(context['total_income'], Decimal('500.00'))
+        self.assertEqual(context['total_expenses'], Decimal('450.00'))
+        self.assertEqual(context['net_cash_flow'], Decimal('50.00'))
+        self.assertEqual(context['spending_by_category'], [
+            {'category__name': 'Groceries', 'total_spent': Decimal('50.00')},
+            {'category__name': 'Rent', 'total_spent': Decimal('400.00')},
+        ])
+        self.assertEqual(context['balance_trend_chart_url'], reverse('dashboard_balance_trend') + '?month=3&year=2025')
+
+        # 1000 initial + 500 - 450 - 10 = 1040 now, so the month started at 1000
+        chart = self.client.get(context['balance_trend_chart_url']).json()
+        self.assertEqual(chart['data'][0], 1000.0)
+        self.assertEqual(chart['data'][-1], 1050.0)
+
     def test_transaction_create_view_loads(self):
         response = self.client.get(reverse('transaction_create'))
         self.assertEqual(response.status_code, 200)
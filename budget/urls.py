@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     # -- Dashboard URL -- #
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('dashboard/async/', views.AsyncDashboardView.as_view(), name='dashboard_async'),
+    path('dashboard/spending/', views.DashboardSpendingView.as_view(), name='dashboard_spending'),
+    path('dashboard/balance-trend/', views.DashboardBalanceTrendView.as_view(), name='dashboard_balance_trend'),
 
     # -- Account URLs -- #
     path('accounts/', views.AccountListView.as_view(), name='account_list'),
@@ -16,10 +19,14 @@ urlpatterns = [
     path('transactions/add/', views.TransactionCreateView.as_view(), name='transaction_create'),
     path('transactions/edit/<int:pk>/', views.TransactionUpdateView.as_view(), name='transaction_update'),
     path('transactions/delete/<int:pk>/', views.TransactionDeleteView.as_view(), name='transaction_delete'),
+    path('transactions/bulk/', views.TransactionBulkView.as_view(), name='transaction_bulk'),
+    path('transactions/import/', views.TransactionImportView.as_view(), name='transaction_import'),
+    path('transactions/export/', views.TransactionExportView.as_view(), name='transaction_export'),
 
     # -- Budget URLs -- #
     path('budgets/', views.BudgetListView.as_view(), name='budget_list'),
     path('budgets/add/', views.BudgetCreateView.as_view(), name='budget_create'),
+    path('budgets/report/', views.BudgetReportView.as_view(), name='budget_report'),
     path('budgets/edit/<int:pk>/', views.BudgetUpdateView.as_view(), name='budget_update'),
     path('budgets/delete/<int:pk>/', views.BudgetDeleteView.as_view(), name='budget_delete'),
 
@@ -1,16 +1,46 @@
+import asyncio
+import io
 from decimal import Decimal
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.contrib import messages
+from django.contrib.messages import get_messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ListView, CreateView, DeleteView, UpdateView, TemplateView
-from django.urls import reverse_lazy
-from django.db.models import Sum
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag, urlencode
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views import View
+from django.views.generic import ListView, CreateView, DeleteView, UpdateView, TemplateView, FormView
+from django.urls import reverse, reverse_lazy
+from django.db.models import Q, Sum
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
 from calendar import month_name
 
-from .models import Account, Transaction, Budget
-from .forms import AccountForm, TransactionFilterForm, TransactionForm, BudgetForm
+from .models import Account, Transaction, Budget, DailyBalance, MonthlyCategoryTotal
+from .forms import (
+    AccountForm, TransactionBulkForm, TransactionFilterForm, TransactionForm, TransactionImportForm, BudgetForm,
+    BudgetReportForm
+)
+from .bulk import bulk_edit_transactions
+from .cache import (
+    aget_cached_dashboard, get_cached_dashboard, get_cached_fragment, get_category_version, get_user_etag
+)
+from .exporters import EXPORT_FORMATS, export_rows
+from .forecast import forecast_spending
+from .importers import TransactionImportError, get_parser, import_transactions
+from .ledger_stats import get_ledger_stats
+from .pagination import KeysetPaginator
+from .query_pool import run_concurrently
+from .reports import budget_vs_actual, build_budget_report, default_report_range
+from .search import search_transactions
 
 # Create your views here.
 
@@ -19,23 +49,82 @@ def profile_view(request):
     return render(request, 'account/profile.html')
 
 
+# -- Conditional GET -- #
+def user_data_etag(request, *args, **kwargs):
+    """
+    ETag of a page or JSON response built from the user's data. It changes
+    whenever the user's data or the categories change, the day rolls over,
+    the query string differs or the user logs in again (which also rotates
+    the CSRF token embedded in pages). Pending flash messages disable it, so
+    they are never hidden behind a 304.
+    """
+    if len(get_messages(request)):
+        return None
+
+    return get_user_etag(
+        request.user.pk,
+        request.get_full_path(),
+        getattr(request, 'session', None) and request.session.session_key,
+        date.today().isoformat(),
+        get_category_version(),
+    )
+
+
+class ConditionalGetMixin:
+    """
+    Answer a GET with 304 Not Modified, before any query or aggregation is
+    run, when the user's data has not changed since the response was sent.
+    """
+
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=user_data_etag))
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+
+# -- Cached Sidebar -- #
+class CachedSidebarMixin:
+    """
+    Render the sidebar of a two-column page into the 'sidebar' context
+    variable as a fragment cached per user. It is rendered again, and its
+    data queried, only when the user's data of the sidebar_scopes changes or
+    the page or get_sidebar_vary_on() differs.
+    """
+    sidebar_name = None
+    sidebar_scopes = ()
+
+    def get_sidebar_context(self, context):
+        return context
+
+    def get_sidebar_vary_on(self, context):
+        return []
+
+    def render_to_response(self, context, **response_kwargs):
+        context['sidebar'] = mark_safe(get_cached_fragment(
+            self.sidebar_name,
+            self.request.user.pk,
+            self.sidebar_scopes,
+            [self.request.path, *self.get_sidebar_vary_on(context)],
+            lambda: render_to_string(f'budget/{self.sidebar_name}.html', self.get_sidebar_context(context)),
+        ))
+        return super().render_to_response(context, **response_kwargs)
+
+
 # -- (Account Views Start) -- #
 # -- Account List View -- #
-class AccountListView(LoginRequiredMixin, ListView):
+class AccountListView(LoginRequiredMixin, ConditionalGetMixin, CachedSidebarMixin, ListView):
     model = Account
     template_name = 'budget/account_list.html'
     context_object_name = 'accounts'
+    # The total balance moves with every transaction
+    sidebar_name = 'account_sidebar'
+    sidebar_scopes = ('accounts', 'transactions')
 
     def get_queryset(self):
         return Account.objects.filter(user=self.request.user).order_by('name')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
 
-        balance_summary = Account.objects.filter(user=user).aggregate(total_balance=Sum('balance'))
-        context['total_balance'] = balance_summary['total_balance'] or Decimal('0.00')
-        return context
+    def get_sidebar_context(self, context):
+        return {'total_balance': get_ledger_stats(self.request.user.pk).total_balance}
 
 
 # -- Account Create View -- #
@@ -78,36 +167,31 @@ class AccountUpdateView(LoginRequiredMixin, UpdateView):
 
 
 # -- (Transaction Views Start) -- #
-# -- Transaction List View -- #
-class TransactionListView(LoginRequiredMixin, ListView):
-    model = Transaction
-    template_name = 'budget/transaction_list.html'
-    context_object_name = 'transactions'
-    paginate_by = 25
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['filter_form'] = self.filter_form
-        return context
-
-    def get_queryset(self):
-        user = self.request.user
+# -- Transaction Filter Mixin -- #
+class TransactionFilterMixin:
+    """
+    Filter the current user's transactions with the TransactionFilterForm
+    built from the query string.
+    """
 
-        self.filter_form = TransactionFilterForm(self.request.GET, user=user)
+    def filter_transactions(self, queryset):
+        self.filter_form = TransactionFilterForm(self.request.GET, user=self.request.user)
         form = self.filter_form
 
-        queryset = Transaction.objects.filter(user=user).select_related('account', 'category').order_by('-date')
-
         if form.is_valid():
             cleaned_data = form.cleaned_data
+            search = cleaned_data.get('search')
             account = cleaned_data.get('accounts')
             category = cleaned_data.get('categories')
             start_date = cleaned_data.get('start_date')
             end_date = cleaned_data.get('end_date')
 
+            if search:
+                queryset = search_transactions(queryset, search)
+
             if account:
                 queryset = queryset.filter(account=account)
-            
+
             if category:
                 queryset = queryset.filter(category=category)
 
@@ -121,6 +205,78 @@ class TransactionListView(LoginRequiredMixin, ListView):
         return queryset
 
 
+# -- Transaction List View -- #
+class TransactionListView(LoginRequiredMixin, ConditionalGetMixin, CachedSidebarMixin, TransactionFilterMixin, ListView):
+    model = Transaction
+    template_name = 'budget/transaction_list.html'
+    context_object_name = 'transactions'
+    paginate_by = 25
+    # The filter form lists the user's accounts and the categories
+    sidebar_name = 'transaction_sidebar'
+    sidebar_scopes = ('accounts',)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filter_form'] = self.filter_form
+
+        # Export the same filtered transactions, without the pagination parameters
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        params.pop('count', None)
+        context['export_query'] = params.urlencode()
+
+        page = context['page_obj']
+        if page.next_cursor:
+            context['next_page_url'] = self._get_page_url(page.next_cursor)
+        if page.previous_cursor:
+            context['previous_page_url'] = self._get_page_url(page.previous_cursor)
+        return context
+
+    def get_sidebar_vary_on(self, context):
+        return [context['export_query'], get_category_version()]
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.get_page(
+            self.request.GET.get('cursor'),
+            with_count=self.request.GET.get('count') == 'exact'
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def _get_page_url(self, cursor):
+        # Keep the current filters when moving between pages
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f"?{params.urlencode()}"
+
+    def get_queryset(self):
+        queryset = Transaction.objects.filter(user=self.request.user).select_related('account', 'category').order_by('-date', '-pk')
+        return self.filter_transactions(queryset)
+
+
+# -- Transaction Export View -- #
+class TransactionExportView(LoginRequiredMixin, TransactionFilterMixin, View):
+    """
+    Stream the filtered transactions as CSV (default) or JSON, one chunk of
+    rows at a time, so exports of any size use the same memory.
+    """
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown export format '{export_format}'.")
+
+        content_type, stream = EXPORT_FORMATS[export_format]
+        queryset = self.filter_transactions(
+            Transaction.objects.filter(user=request.user).order_by('-date', '-pk')
+        )
+
+        response = StreamingHttpResponse(stream(export_rows(queryset)), content_type=content_type)
+        filename = f"transactions-{date.today().isoformat()}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 # -- Transaction Create View -- #
 class TransactionCreateView(LoginRequiredMixin, CreateView):
     model = Transaction
@@ -163,20 +319,159 @@ class TransactionDeleteView(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
 
+
+# -- Transaction Bulk Edit View -- #
+class TransactionBulkView(LoginRequiredMixin, TransactionFilterMixin, FormView):
+    """
+    Delete, recategorise or move the records ticked on the list, or all of
+    those matching the filters in the query string, with set-based writes
+    instead of one round trip per record.
+    """
+    form_class = TransactionBulkForm
+    template_name = 'budget/transaction_bulk.html'
+    success_verbs = {'delete': 'Deleted', 'category': 'Recategorised', 'account': 'Moved'}
+
+    def get_initial(self):
+        return {
+            'transactions': self.request.GET.getlist('transactions'),
+            'select_all': self.request.GET.get('select_all') == 'on',
+        }
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def get_selected(self, transactions, select_all):
+        queryset = self.filter_transactions(Transaction.objects.filter(user=self.request.user))
+        if not select_all:
+            queryset = queryset.filter(pk__in=transactions)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = context['form']
+        try:
+            transactions = form.fields['transactions'].clean(form['transactions'].value())
+        except ValidationError:
+            transactions = []
+        select_all = form.fields['select_all'].clean(form['select_all'].value())
+
+        if transactions or select_all:
+            context['selected_count'] = self.get_selected(transactions, select_all).count()
+        context['select_all'] = select_all
+        context['filter_query'] = self._get_filter_query()
+        return context
+
+    def form_valid(self, form):
+        cleaned_data = form.cleaned_data
+        queryset = self.get_selected(cleaned_data['transactions'], cleaned_data['select_all'])
+        if cleaned_data['select_all'] and not self.filter_form.is_valid():
+            # never widen an edit of all matching records to all records
+            form.add_error(None, "The filters of the records are not valid.")
+            return self.form_invalid(form)
+
+        count = bulk_edit_transactions(
+            queryset, cleaned_data['action'], category=cleaned_data['category'], account=cleaned_data['account']
+        )
+        messages.success(self.request, f"{self.success_verbs[cleaned_data['action']]} {count} records.")
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        # Back to the list with the same filters
+        query = self._get_filter_query()
+        return f"{reverse('transaction_list')}?{query}" if query else reverse('transaction_list')
+
+    def _get_filter_query(self):
+        params = self.request.GET.copy()
+        for name in ('transactions', 'select_all', 'cursor', 'count'):
+            params.pop(name, None)
+        return params.urlencode()
+
+
+# -- Transaction Import View -- #
+class TransactionImportView(LoginRequiredMixin, FormView):
+    form_class = TransactionImportForm
+    template_name = 'budget/transaction_import.html'
+    success_url = reverse_lazy('transaction_list')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        uploaded_file = form.cleaned_data['file']
+        parser = get_parser(uploaded_file.name)
+
+        # Wrap the upload so it is decoded and parsed as a stream
+        fileobj = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', errors='replace', newline='')
+
+        try:
+            result = import_transactions(
+                self.request.user,
+                form.cleaned_data['account'],
+                parser(fileobj),
+                income_category=form.cleaned_data['income_category'],
+                expense_category=form.cleaned_data['expense_category'],
+            )
+        except TransactionImportError as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+        finally:
+            fileobj.detach()
+
+        messages.success(
+            self.request,
+            f"Imported {result['rows']} transactions ({result['rows_per_second']:.0f} rows/s)."
+        )
+        return super().form_valid(form)
+
 # -- (Transaction Views End) -- #
 
 
 # -- (Budget Views Start) -- #
 # -- Budget List View -- #
-class BudgetListView(LoginRequiredMixin, ListView):
+class BudgetListView(LoginRequiredMixin, ConditionalGetMixin, CachedSidebarMixin, ListView):
     model = Budget
     template_name = 'budget/budget_list.html'
     context_object_name = 'budgets'
+    sidebar_name = 'budget_sidebar'
+    sidebar_scopes = ('budgets',)
 
     def get_queryset(self):
         return Budget.objects.filter(user=self.request.user).order_by('-year', '-month', 'category__name')
 
 
+# -- Budget Report View -- #
+class BudgetReportView(LoginRequiredMixin, ConditionalGetMixin, CachedSidebarMixin, TemplateView):
+    """
+    Budget against actual spending for every budgeted category over a range
+    of months, a calendar year by default.
+    """
+    template_name = 'budget/budget_report.html'
+    sidebar_name = 'budget_sidebar'
+    sidebar_scopes = ('budgets',)
+
+    def get_sidebar_vary_on(self, context):
+        # the sidebar holds the report form, with the values and errors of the query
+        return [self.request.GET.urlencode()]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        first_month, last_month = default_report_range(date.today())
+
+        form = BudgetReportForm(self.request.GET or None, initial={'start': first_month, 'end': last_month})
+        if form.is_valid():
+            first_month, last_month = form.cleaned_data['start'], form.cleaned_data['end']
+
+        context['report_form'] = form
+        context['first_month'] = first_month
+        context['last_month'] = last_month
+        context['report'] = build_budget_report(self.request.user, first_month, last_month)
+        return context
+
+
 # -- Budget Create View -- #
 class BudgetCreateView(LoginRequiredMixin, CreateView):
     model = Budget
@@ -222,99 +517,196 @@ class BudgetDeleteView(LoginRequiredMixin, DeleteView):
 # -- (Budget Views End) -- #
 
 
+# -- Dashboard Mixin -- #
+class DashboardMixin(LoginRequiredMixin):
+    """
+    Period selection, caching and aggregates shared by the dashboard page
+    and its chart endpoints.
+    """
+
+    def get_cached(self, name, compute):
+        # The computed data is cached per user until their data or the categories change
+        return get_cached_dashboard(self.request.user.pk, self._get_cache_key(name, date.today()), compute)
+
+    def _get_cache_key(self, name, today):
+        selected_month, selected_year = self._get_selected_month_and_year(today)
+        return [name, today.isoformat(), selected_year, selected_month]
+
+    def _get_selected_month_and_year(self, today):
+        try:
+            selected_month = int(self.request.GET.get('month'))
+            selected_year = int(self.request.GET.get('year'))
+        except (TypeError, ValueError):
+            selected_month = today.month
+            selected_year = today.year
+
+        return selected_month, selected_year
+
+    def _get_period_dates(self, today):
+        selected_month, selected_year = self._get_selected_month_and_year(today)
+
+        try:
+            filter_start_date = date(selected_year, selected_month, 1)
+            filter_end_date = filter_start_date + relativedelta(months=1) - timedelta(days=1)
+        except ValueError:
+            filter_start_date = today.replace(day=1)
+            filter_end_date = today
+
+        return filter_start_date, filter_end_date
+
+    def _get_total_balance(self, user):
+        return get_ledger_stats(user.pk).total_balance
+
+    def get_cached_period_totals(self, user, filter_start_date):
+        # One cached entry for the page and both chart endpoints, which all
+        # need the same totals of the selected period
+        key = ['period-totals', filter_start_date.isoformat()]
+        return get_cached_dashboard(user.pk, key, lambda: self._get_period_totals(user, filter_start_date))
+
+    def _get_period_totals(self, user, filter_start_date):
+        """
+        Compute the period's income, expenses and per-category spending, plus
+        the net change since the start of the period, with one grouped query
+        over the monthly category totals.
+        """
+        year, month = filter_start_date.year, filter_start_date.month
+        in_period = Q(year=year, month=month)
+
+        category_totals = list(MonthlyCategoryTotal.objects.filter(
+            Q(year__gt=year) | Q(year=year, month__gte=month),
+            user=user,
+            count__gt=0,
+        ).values(
+            'category__name', 'category__type'
+        ).annotate(
+            period_total=Sum('total', filter=in_period),
+            total_since_start=Sum('total'),
+        ).order_by('category__name'))
+
+        total_income = Decimal('0.00')
+        total_expenses = Decimal('0.00')
+        net_change_since_start = Decimal('0.00')
+        spending_by_category = []
+
+        for item in category_totals:
+            period_total = item['period_total'] or Decimal('0.00')
+
+            if item['category__type'] == 'I':
+                total_income += period_total
+                net_change_since_start += item['total_since_start']
+            else:
+                net_change_since_start -= item['total_since_start']
+
+            if item['category__type'] == 'E':
+                total_expenses += period_total
+                if item['period_total'] is not None:
+                    spending_by_category.append({
+                        'category__name': item['category__name'],
+                        'total_spent': item['period_total'],
+                    })
+
+        return {
+            'total_income': total_income,
+            'total_expenses': total_expenses,
+            'spending_by_category': spending_by_category,
+            'net_change_since_start': net_change_since_start,
+        }
+
+
 # -- Dashboard View -- #
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(DashboardMixin, ConditionalGetMixin, TemplateView):
     """
-    Template view for the user dashboard.
+    Template view for the user dashboard. The charts are loaded separately
+    by dashboard.js from the chart endpoints below.
     """
     template_name = 'budget/dashboard.html'
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
         user = self.request.user
         today = date.today()
 
+        page = self.get_cached('page', lambda: self._get_dashboard_data(user, today))
+        forecast = get_cached_dashboard(
+            user.pk, self._get_forecast_cache_key(today), lambda: forecast_spending(user, today)
+        )
+
+        return self._build_context(today, page, forecast, **kwargs)
+
+    def _build_context(self, today, page, forecast, **kwargs):
+        context = super().get_context_data(**kwargs)
         context['today'] = today
+        context.update(page)
+        context['forecast'] = forecast
 
-        # Helper method for date filtering
-        self._get_selected_dates_and_years(user, today, context)
+        # Chart data URLs for the selected period
+        period = urlencode({'month': context['selected_month'], 'year': context['selected_year']})
+        context['spending_chart_url'] = f"{reverse('dashboard_spending')}?{period}"
+        context['balance_trend_chart_url'] = f"{reverse('dashboard_balance_trend')}?{period}"
 
-        # Helper method for user accounts and total balance
-        self._get_user_accounts_and_total_balance(user, context)
+        return context
 
-        # Helper method for monthly transactions
-        monthly_transactions = self._get_monthly_transactions(user, context['filter_start_date'], context['filter_end_date'])
+    def _get_forecast_cache_key(self, today):
+        # The forecast is always for the coming months, whichever period is selected
+        return ['forecast', today.isoformat()]
 
-        # Helper method to get spending by category
-        spending_by_category_data = self._get_spending_by_category(monthly_transactions)
+    def _get_dashboard_data(self, user, today):
+        context = {}
+        for part in self._get_dashboard_parts(user, today):
+            context.update(part())
+        return context
+
+    def _get_dashboard_parts(self, user, today):
+        """
+        Split the page data into callables that query independently of each
+        other, each returning its share of the context, so the async view can
+        run them at the same time.
+        """
+        filter_start_date, filter_end_date = self._get_period_dates(today)
+
+        def part(helper, *args):
+            def run():
+                context = {}
+                helper(*args, context)
+                return context
+            return run
+
+        return [
+            # Helper method for date filtering and total balance, from the ledger stats row
+            part(self._get_ledger_summary, user, today),
+            # Helper method for user accounts
+            part(self._get_user_accounts, user),
+            # Helper method for the month's totals, spending by category and cash flow
+            part(self._get_period_summary, user, filter_start_date),
+            # Helper method for budget summary
+            part(self._get_budget_summary, user, filter_start_date),
+        ]
+
+    # -- Helper Methods -- #
+    def _get_period_summary(self, user, filter_start_date, context):
+        # The month's totals, in a single grouped query
+        period_totals = self.get_cached_period_totals(user, filter_start_date)
+
+        spending_by_category_data = self._get_spending_by_category(period_totals)
         context['spending_by_category'] = spending_by_category_data['spending_by_category']
         context['spending_by_category_total'] = spending_by_category_data['total_monthly_expenses']
 
-        # Helper method for budget summary
-        self._get_budget_summary(user, context['selected_month'], context['selected_year'], spending_by_category_data['spending_by_category'], context)
-
-        # Helper method for cash flow summary
-        self._get_cash_flow_summary(monthly_transactions, context)
+        self._get_cash_flow_summary(period_totals, context)
 
-        # Helper method for balance trend chart data
-        self._get_balance_trend_chart_data(
-            user,
-            context['filter_start_date'],
-            context['filter_end_date'],
-            context['total_balance'],
-            context
-        )
+    def _get_budget_summary(self, user, filter_start_date, context):
+        context['budget_summary_list'] = list(budget_vs_actual(user, filter_start_date, filter_start_date))
 
-        return context
+    def _get_ledger_summary(self, user, today, context):
+        stats = get_ledger_stats(user.pk)
+        self._get_selected_dates_and_years(stats, today, context)
+        context['total_balance'] = stats.total_balance
 
-    # -- Helper Methods -- #
-    def _get_budget_summary(self, user, selected_month, selected_year, spending_by_category, context):
-        budgets = Budget.objects.filter(
-            user=user,
-            month=selected_month,
-            year=selected_year
-        ).select_related('category')
-
-        budget_summary_list = []
-        spent_map = {item['category__name']: item['total_spent'] for item in spending_by_category}
-
-        for budget in budgets:
-            category_name = budget.category.name
-            limit = budget.limit_amount
-            spent = spent_map.get(category_name, Decimal('0.00'))
-            remaining = limit - spent
-
-            percent_used = (spent / limit * 100) if limit > 0 else 0
-
-            budget_summary_list.append({
-                'category_name': category_name,
-                'limit': limit,
-                'spent': spent,
-                'remaining': remaining,
-                'percent_used': percent_used,
-                'status': 'danger' if percent_used > 100 else 'warning' if percent_used > 75 else 'success'
-            })
-        context['budget_summary_list'] = budget_summary_list
-
-    def _get_selected_dates_and_years(self, user, today, context):
-        try:
-            selected_month = int(self.request.GET.get('month'))
-            selected_year = int(self.request.GET.get('year'))
-        except (TypeError, ValueError):
-            selected_month = today.month
-            selected_year = today.year
+    def _get_selected_dates_and_years(self, stats, today, context):
+        selected_month, selected_year = self._get_selected_month_and_year(today)
+        filter_start_date, filter_end_date = self._get_period_dates(today)
 
         context['selected_month_name'] = month_name[selected_month]
 
-        try:
-            filter_start_date = date(selected_year, selected_month, 1)
-            filter_end_date = filter_start_date + relativedelta(months=1) - timedelta(days=1)
-        except ValueError:
-            filter_start_date = today.replace(day=1)
-            filter_end_date = today
-
-        earliest_transaction = Transaction.objects.filter(user=user).order_by('date').first()
-        earliest_year = earliest_transaction.date.year if earliest_transaction else today.year
+        earliest_year = stats.first_date.year if stats.first_date else today.year
         available_years = range(earliest_year, today.year + 1)
 
         context['months'] = [(i, month_name[i]) for i in range(1, 13)]
@@ -324,47 +716,19 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context['filter_start_date'] = filter_start_date
         context['filter_end_date'] = filter_end_date
 
-    def _get_user_accounts_and_total_balance(self, user, context):
+    def _get_user_accounts(self, user, context):
         user_accounts = Account.objects.filter(user=user).order_by('name')
-        context['accounts'] = user_accounts
-
-        balance_summary = Account.objects.filter(user=user).aggregate(total_balance=Sum('balance'))
-        context['total_balance'] = balance_summary['total_balance'] or Decimal('0.00')
-
-    def _get_monthly_transactions(self, user, filter_start_date, filter_end_date):
-        return Transaction.objects.filter(
-            user=user,
-            date__range=(filter_start_date, filter_end_date)
-        )
-
-    def _get_spending_by_category(self, monthly_transactions):
-        spending_by_cateogry = monthly_transactions.filter(
-            category__type='E'
-        ).values(
-            'category__name'
-        ).annotate(
-            total_spent=Sum('amount')
-        ).order_by('category__name')
-
-        total_monthly_expenses = sum(
-            item['total_spent']
-            for item in spending_by_cateogry
-            if item['total_spent'] is not None
-        ) or Decimal('0.00')
+        context['accounts'] = list(user_accounts)
 
+    def _get_spending_by_category(self, period_totals):
         return {
-            'spending_by_category': list(spending_by_cateogry),
-            'total_monthly_expenses': total_monthly_expenses
+            'spending_by_category': period_totals['spending_by_category'],
+            'total_monthly_expenses': period_totals['total_expenses']
         }
 
-    def _get_cash_flow_summary(self, monthly_transactions, context):
-        total_income_agg = monthly_transactions.filter(
-            category__type='I'
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
-
-        total_expenses_agg = monthly_transactions.filter(
-            category__type='E'
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
+    def _get_cash_flow_summary(self, period_totals, context):
+        total_income_agg = period_totals['total_income']
+        total_expenses_agg = period_totals['total_expenses']
 
         total_expenses_abs = abs(total_expenses_agg)
 
@@ -386,40 +750,115 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context['expenses_percent'] = expenses_percent
         context['gross_flow'] = gross_flow
 
-    def _get_balance_trend_chart_data(self, user, start_date, end_date, current_total_balance, context):
-        net_change_since_start = Transaction.objects.filter(
-            user=user,
-            date__gte=start_date,
-        ).values('category__type').annotate(
-            total_amount=Sum('amount')
+
+# -- Async Dashboard View -- #
+class AsyncDashboardView(DashboardView):
+    """
+    The dashboard as an async view, for ASGI servers. On a cache miss the
+    independent queries of the page and the forecast run at the same time
+    on the query pool, so the page takes about as long as its slowest query
+    rather than all of them in turn.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # The login check and the ETag read the user, the session and the
+        # cache, which async code has to leave to a thread
+        authenticated, etag = await sync_to_async(self._check_request)(request)
+        if not authenticated:
+            return self.handle_no_permission()
+
+        # Same as the sync login and conditional GET mixins, which wrap
+        # View.dispatch in sync code
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await View.dispatch(self, request, *args, **kwargs)
+            if etag and request.method in ('GET', 'HEAD') and not response.has_header('ETag'):
+                response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _check_request(self, request):
+        if not request.user.is_authenticated:
+            return False, None
+        etag = user_data_etag(request)
+        return True, etag and quote_etag(etag)
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        today = date.today()
+        page_key, forecast_key = self._get_cache_key('page', today), self._get_forecast_cache_key(today)
+
+        async def compute_page():
+            context = {}
+            for part in await run_concurrently(*self._get_dashboard_parts(user, today)):
+                context.update(part)
+            return context
+
+        async def compute_forecast():
+            forecast, = await run_concurrently(lambda: forecast_spending(user, today))
+            return forecast
+
+        page, forecast = await asyncio.gather(
+            aget_cached_dashboard(user.pk, page_key, compute_page),
+            aget_cached_dashboard(user.pk, forecast_key, compute_forecast),
         )
+        # The response is rendered by the handler, on a thread
+        return self.render_to_response(self._build_context(today, page, forecast, **kwargs))
 
-        income_since_start = sum(t['total_amount'] for t in net_change_since_start if t['category__type'] == 'I')
-        expenses_since_start = sum(t['total_amount'] for t in net_change_since_start if t['category__type'] == 'E')
 
-        start_of_period_balance = current_total_balance - (income_since_start - expenses_since_start)
+# -- Dashboard Chart Endpoints -- #
+class DashboardSpendingView(DashboardMixin, ConditionalGetMixin, View):
+    """
+    JSON spending by expense category for the dashboard doughnut chart.
+    """
 
-        transactions_in_period = Transaction.objects.filter(
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self._get_spending_data())
+
+    def _get_spending_data(self):
+        start_date, end_date = self._get_period_dates(date.today())
+        period_totals = self.get_cached_period_totals(self.request.user, start_date)
+
+        return {
+            'labels': [item['category__name'] for item in period_totals['spending_by_category']],
+            'data': [float(item['total_spent']) for item in period_totals['spending_by_category']],
+            'total': float(period_totals['total_expenses']),
+        }
+
+
+class DashboardBalanceTrendView(DashboardMixin, ConditionalGetMixin, View):
+    """
+    JSON daily total balance over the selected month for the dashboard line chart.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.get_cached('balance-trend', self._get_balance_trend_data))
+
+    def _get_balance_trend_data(self):
+        user = self.request.user
+        start_date, end_date = self._get_period_dates(date.today())
+        period_totals = self.get_cached_period_totals(user, start_date)
+        start_of_period_balance = self._get_total_balance(user) - period_totals['net_change_since_start']
+
+        daily_balances = DailyBalance.objects.filter(
             user=user,
             date__range=(start_date, end_date)
-        ).order_by('date', 'pk').select_related('category')
+        ).values_list('date', 'balance')
 
         chart_labels = [start_date.strftime('%d/%m')]
         chart_data = [start_of_period_balance]
-        cumulative_balance = start_of_period_balance
-
-        for t in transactions_in_period:
-            if t.category.type == 'I':
-                cumulative_balance += t.amount
-            else:
-                cumulative_balance -= t.amount
+        last_date = None
 
-            chart_labels.append(t.date.strftime('%d/%m'))
-            chart_data.append(cumulative_balance)
+        for day, balance in daily_balances:
+            chart_labels.append(day.strftime('%d/%m'))
+            chart_data.append(balance)
+            last_date = day
 
-        if not transactions_in_period or transactions_in_period.last().date < end_date:
+        if last_date is None or last_date < end_date:
             chart_labels.append(end_date.strftime('%d/%m'))
-            chart_data.append(cumulative_balance)
+            chart_data.append(chart_data[-1])
 
-        context['chart_labels'] = chart_labels
-        context['chart_data'] = chart_data
\ No newline at end of file
+        return {
+            'labels': chart_labels,
+            'data': [float(balance) for balance in chart_data],
+        }
@@ -0,0 +1,28 @@
+# Entry points of the worker processes started by management commands. A
+# worker started with "spawn" (or "forkserver") imports nothing from the
+# parent: it unpickles these functions by importing this module before Django
+# is set up, so nothing here imports models until init_worker() has run.
+
+
+def init_worker(database_names):
+    """
+    Set Django up in a worker process and point it at the parent's databases
+    (the test databases during tests), given as a dict of alias -> name.
+    """
+    import django
+    from django.apps import apps
+    from django.db import connections
+
+    if not apps.ready:
+        django.setup()
+
+    # forked workers must open their own database connections
+    for alias, name in database_names.items():
+        connections[alias].settings_dict['NAME'] = name
+    connections.close_all()
+
+
+def reconcile_chunk(user_ids, fix):
+    from budget.management.commands.reconcile_balances import reconcile_chunk
+
+    return reconcile_chunk(user_ids, fix)
@@ -2,6 +2,8 @@
 ASGI config for financial_map project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn financial_map.asgi:application``;
+the async dashboard is at /dashboard/async/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
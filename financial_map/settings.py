@@ -64,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'budget.middleware.QueryCountMiddleware',
 ]
 
 ROOT_URLCONF = 'financial_map.urls'
@@ -97,8 +98,65 @@ WSGI_APPLICATION = 'financial_map.wsgi.application'
 #     }
 # }
 
+# CONN_MAX_AGE keeps connections open between requests for that many
+# seconds, which also spares the query pool of the async dashboard from
+# connecting on every call.
+
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
+    'default': dj_database_url.parse(
+        os.environ.get('DATABASE_URL'), conn_max_age=int(os.environ.get('CONN_MAX_AGE', 0))
+    )
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The per-user data versions, the category version and the cached pages are
+# shared by every gunicorn worker and management command, so the cache must
+# be shared too: the database cache by default (run `python manage.py
+# createcachetable`, done by the release phase), or e.g. Redis. A local
+# memory cache only works with a single process, such as runserver.
+# The tests, including their query budgets, run on the same database cache
+# (the test runner creates its table), so each cache read counts as a query.
+# Setting CACHE_BACKEND / CACHE_LOCATION to Redis takes those reads off the
+# database.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'budget_cache'),
+    }
+}
+
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# Async views
+# Under an ASGI server (e.g. `uvicorn financial_map.asgi:application`) the
+# async dashboard runs its independent queries on a pool of this many
+# threads, each with its own database connection.
+
+QUERY_POOL_WORKERS = int(os.environ.get('QUERY_POOL_WORKERS', 4))
+
+# Query instrumentation
+# Every request logs its query count and SQL time to the 'budget.queries'
+# logger (INFO), followed by its slowest statements (DEBUG). The queries the
+# async dashboard runs on the query pool threads are counted too. The totals are
+# also sent as X-Query-Count / X-Query-Time headers when enabled.
+
+QUERY_COUNT_HEADERS = os.environ.get('QUERY_COUNT_HEADERS', 'False') == 'True'
+QUERY_COUNT_SLOWEST = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'budget.queries': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_LOG_LEVEL', 'WARNING'),
+        },
+    },
 }
 
 CSRF_TRUSTED_ORIGINS = [
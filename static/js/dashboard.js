@@ -46,28 +46,40 @@ document.addEventListener('DOMContentLoaded', function() {
 
 
     // =========================================================
-    // START: EXPENSE STRUCTURE DOUGHNUT CHART
+    // START: CHART DATA LOADING
     // =========================================================
-    const dataElement = document.getElementById('spending-data');
-    if (!dataElement) {
-            
-        console.error("Error: Spending data element (#spending-data) not found in the template.");
-
-    } else {
-        let spendingData = [];
-        try {
-            spendingData = JSON.parse(dataElement.textContent);
-        } catch (e) {
-            console.error("Failed to parse spending data JSON:", e);
-        }
+    // The page is rendered without the chart data; both charts fetch theirs
+    // at the same time and draw as soon as it arrives.
+    function loadChartData(canvas) {
+        return fetch(canvas.dataset.url, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        }).then(response => {
+            if (!response.ok) {
+                throw new Error(`Chart data request failed with status ${response.status}`);
+            }
+            return response.json();
+        });
+    }
 
-        const ctx = document.getElementById('spendingChart');
+    function showChartMessage(canvas, message) {
+        canvas.parentElement.innerHTML = `<div class="text-center p-5 text-muted">${message}</div>`;
+    }
+    // =========================================================
+    // END: CHART DATA LOADING
+    // =========================================================
 
-        if (ctx && spendingData.length > 0) {
-            
-            const labels = spendingData.map(item => item.category__name);
-            const amounts = spendingData.map(item => item.total_spent);
+
+    // =========================================================
+    // START: EXPENSE STRUCTURE DOUGHNUT CHART
+    // =========================================================
+    const ctx = document.getElementById('spendingChart');
+
+    function drawSpendingChart(spendingData) {
+        if (spendingData.data.length > 0) {
             
+            const labels = spendingData.labels;
+            const amounts = spendingData.data;
             const backgroundColors = [
                 '#eb9c64', '#ff8789', '#554e4f', '#8fbf9f', '#346145', 
                 '#353535', '#000000', '#f5ecd7', '#ebe2cd', '#c2baa6'
@@ -101,11 +113,18 @@ document.addEventListener('DOMContentLoaded', function() {
                     }
                 }
             });
-        } else if (ctx) {
+        } else {
             
-            ctx.parentElement.innerHTML = '<div class="text-center p-5 text-muted">No expense transactions recorded this month to display a chart.</div>';
+            showChartMessage(ctx, 'No expense transactions recorded this month to display a chart.');
         }
     }
+
+    if (ctx) {
+        loadChartData(ctx).then(drawSpendingChart).catch(e => {
+            console.error("Failed to load spending data:", e);
+            showChartMessage(ctx, 'The expense chart could not be loaded.');
+        });
+    }
     // =========================================================
     // END: EXPENSE STRUCTURE DOUGHNUT CHART
     // =========================================================
@@ -114,8 +133,6 @@ document.addEventListener('DOMContentLoaded', function() {
     // =========================================================
     // START: BALANCE TREND LINE CHART
     // =========================================================
-    const balanceLabelsElement = document.getElementById('balance-labels');
-    const balanceDataElement = document.getElementById('balance-data');
     const trendCtx = document.getElementById('balanceTrendChart');
 
     // Helper function to abbreviate large numbers
@@ -143,10 +160,9 @@ document.addEventListener('DOMContentLoaded', function() {
         return (newValue * sign) + suffixes[suffixNum];
     }
     
-    if (balanceLabelsElement && balanceDataElement && trendCtx) {
-        // Parse data from the json_script tags
-        const labels = JSON.parse(balanceLabelsElement.textContent);
-        const data = JSON.parse(balanceDataElement.textContent);
+    function drawBalanceTrendChart(trendData) {
+        const labels = trendData.labels;
+        const data = trendData.data;
 
         if (data.length > 0) {
             const chartData = {
@@ -210,9 +226,16 @@ document.addEventListener('DOMContentLoaded', function() {
             );
         } else {
             // Display message if no data exists for the period
-            trendCtx.parentElement.innerHTML = '<div class="text-center p-5 text-muted">No transaction data available for this period to show the balance trend.</div>';
+            showChartMessage(trendCtx, 'No transaction data available for this period to show the balance trend.');
         }
     }
+
+    if (trendCtx) {
+        loadChartData(trendCtx).then(drawBalanceTrendChart).catch(e => {
+            console.error("Failed to load balance trend data:", e);
+            showChartMessage(trendCtx, 'The balance trend could not be loaded.');
+        });
+    }
     // =========================================================
     // END: BALANCE TREND LINE CHART
     // =========================================================